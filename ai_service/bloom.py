@@ -0,0 +1,82 @@
+import hashlib
+import math
+import os
+from typing import Iterable, List
+
+# ────────────────────────────────────────────────
+# 🌸 Scalable Bloom filter (per-user listened tracks)
+# ────────────────────────────────────────────────
+BLOOM_INITIAL_CAPACITY = 64
+BLOOM_FP_RATE = float(os.getenv("BLOOM_FP_RATE", "1e-5"))     # summed over all stages
+
+
+class _Stage:
+    __slots__ = ("bits", "n_bits", "k", "capacity", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.n_bits = max(64, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.k = max(1, int(round(self.n_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def positions(self, h1: int, h2: int, h3: int):
+        # Triple hashing: with two hashes, items agreeing on both mod n collide on every
+        # probe (~1/n^2 per pair), which dominates the error of small early stages
+        n = self.n_bits
+        for i in range(self.k):
+            yield (h1 + i * h2 + i * i * h3) % n
+
+
+def _hashes(item: str):
+    digest = hashlib.blake2b(item.encode(), digest_size=24).digest()
+    return (int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:16], "little"),
+            int.from_bytes(digest[16:], "little"))
+
+
+class ScalableBloomFilter:
+    """
+    Set membership with no false negatives and a false-positive rate of
+    about `fp_rate`, growing by adding stages of doubling capacity
+    (each with half the previous stage's error budget). A few bytes per
+    item, versus ~100 bytes per string in a Python set.
+    """
+
+    def __init__(self, initial_capacity: int = BLOOM_INITIAL_CAPACITY, fp_rate: float = BLOOM_FP_RATE):
+        self.fp_rate = fp_rate
+        self.stages: List[_Stage] = [_Stage(initial_capacity, fp_rate / 2)]
+        self.count = 0
+
+    def add(self, item: str):
+        """Add `item`; repeats (or false positives) leave the filter unchanged."""
+        if item in self:
+            return
+        hashes = _hashes(item)
+        stage = self.stages[-1]
+        if stage.count >= stage.capacity:
+            stage = _Stage(stage.capacity * 2, self.fp_rate / 2 ** (len(self.stages) + 1))
+            self.stages.append(stage)
+        bits = stage.bits
+        for p in stage.positions(*hashes):
+            bits[p >> 3] |= 1 << (p & 7)
+        stage.count += 1
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        hashes = _hashes(item)
+        for stage in self.stages:
+            bits = stage.bits
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in stage.positions(*hashes)):
+                return True
+        return False
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(stage.bits) for stage in self.stages)
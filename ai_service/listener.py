@@ -1,43 +1,48 @@
-import redis
+import os
 import json
-from collections import defaultdict
-
-# Connect to Redis
-r = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
-
-# In-memory analytics
-user_streams = defaultdict(list)   # userId → [trackIds]
-track_counts = defaultdict(int)    # trackId → count
-
-print("✅ AI Service is listening for events...")
-
-pubsub = r.pubsub()
-pubsub.subscribe("stream.recorded")
-
-def recommend_for_user(user_id):
-    """Suggest tracks the user hasn't listened to yet, based on popularity."""
-    all_tracks_sorted = sorted(track_counts.items(), key=lambda x: x[1], reverse=True)
-    listened = set(user_streams[user_id])
-    suggestions = [tid for tid, _ in all_tracks_sorted if tid not in listened]
-    return suggestions[:3]  # top 3 not yet played
-
-for message in pubsub.listen():
-    if message["type"] == "message":
-        event = json.loads(message["data"])
-        user_id = event["userId"]
-        track_id = event["trackId"]
-
-        # Update in-memory stats
-        user_streams[user_id].append(track_id)
-        track_counts[track_id] += 1
-
-        print(f"\n🎶 AI received event: {event}")
-        print(f"📊 Track {track_id} now has {track_counts[track_id]} plays.")
-        print(f"👤 User {user_id} has listened to {len(user_streams[user_id])} tracks.")
-
-        recs = recommend_for_user(user_id)
-        if recs:
-            print(f"✨ Recommended for {user_id}: {recs}")
-        else:
-            print(f"✨ No new recommendations for {user_id} yet.")
-
+import time
+
+from ai_service.recommender import popularity, record_streams, sync_from_redis
+from ai_service.redis_pool import get_redis
+from ai_service.stream_consumer import STREAM_BATCH, STREAM_REPORT_SECONDS, StreamConsumer, parse_event
+
+# "stream": Redis Streams consumer group (durable, shardable across processes)
+# "pubsub": the legacy `stream.recorded` channel, drained in batches
+LISTENER_SOURCE = os.getenv("LISTENER_SOURCE", "stream")
+
+
+def run_pubsub():
+    """Fallback for publishers that do not XADD yet: batch whatever has arrived on the channel."""
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe("stream.recorded")
+    events, next_report = 0, time.time() + STREAM_REPORT_SECONDS
+    while True:
+        message = pubsub.get_message(timeout=1.0)
+        batch = []
+        while message is not None and len(batch) < STREAM_BATCH:
+            try:
+                event = parse_event({"data": message["data"]}, time.time())
+            except (TypeError, ValueError):
+                event = None
+            if event is not None:
+                batch.append(event)
+            message = pubsub.get_message()
+        if batch:
+            events += record_streams(batch)
+        if time.time() >= next_report:
+            print(f"📊 [pubsub] {events} events | top tracks: {popularity.top(3)}")
+            next_report = time.time() + STREAM_REPORT_SECONDS
+
+
+if __name__ == "__main__":
+    sync_from_redis()
+    print("✅ AI Service is listening for events...")
+    if LISTENER_SOURCE == "pubsub":
+        run_pubsub()
+    else:
+        consumer = StreamConsumer(apply=record_streams)
+        try:
+            consumer.run()
+        except KeyboardInterrupt:
+            consumer.report()
+            print(json.dumps(consumer.stats.snapshot()))
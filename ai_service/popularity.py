@@ -0,0 +1,81 @@
+import bisect
+import threading
+from typing import Dict, Iterator, List, Mapping, Tuple
+
+# ────────────────────────────────────────────────
+# 📈 Incrementally ordered play counts
+# ────────────────────────────────────────────────
+
+
+class PopularityBoard:
+    """
+    Play counts kept in order as they change: tracks are bucketed by count
+    (insertion-ordered within a bucket) and the distinct counts are kept
+    sorted, so a play moves one track between two buckets and reading the
+    top k walks the highest buckets only. There are at most ~sqrt(2 * plays)
+    distinct counts, which keeps the sorted list short.
+    """
+
+    def __init__(self):
+        self._count_of: Dict[str, int] = {}
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._counts: List[int] = []        # distinct counts, ascending
+        self._lock = threading.Lock()
+
+    def _move(self, track_id: str, old: int, new: int):
+        if old:
+            bucket = self._buckets[old]
+            del bucket[track_id]
+            if not bucket:
+                del self._buckets[old]
+                del self._counts[bisect.bisect_left(self._counts, old)]
+        if new:
+            bucket = self._buckets.get(new)
+            if bucket is None:
+                bucket = self._buckets[new] = {}
+                bisect.insort(self._counts, new)
+            bucket[track_id] = None
+            self._count_of[track_id] = new
+        else:
+            self._count_of.pop(track_id, None)
+
+    def add(self, track_id: str, n: int = 1):
+        with self._lock:
+            old = self._count_of.get(track_id, 0)
+            self._move(track_id, old, max(old + n, 0))
+
+    def add_many(self, counts: Mapping[str, int]):
+        """Apply a batch of (track_id → plays) increments under one lock hold."""
+        with self._lock:
+            for track_id, n in counts.items():
+                old = self._count_of.get(track_id, 0)
+                self._move(track_id, old, max(old + n, 0))
+
+    def rebuild(self, counts: Mapping[str, int]):
+        with self._lock:
+            self._count_of, self._buckets, self._counts = {}, {}, []
+            for track_id, n in counts.items():
+                if n > 0:
+                    self._move(track_id, 0, int(n))
+
+    def iter_top(self) -> Iterator[Tuple[str, int]]:
+        """(track_id, count), most played first. Consume promptly; concurrent writes may end it early."""
+        for count in reversed(list(self._counts)):
+            for track_id in list(self._buckets.get(count, ())):
+                yield track_id, count
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        with self._lock:
+            out = []
+            for count in reversed(self._counts):
+                for track_id in self._buckets[count]:
+                    out.append((track_id, count))
+                    if len(out) >= k:
+                        return out
+            return out
+
+    def count(self, track_id: str) -> int:
+        return self._count_of.get(track_id, 0)
+
+    def __len__(self):
+        return len(self._count_of)
@@ -1,15 +1,21 @@
+import heapq
 import math
+import os
+import threading
+import time
 import numpy as np
-import redis
 import json
-from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from collections import Counter, OrderedDict, defaultdict
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
+from ai_service.bloom import ScalableBloomFilter
+from ai_service.popularity import PopularityBoard
+from ai_service.redis_pool import get_redis
 
 # ────────────────────────────────────────────────
-# 🎯 Redis Connection (shared cache)
+# 🎯 Redis Connection (shared pool with VectorStore)
 # ────────────────────────────────────────────────
 try:
-    r = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+    r = get_redis()
 except Exception as e:
     print(f"⚠️ Redis not available: {e}")
     r = None
@@ -20,6 +26,46 @@ except Exception as e:
 user_streams: Dict[str, list] = defaultdict(list)   # userId → [trackIds]
 track_counts: Dict[str, int] = defaultdict(int)     # trackId → count
 track_embeddings: Dict[str, np.ndarray] = {}        # trackId → np.array
+popularity = PopularityBoard()                       # track_counts, kept in order
+LISTENED_FILTER_USERS = int(os.getenv("LISTENED_FILTER_USERS", "10000"))   # Bloom filters kept (LRU)
+# userId → [history list, entries folded in, Bloom filter, last entry folded in], least recently used first
+_listened: "OrderedDict[str, list]" = OrderedDict()
+_listened_lock = threading.Lock()
+
+# Called as observer(user_id, track_id, ts) for every recorded play
+stream_observers: List[Callable[[str, str, float], None]] = []
+
+
+def record_stream(user_id: str, track_id: str, ts: Optional[float] = None) -> None:
+    """Apply one `stream.recorded` event to the analytics and notify observers."""
+    ts = time.time() if ts is None else ts
+    user_streams[user_id].append(track_id)
+    track_counts[track_id] += 1
+    popularity.add(track_id)
+    _notify(user_id, track_id, ts)
+
+
+def record_streams(events: Iterable[Tuple[str, str, float]]) -> int:
+    """Batched record_stream for (user_id, track_id, ts) events: counters are updated in bulk."""
+    events = list(events)
+    plays = Counter(track_id for _, track_id, _ in events)
+    for user_id, track_id, _ in events:
+        user_streams[user_id].append(track_id)
+    for track_id, n in plays.items():
+        track_counts[track_id] += n
+    popularity.add_many(plays)
+    if stream_observers:
+        for user_id, track_id, ts in events:
+            _notify(user_id, track_id, ts)
+    return len(events)
+
+
+def _notify(user_id: str, track_id: str, ts: float):
+    for observer in stream_observers:
+        try:
+            observer(user_id, track_id, ts)
+        except Exception as e:
+            print(f"⚠️ Stream observer failed: {e}")
 
 # ────────────────────────────────────────────────
 # 🧩 Vector utilities
@@ -36,43 +82,84 @@ def weighted_score(popularity: float, similarity: float, freshness: float = 1.0)
 # ────────────────────────────────────────────────
 # 🧠 Hybrid recommendation logic
 # ────────────────────────────────────────────────
+def _folded_into(entry: list, history: list) -> bool:
+    """True if `history` still starts with the entries `entry` folded in (same list, same content)."""
+    folded_history, folded = entry[0], entry[1]
+    return (folded_history is history and folded <= len(history)
+            and (folded == 0 or history[folded - 1] == entry[3]))
+
+
+def listened_filter(user_id: str) -> ScalableBloomFilter:
+    """
+    Per-user Bloom filter over user_streams, caught up with plays recorded
+    since the last call. Filters for the LISTENED_FILTER_USERS most recent
+    users are kept; anyone else's is rebuilt from their history on demand.
+    """
+    history = user_streams.get(user_id, [])
+    with _listened_lock:
+        entry = _listened.get(user_id)
+        if entry is None or not _folded_into(entry, history):    # new, evicted, or history replaced
+            entry = _listened[user_id] = [history, 0, ScalableBloomFilter(), None]
+            while len(_listened) > LISTENED_FILTER_USERS:
+                _listened.popitem(last=False)
+        else:
+            _listened.move_to_end(user_id)
+        if entry[1] < len(history):
+            entry[2].update(history[entry[1]:])
+            entry[1] = len(history)
+            entry[3] = history[-1]
+        return entry[2]
+
+
 def recommend_for_user(user_id: str, mood_vector: Optional[np.ndarray] = None, limit: int = 5) -> List[Dict[str, Any]]:
     """
     Generate hybrid recommendations combining user behavior and content embeddings.
-    """
-    listened = set(user_streams[user_id])
-    all_tracks = list(track_counts.keys())
 
-    if not all_tracks:
+    Candidates are read most-played first from the popularity board into
+    a bounded min-heap of the best `limit`. Similarity is at most 1, so
+    once even a perfect match at the current play count could not beat
+    the heap's worst entry, no remaining track can and the walk stops.
+    Listened tracks are filtered through the user's Bloom filter (a rare
+    false positive skips an unplayed track; nothing played is returned).
+    """
+    if not track_counts:
         return [{"error": "No tracks available yet"}]
+    if limit <= 0:
+        return []
 
-    candidates = []
-    for track_id in all_tracks:
-        if track_id in listened:
-            continue
+    listened = listened_filter(user_id)
+    use_similarity = mood_vector is not None and bool(track_embeddings)
+    best_similarity = 1.0 if use_similarity else 0.0
+    freshness = 1.0     # Placeholder freshness signal (later use time decay)
 
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []     # (score, -rank, candidate)
+    for rank, (track_id, count) in enumerate(popularity.iter_top()):
         # Popularity component
-        popularity = math.log1p(track_counts[track_id])
+        popularity_score = math.log1p(count)
+        if len(heap) >= limit and round(weighted_score(popularity_score, best_similarity, freshness), 4) <= heap[0][0]:
+            break
+        if track_id in listened:
+            continue
 
         # Similarity component
-        if mood_vector is not None and track_id in track_embeddings:
+        if use_similarity and track_id in track_embeddings:
             similarity = cosine_similarity(mood_vector, track_embeddings[track_id])
         else:
             similarity = 0.0
 
-        # Placeholder freshness signal (later use time decay)
-        freshness = 1.0
-
-        score = weighted_score(popularity, similarity, freshness)
-        candidates.append({
+        score = round(weighted_score(popularity_score, similarity, freshness), 4)
+        item = (score, -rank, {
             "track_id": track_id,
-            "score": round(score, 4),
-            "popularity": round(popularity, 3),
+            "score": score,
+            "popularity": round(popularity_score, 3),
             "similarity": round(similarity, 3),
         })
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
 
-    ranked = sorted(candidates, key=lambda x: x["score"], reverse=True)
-    return ranked[:limit]
+    return [candidate for _, _, candidate in sorted(heap, key=lambda x: x[:2], reverse=True)]
 
 # ────────────────────────────────────────────────
 # 🎭 Mood → pseudo-vector mapping
@@ -92,7 +179,10 @@ def mood_to_vector(mood: str) -> np.ndarray:
 # 🔁 Redis sync (optional)
 # ────────────────────────────────────────────────
 def sync_from_redis() -> None:
-    """Load track counts and user data from Redis into memory."""
+    """
+    Load track counts and user data from Redis into memory. Not run at
+    import: the API's warm-up (api.lifecycle) and the listener call it.
+    """
     if not r:
         print("⚠️ Redis unavailable — skipping sync.")
         return
@@ -101,16 +191,13 @@ def sync_from_redis() -> None:
         if r.exists("track_counts"):
             track_counts.update(json.loads(r.get("track_counts")))
         if r.exists("user_streams"):
-            user_streams.update(json.loads(r.get("user_streams")))
+            synced = json.loads(r.get("user_streams"))
+            user_streams.update(synced)
+            with _listened_lock:
+                for user_id in synced:
+                    _listened.pop(user_id, None)
+        popularity.rebuild(track_counts)
         print(f"🔁 Synced {len(track_counts)} tracks and {len(user_streams)} users from Redis.")
     except Exception as e:
         print(f"⚠️ Redis sync failed: {e}")
 
-# ────────────────────────────────────────────────
-# 🚀 Initialization
-# ────────────────────────────────────────────────
-try:
-    sync_from_redis()
-except Exception as e:
-    print(f"⚠️ Failed to sync from Redis: {e}")
-
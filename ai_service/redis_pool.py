@@ -0,0 +1,25 @@
+import os
+import redis
+
+# ────────────────────────────────────────────────
+# 🎯 Shared Redis connection pool
+# ────────────────────────────────────────────────
+# One binary-safe pool (decode_responses=False) shared by VectorStore and
+# ai_service.recommender. Vectors travel as raw float32 bytes; callers
+# decode text values themselves (json.loads accepts bytes).
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+
+_pool = None
+
+
+def get_pool() -> redis.ConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(REDIS_URL, max_connections=MAX_CONNECTIONS)
+    return _pool
+
+
+def get_redis() -> redis.Redis:
+    """Client backed by the shared pool (no connection is opened until first use)."""
+    return redis.Redis(connection_pool=get_pool())
@@ -0,0 +1,393 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import redis
+
+# ────────────────────────────────────────────────
+# 🎧 Batched `stream.recorded` consumer (Redis Streams)
+# ────────────────────────────────────────────────
+# The backend XADDs every play to STREAM_KEY (field "data" = the JSON event,
+# the same payload it publishes on the pub/sub channel). Each process joins
+# consumer group STREAM_GROUP under a name that is stable across restarts
+# (STREAM_CONSUMER, e.g. the pod or service name; the hostname otherwise), so
+# a restarted process re-reads its own unacked entries, and events are
+# sharded across processes. Run several consumers per host only with
+# distinct STREAM_CONSUMER values.
+STREAM_KEY = os.getenv("STREAM_EVENTS_KEY", "stream.recorded")
+STREAM_GROUP = os.getenv("STREAM_GROUP", "ai-service")
+STREAM_CONSUMER = os.getenv("STREAM_CONSUMER") or socket.gethostname()
+STREAM_BATCH = int(os.getenv("STREAM_BATCH", "500"))
+STREAM_BLOCK_MS = int(os.getenv("STREAM_BLOCK_MS", "1000"))
+STREAM_CLAIM_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", "60000"))   # adopt a dead consumer's entries
+# Consumers idle this long with nothing pending are removed from the group
+STREAM_CONSUMER_EXPIRE_MS = int(os.getenv("STREAM_CONSUMER_EXPIRE_MS", str(10 * STREAM_CLAIM_IDLE_MS)))
+STREAM_REPORT_SECONDS = float(os.getenv("STREAM_REPORT_SECONDS", "10"))
+# Entries that cannot be decoded are acked and copied here (capped) for inspection
+STREAM_DEAD_KEY = os.getenv("STREAM_DEAD_KEY", "stream.recorded:dead")
+STREAM_DEAD_MAXLEN = 10000
+# Where a StreamFollower saves the last entry id it applied, to resume after a restart
+STREAM_FOLLOW_KEY = os.getenv("STREAM_FOLLOW_KEY", "stream.recorded:followed")
+STREAM_RETRY_MAX_SECONDS = 30.0
+RATE_WINDOW_SECONDS = 60.0
+
+Event = Tuple[str, str, float]      # (user_id, track_id, ts)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _id_ms(entry_id) -> int:
+    return int(_text(entry_id).split("-", 1)[0])
+
+
+def parse_event(fields: Dict[Any, Any], default_ts: float) -> Optional[Event]:
+    """Stream entry fields (a JSON "data" field, or flat userId/trackId fields) → event."""
+    fields = {_text(k): v for k, v in fields.items()}
+    try:
+        payload = json.loads(fields["data"]) if "data" in fields else {k: _text(v) for k, v in fields.items()}
+        user_id, track_id = str(payload["userId"]), str(payload["trackId"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    ts = default_ts
+    stamp = payload.get("timestamp")
+    if stamp:
+        try:
+            ts = datetime.fromisoformat(str(stamp).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return user_id, track_id, ts
+
+
+class ConsumerStats:
+    """Throughput and lag counters for one consumer."""
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+        self.invalid = 0
+        self.errors = 0
+        self.lag_seconds = 0.0      # wall clock minus the newest applied entry's stream time
+        self.group_lag: Optional[int] = None      # entries not yet delivered to the group
+        self.pending: Optional[int] = None        # delivered to the group but not acked
+        self.started = time.time()
+        self._recent: deque = deque()             # (time, events) per batch, for the rate
+
+    def record_batch(self, n: int, newest_ms: int):
+        now = time.time()
+        self.events += n
+        self.batches += 1
+        self.lag_seconds = max(0.0, now - newest_ms / 1000.0)
+        self._recent.append((now, n))
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+
+    @property
+    def events_per_sec(self) -> float:
+        if not self._recent:
+            return 0.0
+        span = max(time.time() - self._recent[0][0], 1.0)
+        return sum(n for _, n in self._recent) / span
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "events_per_sec": round(self.events_per_sec, 1),
+            "lag_seconds": round(self.lag_seconds, 3),
+            "group_lag": self.group_lag,
+            "pending": self.pending,
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+
+class StreamConsumer:
+    """
+    Reads `stream.recorded` in batches through a consumer group, applies
+    each batch with one call to `apply` (bulk counter updates), then acks
+    the whole batch. Entries are acked only after they were applied, so a
+    crash re-delivers them to this consumer name on restart (the name must
+    therefore outlive the process: see STREAM_CONSUMER).
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, apply: Optional[Callable[[Sequence[Event]], Any]] = None,
+                 stream: str = STREAM_KEY, group: str = STREAM_GROUP, consumer: Optional[str] = None,
+                 batch_size: int = STREAM_BATCH, block_ms: int = STREAM_BLOCK_MS, dead_stream: str = STREAM_DEAD_KEY):
+        if client is None:
+            from ai_service.redis_pool import get_redis
+            client = get_redis()
+        if apply is None:
+            from ai_service.recommender import record_streams
+            apply = record_streams
+        self.client = client
+        self.apply = apply
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or STREAM_CONSUMER
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.dead_stream = dead_stream
+        self.stats = ConsumerStats()
+        self._stop = threading.Event()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Group setup and recovery
+    # ────────────────────────────────────────────────
+    def ensure_group(self):
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            print(f"🆕 Created consumer group {self.group} on {self.stream}")
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def recover(self) -> int:
+        """Re-apply this consumer's unacked entries, then adopt idle ones from dead consumers."""
+        recovered = 0
+        while True:
+            n = self.poll(pending=True)
+            if not n:
+                break
+            recovered += n
+        recovered += self.claim_idle()
+        self.prune_consumers()
+        if recovered:
+            print(f"🔁 Recovered {recovered} unacked stream events")
+        return recovered
+
+    def claim_idle(self) -> int:
+        """Take over and apply entries another consumer left unacked for STREAM_CLAIM_IDLE_MS."""
+        claimed, start = 0, "0-0"
+        try:
+            while True:
+                start, entries, *_ = self.client.xautoclaim(self.stream, self.group, self.consumer,
+                                                            STREAM_CLAIM_IDLE_MS, start_id=start,
+                                                            count=self.batch_size)
+                claimed += self.process(entries)
+                if _text(start) == "0-0" or not entries:
+                    return claimed
+        except redis.ResponseError as e:      # XAUTOCLAIM needs Redis >= 6.2
+            print(f"⚠️ Could not claim idle stream entries: {e}")
+            return claimed
+
+    def prune_consumers(self) -> List[str]:
+        """
+        Delete consumers idle for STREAM_CONSUMER_EXPIRE_MS with nothing
+        pending (claim_idle() adopted their entries), so dead ones do not
+        pile up in the group. Returns the names removed.
+        """
+        removed = []
+        try:
+            for info in self.client.xinfo_consumers(self.stream, self.group):
+                name = _text(info.get("name"))
+                if (name != self.consumer and not info.get("pending")
+                        and info.get("idle", 0) >= STREAM_CONSUMER_EXPIRE_MS):
+                    self.client.xgroup_delconsumer(self.stream, self.group, name)
+                    removed.append(name)
+        except redis.ResponseError as e:
+            print(f"⚠️ Could not prune stream consumers: {e}")
+        if removed:
+            print(f"🧹 Removed idle stream consumers: {', '.join(removed)}")
+        return removed
+
+    # ────────────────────────────────────────────────
+    # 🔹 Batches
+    # ────────────────────────────────────────────────
+    def process(self, entries: List[Tuple[Any, Dict[Any, Any]]]) -> int:
+        """Apply and ack one batch of (entry_id, fields). Returns entries handled."""
+        if not entries:
+            return 0
+        events = []
+        for entry_id, fields in entries:
+            if fields is None:              # trimmed from the stream while pending
+                continue
+            try:
+                event = parse_event(fields, _id_ms(entry_id) / 1000.0)
+            except Exception as e:          # e.g. undecodable bytes
+                event, error = None, str(e)
+            else:
+                error = "no JSON userId/trackId"
+            if event is None:
+                self.stats.invalid += 1     # acked below: a malformed entry would never parse
+                self.dead_letter(entry_id, fields, error)
+            else:
+                events.append(event)
+        if events:
+            self.apply(events)
+        self.client.xack(self.stream, self.group, *[entry_id for entry_id, _ in entries])
+        self.stats.record_batch(len(events), max(_id_ms(entry_id) for entry_id, _ in entries))
+        return len(entries)
+
+    def dead_letter(self, entry_id, fields: Dict[Any, Any], error: str):
+        print(f"⚠️ Skipping stream entry {_text(entry_id)}: {error}")
+        try:
+            self.client.xadd(self.dead_stream, {**fields, "_entry": entry_id, "_error": error},
+                             maxlen=STREAM_DEAD_MAXLEN, approximate=True)
+        except redis.RedisError as e:
+            print(f"⚠️ Could not dead-letter stream entry {_text(entry_id)}: {e}")
+
+    def poll(self, pending: bool = False) -> int:
+        """Read and process one batch: new entries, or (pending=True) this consumer's unacked ones."""
+        reply = self.client.xreadgroup(self.group, self.consumer, {self.stream: "0" if pending else ">"},
+                                       count=self.batch_size, block=None if pending else self.block_ms)
+        handled = 0
+        for _, entries in reply or ():
+            handled += self.process(entries)
+        return handled
+
+    # ────────────────────────────────────────────────
+    # 🔹 Metrics and main loop
+    # ────────────────────────────────────────────────
+    def refresh_group_stats(self):
+        """Group-wide backlog from XINFO GROUPS ("lag" needs Redis >= 7)."""
+        try:
+            for info in self.client.xinfo_groups(self.stream):
+                if _text(info.get("name")) == self.group:
+                    self.stats.pending = info.get("pending")
+                    self.stats.group_lag = info.get("lag")
+        except redis.RedisError as e:
+            print(f"⚠️ Could not read consumer group info: {e}")
+
+    def report(self):
+        self.refresh_group_stats()
+        s = self.stats.snapshot()
+        print(f"📊 [{self.consumer}] {s['events']} events | {s['events_per_sec']}/s | "
+              f"lag {s['lag_seconds']}s | backlog {s['group_lag']} | pending {s['pending']}")
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        ready = False       # group exists and this consumer's unacked entries were re-applied
+        next_report = time.time() + STREAM_REPORT_SECONDS
+        while not self._stop.is_set():
+            try:
+                if not ready:
+                    self.ensure_group()
+                    self.recover()
+                    ready = True
+                    print(f"✅ Consuming {self.stream} as {self.group}/{self.consumer} (batch {self.batch_size})")
+                self.poll()
+                if time.time() >= next_report:
+                    self.claim_idle()
+                    self.prune_consumers()
+                    self.report()
+                    next_report = time.time() + STREAM_REPORT_SECONDS
+            except redis.ResponseError as e:
+                self.stats.errors += 1
+                if "NOGROUP" in str(e):
+                    # Stream or group deleted under us: recreate it on the next pass
+                    print(f"⚠️ Consumer group {self.group} is gone, recreating it: {e}")
+                    ready = False
+                else:
+                    print(f"⚠️ Stream command failed, retrying: {e}")
+                    time.sleep(1.0)
+            except redis.RedisError as e:
+                self.stats.errors += 1
+                print(f"⚠️ Stream read failed, retrying: {e}")
+                time.sleep(1.0)
+            except Exception as e:
+                # The batch stays pending: recover() or claim_idle() re-applies it later
+                self.stats.errors += 1
+                print(f"⚠️ Applying stream batch failed, left pending: {e}")
+                time.sleep(1.0)
+
+
+class StreamFollower:
+    """
+    Tails `stream.recorded` without a consumer group, so every process
+    sees every event (e.g. each API worker folding plays into its own
+    profile cache), where StreamConsumer shards them. It resumes after
+    the entry id saved by save_position(), or starts at the stream's end.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, apply: Optional[Callable[[Sequence[Event]], Any]] = None,
+                 stream: str = STREAM_KEY, batch_size: int = STREAM_BATCH, block_ms: int = STREAM_BLOCK_MS,
+                 position_key: str = STREAM_FOLLOW_KEY):
+        if client is None:
+            from ai_service.redis_pool import get_redis
+            client = get_redis()
+        if apply is None:
+            from ai_service.recommender import record_streams
+            apply = record_streams
+        self.client = client
+        self.apply = apply
+        self.stream = stream
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.position_key = position_key
+        self.last_id: Optional[str] = None      # None until the start position is resolved
+        self.stats = ConsumerStats()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start_id(self) -> str:
+        saved = self.client.get(self.position_key)
+        if saved:
+            return _text(saved)
+        last = self.client.xrevrange(self.stream, count=1)
+        return _text(last[0][0]) if last else "0-0"
+
+    def poll(self, block_ms: Optional[int] = None) -> int:
+        """Read and apply one batch of entries after `last_id`. Returns entries read."""
+        if self.last_id is None:
+            self.last_id = self._start_id()
+        reply = self.client.xread({self.stream: self.last_id}, count=self.batch_size, block=block_ms)
+        read = 0
+        for _, entries in reply or ():
+            events = []
+            for entry_id, fields in entries:
+                event = parse_event(fields, _id_ms(entry_id) / 1000.0)
+                if event is None:
+                    self.stats.invalid += 1
+                else:
+                    events.append(event)
+            self.last_id = _text(entries[-1][0])     # advanced first: a batch that fails to apply is skipped
+            read += len(entries)
+            if events:
+                self.apply(events)
+            self.stats.record_batch(len(events), _id_ms(self.last_id))
+        return read
+
+    def save_position(self):
+        """Remember the last applied entry, e.g. at shutdown after the state it fed was flushed."""
+        if self.last_id is None:
+            return
+        try:
+            self.client.set(self.position_key, self.last_id)
+        except redis.RedisError as e:
+            print(f"⚠️ Could not save stream position: {e}")
+
+    def run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self.poll(self.block_ms)
+                delay = 1.0
+            except redis.RedisError as e:
+                self.stats.errors += 1
+                if delay == 1.0:
+                    print(f"⚠️ Stream follow failed, retrying: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, STREAM_RETRY_MAX_SECONDS)
+            except Exception as e:      # a failing apply must not end the thread
+                self.stats.errors += 1
+                print(f"⚠️ Applying followed stream events failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, daemon=True, name="stream-follower")
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
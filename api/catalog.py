@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.geo_index import GeoIndex
+from api.metrics import OPERATION_SECONDS
+from api.trending import TrendingIndex, base_score
+
+META_DIR = "data/context_meta"
+ARTIST_DIR = "data/artists"
+CONTEXT_DIM = 3
+DEFAULT_CONTEXT = (0.5, 0.5, 0.5)   # stands in for a missing context vector
+DEFAULT_PLAYS = 20          # trending defaults for artist files without counters
+DEFAULT_RECOMMENDATIONS = 5
+MIN_CAPACITY = 1024
+CATALOG_SYNC_SECONDS = float(os.getenv("CATALOG_SYNC_SECONDS", "10"))
+
+
+def _parse_time(value) -> float:
+    """ISO timestamp → epoch seconds (NaN if missing or malformed)."""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Skipping unreadable metadata {path}: {e}")
+        return None
+
+
+class TrackCatalog:
+    """
+    In-memory, columnar view of track metadata: context fingerprints from
+    data/context_meta and artist records from data/artists, one row per
+    track id. Numeric fields live in NumPy columns (lat, lng, time, plays,
+    recommendations, context vectors) and a GeoIndex over rows serves
+    radius queries, so discovery requests never touch disk. A
+    TrendingIndex keeps per-cell trending leaderboards current on every
+    catalog change.
+
+    Loaded once at startup; upload routes push their records in directly,
+    and a background watcher picks up files added or removed by anything
+    else (one stat() per directory per interval when nothing changed).
+    """
+
+    def __init__(self, meta_dir: str = META_DIR, artist_dir: str = ARTIST_DIR):
+        self.meta_dir = meta_dir
+        self.artist_dir = artist_dir
+        self.lat = np.full(MIN_CAPACITY, np.nan)
+        self.lng = np.full(MIN_CAPACITY, np.nan)
+        self.time = np.full(MIN_CAPACITY, np.nan)
+        self.plays = np.zeros(MIN_CAPACITY, dtype=np.float64)
+        self.recommendations = np.zeros(MIN_CAPACITY, dtype=np.float64)
+        self.context = np.zeros((MIN_CAPACITY, CONTEXT_DIM), dtype=np.float64)
+        self.context_unit = np.zeros((MIN_CAPACITY, CONTEXT_DIM), dtype=np.float32)  # L2-normalized, for scoring
+        self.has_context = np.zeros(MIN_CAPACITY, dtype=bool)
+        self.in_meta = np.zeros(MIN_CAPACITY, dtype=bool)       # has a context_meta record
+        self.in_artist = np.zeros(MIN_CAPACITY, dtype=bool)     # has an artist record
+        self.track_ids: List[str] = []
+        self.city: List[Optional[str]] = []
+        self.artist: List[str] = []
+        self.time_iso: List[Optional[str]] = []
+        self.geo = GeoIndex()
+        self.trending = TrendingIndex(self.geo)
+        self.version = 0
+        self._row_of: Dict[str, int] = {}
+        self._dirs: Dict[str, Tuple[Optional[int], set]] = {}
+        self._lock = threading.RLock()
+        self._watcher: Optional[threading.Thread] = None
+        self._in_store: Optional[np.ndarray] = None
+        self._in_store_cursor: Optional[tuple] = None     # VectorStore.membership_changes position
+        self._in_store_rows = 0                           # rows whose membership is filled in
+
+    # ────────────────────────────────────────────────
+    # 🔹 Rows
+    # ────────────────────────────────────────────────
+    def _grow(self, needed: int):
+        capacity = len(self.lat)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name, fill in (("lat", np.nan), ("lng", np.nan), ("time", np.nan), ("plays", 0),
+                           ("recommendations", 0), ("context", 0), ("context_unit", 0), ("has_context", False),
+                           ("in_meta", False), ("in_artist", False)):
+            old = getattr(self, name)
+            new = np.full((new_capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _row(self, track_id: str) -> int:
+        row = self._row_of.get(track_id)
+        if row is None:
+            row = len(self.track_ids)
+            self._grow(row + 1)
+            self.track_ids.append(track_id)
+            self.city.append(None)
+            self.artist.append("Unknown")
+            self.time_iso.append(None)
+            self._row_of[track_id] = row
+        return row
+
+    def row_of(self, track_id: str) -> Optional[int]:
+        return self._row_of.get(track_id)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.in_meta[:len(self.track_ids)] | self.in_artist[:len(self.track_ids)]))
+
+    def _refresh_trending(self, row: int):
+        """Re-rank one row: trending needs an artist record, a location and an upload time."""
+        if not (self.in_artist[row] and row in self.geo and not np.isnan(self.time[row])):
+            self.trending.remove(row)
+            return
+        self.trending.upsert(row, float(self.lat[row]), float(self.lng[row]),
+                             base_score(float(self.plays[row]), float(self.recommendations[row])),
+                             float(self.time[row]))
+
+    # ────────────────────────────────────────────────
+    # 🔹 Incremental updates
+    # ────────────────────────────────────────────────
+    def upsert_context(self, track_id: str, data: Dict[str, Any]):
+        """Apply a data/context_meta record."""
+        with self._lock:
+            row = self._row(track_id)
+            lat, lng = data.get("lat"), data.get("lng")
+            self.in_meta[row] = True
+            self.city[row] = data.get("city")
+            self.time_iso[row] = data.get("time")
+            self.time[row] = _parse_time(data.get("time"))
+            vector = data.get("vector")
+            if vector is not None and len(vector) == CONTEXT_DIM:
+                self.context[row] = vector
+                self.has_context[row] = True
+            else:
+                self.context[row] = DEFAULT_CONTEXT
+                self.has_context[row] = False
+            norm = np.linalg.norm(self.context[row])
+            self.context_unit[row] = self.context[row] / norm if norm > 0 else 0.0
+            if lat is not None and lng is not None:
+                self.lat[row], self.lng[row] = float(lat), float(lng)
+                self.geo.upsert(row, self.lat[row], self.lng[row])
+            else:
+                self.lat[row] = self.lng[row] = np.nan
+                self.geo.remove(row)
+            self._refresh_trending(row)
+            self.version += 1
+
+    def upsert_artist(self, track_id: str, data: Dict[str, Any]):
+        """Apply a data/artists record (also called by the upload route)."""
+        with self._lock:
+            row = self._row(track_id)
+            self.in_artist[row] = True
+            self.artist[row] = data.get("artist_name", "Unknown")
+            self.plays[row] = data.get("plays", DEFAULT_PLAYS)
+            self.recommendations[row] = data.get("recommendations", DEFAULT_RECOMMENDATIONS)
+            self._refresh_trending(row)
+            self.version += 1
+
+    def remove_context(self, track_id: str):
+        with self._lock:
+            row = self._row_of.get(track_id)
+            if row is not None:
+                self.in_meta[row] = self.has_context[row] = False
+                self.geo.remove(row)
+                self._refresh_trending(row)
+                self.version += 1
+
+    def remove_artist(self, track_id: str):
+        with self._lock:
+            row = self._row_of.get(track_id)
+            if row is not None:
+                self.in_artist[row] = False
+                self.artist[row] = "Unknown"
+                self._refresh_trending(row)
+                self.version += 1
+
+    # ────────────────────────────────────────────────
+    # 🔹 Loading and watching
+    # ────────────────────────────────────────────────
+    def _sync_dir(self, path: str, upsert, remove) -> bool:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        known_mtime, known = self._dirs.get(path, (None, set()))
+        if mtime == known_mtime:
+            return False
+        current = {f[:-5] for f in os.listdir(path) if f.endswith(".json")}
+        for track_id in known - current:
+            remove(track_id)
+        for track_id in current - known:
+            data = _read_json(os.path.join(path, f"{track_id}.json"))
+            if data is not None:
+                upsert(track_id, data)
+        self._dirs[path] = (mtime, current)
+        return True
+
+    def sync(self) -> bool:
+        """Pick up metadata files added or removed on disk; True if anything was re-read."""
+        with self._lock:
+            changed = self._sync_dir(self.meta_dir, self.upsert_context, self.remove_context)
+            changed = self._sync_dir(self.artist_dir, self.upsert_artist, self.remove_artist) or changed
+        return changed
+
+    def load(self):
+        start = time.time()
+        self.sync()
+        print(f"📂 Track catalog loaded: {len(self)} tracks in {time.time() - start:.2f}s")
+
+    def start_watcher(self, interval: float = CATALOG_SYNC_SECONDS):
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"⚠️ Catalog sync failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, daemon=True, name="catalog-watcher")
+        self._watcher.start()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Queries
+    # ────────────────────────────────────────────────
+    @property
+    def has_context_data(self) -> bool:
+        return self.meta_dir in self._dirs
+
+    @property
+    def has_artist_data(self) -> bool:
+        return self.artist_dir in self._dirs or bool(self.in_artist.any())
+
+    def nearby(self, lat: float, lng: float, radius_km: float, require_artist: bool = False,
+               sort: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows with a context location within `radius_km` and their distances (nearest first if `sort`)."""
+        with OPERATION_SECONDS.time("discover_nearby"):
+            rows, dist = self.geo.nearby(lat, lng, radius_km, sort=sort)
+            rows = rows.astype(np.int64)
+            if require_artist and len(rows):
+                keep = self.in_artist[rows]
+                rows, dist = rows[keep], dist[keep]
+        return rows, dist
+
+    def in_store(self, store) -> np.ndarray:
+        """
+        Column: the track has an audio embedding in `store`. Kept current
+        incrementally: each call looks up only the track ids the store
+        changed and the catalog rows added since the previous call, and
+        rescans everything only when the store was replaced wholesale.
+        """
+        with self._lock:
+            cursor, changed = store.membership_changes(self._in_store_cursor)
+            vectors, ids, mask = store.vectors, self.track_ids, self._in_store
+            if changed is None or mask is None:
+                mask = np.zeros(len(self.lat), dtype=bool)
+                mask[:len(ids)] = np.fromiter((tid in vectors for tid in ids), dtype=bool, count=len(ids))
+            else:
+                if len(mask) < len(self.lat):
+                    grown = np.zeros(len(self.lat), dtype=bool)
+                    grown[:len(mask)] = mask
+                    mask = grown
+                done = self._in_store_rows
+                for track_id in set(changed):
+                    row = self._row_of.get(track_id)
+                    if row is not None and row < done:
+                        mask[row] = track_id in vectors
+                mask[done:len(ids)] = np.fromiter((tid in vectors for tid in ids[done:]), dtype=bool,
+                                                  count=len(ids) - done)
+            self._in_store, self._in_store_cursor, self._in_store_rows = mask, cursor, len(ids)
+            return mask
+
+    def stats(self) -> Dict[str, Any]:
+        n = len(self.track_ids)
+        return {
+            "tracks": len(self),
+            "with_context": int(np.count_nonzero(self.in_meta[:n])),
+            "with_artist": int(np.count_nonzero(self.in_artist[:n])),
+            "located": len(self.geo),
+            "trending": len(self.trending),
+            "version": self.version,
+        }
+
+
+# Loaded and watched from the API's warm-up, see api.lifecycle
+catalog = TrackCatalog()
@@ -0,0 +1,155 @@
+import math
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+DEFAULT_CELL_DEG = 0.5      # ~55 km of latitude per cell
+MIN_CAPACITY = 1024
+FULL_SCAN_RATIO = 8         # scan everything once a query spans 1/8 of the occupied cells
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances in km from one point to arrays of points, vectorized."""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeoIndex:
+    """
+    In-memory spatial index over lat/lng points: a fixed-degree grid
+    (geohash-style buckets) mapping cells to rows, with coordinates kept
+    in flat NumPy arrays. A radius query visits only the cells its
+    bounding box overlaps and computes exact distances for those rows in
+    one vectorized haversine. Keys are any hashable (track ids, row numbers).
+    """
+
+    def __init__(self, cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cols = int(math.ceil(360.0 / cell_deg))
+        self._lat = np.zeros(MIN_CAPACITY, dtype=np.float64)
+        self._lng = np.zeros(MIN_CAPACITY, dtype=np.float64)
+        self._alive = np.zeros(MIN_CAPACITY, dtype=bool)
+        self._keys = np.empty(MIN_CAPACITY, dtype=object)
+        self._size = 0
+        self._row_of: Dict[Hashable, int] = {}
+        self._cell_of: List[Optional[Tuple[int, int]]] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._free: List[int] = []
+        self._lock = threading.RLock()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Grid helpers
+    # ────────────────────────────────────────────────
+    def cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = int(math.floor((min(max(lat, -90.0), 90.0) + 90.0) / self.cell_deg))
+        col = int(math.floor(((lng + 180.0) % 360.0) / self.cell_deg)) % self._cols
+        return row, col
+
+    def cells_near(self, lat: float, lng: float, radius_km: float) -> Tuple[range, List[int]]:
+        """Grid rows and columns overlapping the bounding box of a radius around (lat, lng)."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        row_lo, _ = self.cell(lat_lo, lng)
+        row_hi, _ = self.cell(lat_hi, lng)
+
+        # Longitude span widens towards the poles; past them every column qualifies
+        widest = max(abs(lat_lo), abs(lat_hi))
+        cos_lat = math.cos(math.radians(widest))
+        if widest >= 89.9 or radius_km / (KM_PER_DEG_LAT * cos_lat) >= 180.0:
+            cols = list(range(self._cols))
+        else:
+            dlng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+            _, col_lo = self.cell(lat, lng - dlng)
+            n = int(math.ceil(2 * dlng / self.cell_deg)) + 1
+            cols = [(col_lo + i) % self._cols for i in range(min(n, self._cols))]
+        return range(row_lo, row_hi + 1), cols
+
+    # ────────────────────────────────────────────────
+    # 🔹 Updates
+    # ────────────────────────────────────────────────
+    def upsert(self, key: Hashable, lat: float, lng: float):
+        with self._lock:
+            row = self._row_of.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                    self._keys[row] = key
+                else:
+                    row = self._size
+                    if row >= len(self._lat):
+                        self._lat = np.resize(self._lat, row * 2)
+                        self._lng = np.resize(self._lng, row * 2)
+                        self._alive = np.concatenate([self._alive, np.zeros(row, dtype=bool)])
+                        keys = np.empty(row * 2, dtype=object)
+                        keys[:row] = self._keys
+                        self._keys = keys
+                    self._keys[row] = key
+                    self._cell_of.append(None)
+                    self._size += 1
+                self._row_of[key] = row
+            else:
+                self._drop_from_cell(row)
+            cell = self.cell(lat, lng)
+            self._lat[row], self._lng[row] = lat, lng
+            self._alive[row] = True
+            self._cell_of[row] = cell
+            self._cells[cell].append(row)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            row = self._row_of.pop(key, None)
+            if row is None:
+                return
+            self._drop_from_cell(row)
+            self._keys[row] = None
+            self._alive[row] = False
+            self._cell_of[row] = None
+            self._free.append(row)
+
+    def _drop_from_cell(self, row: int):
+        cell = self._cell_of[row]
+        self._cells[cell].remove(row)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    # ────────────────────────────────────────────────
+    # 🔹 Queries
+    # ────────────────────────────────────────────────
+    def nearby(self, lat: float, lng: float, radius_km: float, sort: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Keys (object array) within `radius_km` and their distances in km, nearest first if `sort`."""
+        with self._lock:
+            grid_rows, grid_cols = self.cells_near(lat, lng, radius_km)
+            if len(grid_rows) * len(grid_cols) * FULL_SCAN_RATIO >= len(self._cells):
+                # The radius covers much of the occupied grid: scan every point at once
+                rows = np.flatnonzero(self._alive[:self._size])
+            else:
+                cells = self._cells
+                rows = [r for gr in grid_rows for gc in grid_cols for r in cells.get((gr, gc), ())]
+                rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            if not len(rows):
+                return np.empty(0, dtype=object), np.zeros(0)
+            dist = haversine_km(lat, lng, self._lat[rows], self._lng[rows])
+            keep = dist <= radius_km
+            rows, dist = rows[keep], dist[keep]
+            if sort:
+                order = np.argsort(dist, kind="stable")
+                rows, dist = rows[order], dist[order]
+            return self._keys[rows], dist
+
+    def query(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Hashable, float]]:
+        """(key, distance_km) of every point within `radius_km`, nearest first."""
+        keys, dist = self.nearby(lat, lng, radius_km)
+        return list(zip(keys.tolist(), dist.tolist()))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._row_of
+
+    def __len__(self) -> int:
+        return len(self._row_of)
@@ -1,92 +1,793 @@
 import numpy as np
-import redis
 import json
-from typing import Dict, Any, List, Optional
+import os
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Any, List, Optional, Tuple
+from api.metrics import OPERATION_SECONDS
+from api.vector_index import make_index
+from ai_service.redis_pool import get_redis
+from ai_service.recommender import stream_observers, user_streams
+from recommender.profiles import UserProfileStore
+from recommender.persistence import (
+    OP_DELETE, OP_PUT, VectorLog, current_generation, load_index, next_generation, write_snapshot,
+)
+
+# Grow the matrix by at least this many rows at a time (amortized appends)
+MIN_CAPACITY = 1024
+# Compact once tombstoned rows make up this share of the matrix
+COMPACT_RATIO = 0.25
+# Fields per HSCAN / HMGET round-trip during bulk load
+REDIS_SCAN_CHUNK = 1000
+# Fold the write-ahead log into a new snapshot after this many appends
+CHECKPOINT_RECORDS = 10_000
+# Track ids whose membership changed, kept for incremental consumers (see membership_changes)
+MEMBERSHIP_JOURNAL = 65536
+# How often each worker tails the shared log / checks for a newer snapshot (0 = never)
+VECTOR_FOLLOW_SECONDS = float(os.getenv("VECTOR_FOLLOW_SECONDS", "1.0"))
+
+
+def _encode_vector(vec: np.ndarray) -> bytes:
+    """Raw float32 bytes: ~4x smaller than a JSON float list."""
+    return np.asarray(vec, dtype=np.float32).ravel().tobytes()
+
+
+def _decode_vector(data: bytes) -> np.ndarray:
+    """Decode raw float32 bytes, accepting legacy JSON lists too."""
+    if data[:1] == b"[" and data[-1:] == b"]":
+        try:
+            return np.array(json.loads(data), dtype=np.float32)
+        except ValueError:
+            pass  # raw bytes that happen to start with "["
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    """Return a float32 unit vector (zero vectors stay zero)."""
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    if norm == 0 or np.isnan(norm):
+        return np.zeros_like(vec)
+    return vec / norm
+
+
+class VectorView(Mapping):
+    """
+    Read-only dict view over the store matrix.
+    Keeps legacy `vs.vectors[...]`, `in vs.vectors` and `.items()` callers working.
+    """
+
+    def __init__(self, store: "VectorStore"):
+        self._store = store
+
+    def __getitem__(self, track_id: str) -> np.ndarray:
+        vec = self._store.get_vector(track_id)
+        if vec is None:
+            raise KeyError(track_id)
+        return vec
+
+    def __contains__(self, track_id) -> bool:
+        return track_id in self._store._row_of
+
+    def __iter__(self):
+        return iter(list(self._store._row_of))
+
+    def __len__(self) -> int:
+        return len(self._store._row_of)
+
+
+class _Rows:
+    """
+    Row-addressable view over the read-only base segment (usually a
+    memory-mapped snapshot) followed by the in-RAM delta segment.
+    """
+
+    def __init__(self, base: np.ndarray, delta: np.ndarray, size: int):
+        self.base, self.delta, self.size = base, delta, size
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.size, self.delta.shape[1])
+
+    def __getitem__(self, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.delta.shape[1]), dtype=np.float32)
+        in_base = rows < len(self.base)
+        if in_base.any():
+            out[in_base] = self.base[rows[in_base]]
+        if not in_base.all():
+            out[~in_base] = self.delta[rows[~in_base] - len(self.base)]
+        return out
+
+    def scan(self, query: np.ndarray) -> np.ndarray:
+        """Scores for every row: one product per segment."""
+        n_delta = self.size - len(self.base)
+        if not len(self.base):
+            return self.delta[:n_delta] @ query
+        return np.concatenate([self.base @ query, self.delta[:n_delta] @ query])
+
 
 class VectorStore:
     """
     Unified in-memory + optional Redis vector store for embeddings.
     Used by /embed and /recommend routes.
+
+    Embeddings live in pre-normalized float32 matrices with an id ↔ row
+    index: a read-only base segment (a memory-mapped snapshot, see
+    recommender.persistence) followed by a growable in-RAM delta. A
+    pluggable index (see api.vector_index) proposes candidate rows;
+    scores always come from the matrices themselves.
     """
 
-    def __init__(self, use_redis: bool = True):
-        self.vectors: Dict[str, np.ndarray] = {}
+    def __init__(self, use_redis: bool = True, dim: Optional[int] = None, index: Optional[str] = None,
+                 connect: bool = True):
+        self.dim = dim
         self.metadata: Dict[str, Dict[str, Any]] = {}
         self.use_redis = use_redis
 
+        self._base = np.zeros((0, dim or 0), dtype=np.float32)    # read-only segment
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)  # delta segment
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._size = 0          # rows in use, base + delta (alive + tombstoned)
+        self._tombstones = 0
+        self._delta_tombstones = 0
+        self._sum = np.zeros(dim or 0, dtype=np.float64)  # running sum of live rows
+        self._lock = threading.RLock()
+        self.version = 0        # bumped on every content change (cache invalidation)
+        self._members_changed: List[str] = []      # ids added or removed, oldest first
+        self._members_base = 0                     # journal position of _members_changed[0]
+        self._members_resets = 0                   # bumped when the whole store is replaced
+        self._by_content: Dict[str, str] = {}      # metadata "content_key" -> track id
+
+        self.index = make_index(index)
+        self._epoch = 0                 # bumped when rows are renumbered
+        self._rebuilding = False
+        self._dirty: Optional[List[int]] = None  # rows written during a rebuild
+
+        self.log: Optional[VectorLog] = None
+        self._generation: Optional[str] = None      # snapshot currently mapped as the base
+        self._checkpointing = False
+        self._follower: Optional[threading.Thread] = None
+        self.load_progress = {"loaded": 0, "total": 0, "done": False}
+        self.profiles: Optional[UserProfileStore] = None
+        self.redis = None
+        self._open_lock = threading.Lock()
+        self._want_redis = use_redis
+
         if use_redis:
+            if connect:
+                self.connect_redis()
+            else:
+                self.use_redis = False      # until open()
+
+    def connect_redis(self):
+        try:
+            self.redis = get_redis()
+            self.redis.ping()
+            self.use_redis = True
+            print("🧠 Connected to Redis for vector persistence.")
+        except Exception as e:
+            print(f"⚠️ Redis unavailable, using in-memory store: {e}")
+            self.redis = None
+            self.use_redis = False
+        if self.profiles is not None:
+            self.profiles.redis = self.redis
+
+    @property
+    def vectors(self) -> VectorView:
+        """Dict-like view of track_id → normalized embedding."""
+        return VectorView(self)
+
+    # ────────────────────────────────────────────────
+    # 🔹 Matrix bookkeeping
+    # ────────────────────────────────────────────────
+    def _rows(self) -> _Rows:
+        return _Rows(self._base, self._matrix, self._size)
+
+    def _row(self, row: int) -> np.ndarray:
+        base_rows = len(self._base)
+        return self._base[row] if row < base_rows else self._matrix[row - base_rows]
+
+    def _grow(self, needed: int):
+        """Ensure room for `needed` rows, doubling capacity to amortize appends."""
+        base_rows = len(self._base)
+        capacity = self._matrix.shape[0]
+        if needed - base_rows <= capacity:
+            return
+        new_capacity = max(needed - base_rows, capacity * 2, MIN_CAPACITY)
+        used = self._size - base_rows
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:used] = self._matrix[:used]
+        alive = np.zeros(base_rows + new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._matrix, self._alive = matrix, alive
+
+    def _note_member(self, track_id: str):
+        """Journal a track id whose membership may have changed; drops the older half when full."""
+        self._members_changed.append(track_id)
+        if len(self._members_changed) > MEMBERSHIP_JOURNAL:
+            drop = len(self._members_changed) // 2
+            del self._members_changed[:drop]
+            self._members_base += drop
+
+    def _set_metadata(self, track_id: str, metadata: Optional[Dict[str, Any]]):
+        """Set a track's metadata (lock held), keeping the content-key index in step."""
+        self._drop_metadata(track_id)
+        self.metadata[track_id] = metadata = metadata or {}
+        key = metadata.get("content_key")
+        if key:
+            self._by_content[key] = track_id
+
+    def _drop_metadata(self, track_id: str):
+        old = self.metadata.pop(track_id, None)
+        key = old.get("content_key") if old else None
+        if key and self._by_content.get(key) == track_id:
+            del self._by_content[key]
+
+    def _kill(self, row: int):
+        """Tombstone a row (caller drops it from _row_of)."""
+        self._note_member(self._ids[row])
+        self._sum -= self._row(row)
+        self._alive[row] = False
+        self._ids[row] = None
+        self.version += 1
+        self._tombstones += 1
+        if row >= len(self._base):
+            self._delta_tombstones += 1
+
+    def _put(self, track_id: str, vector: np.ndarray):
+        """Write a normalized row, reusing the track's delta row on update."""
+        vec = _normalize(vector)
+        if self.dim is None:
+            self.dim = vec.shape[0]
+            self._base = np.zeros((0, self.dim), dtype=np.float32)
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._sum = np.zeros(self.dim, dtype=np.float64)
+        if vec.shape[0] != self.dim:
+            raise ValueError(f"Vector dim {vec.shape[0]} != store dim {self.dim}")
+
+        row = self._row_of.get(track_id)
+        if row is not None and row < len(self._base):
+            # Base segment is read-only: retire the old row and append
+            self._kill(row)
+            row = None
+        if row is None:
+            self._note_member(track_id)
+            self._grow(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._ids.append(track_id)
+            self._row_of[track_id] = row
+            self._alive[row] = True
+        else:
+            self._sum -= self._matrix[row - len(self._base)]
+        self._matrix[row - len(self._base)] = vec
+        self._sum += vec
+        self.version += 1
+
+        self.index.add(row, vec)
+        if self._dirty is not None:
+            self._dirty.append(row)
+
+    def compact(self):
+        """Drop tombstoned delta rows and renumber them (base rows stay put)."""
+        with self._lock:
+            if not self._delta_tombstones:
+                return
+            base_rows = len(self._base)
+            keep = np.flatnonzero(self._alive[base_rows:self._size])
+            capacity = max(len(keep), MIN_CAPACITY)
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:len(keep)] = self._matrix[keep]
+            alive = np.zeros(base_rows + capacity, dtype=bool)
+            alive[:base_rows] = self._alive[:base_rows]
+            alive[base_rows:base_rows + len(keep)] = True
+
+            delta_ids = [self._ids[base_rows + i] for i in keep]
+            self._ids = self._ids[:base_rows] + delta_ids
+            for i, tid in enumerate(delta_ids):
+                self._row_of[tid] = base_rows + i
+            self._matrix, self._alive = matrix, alive
+            self._size = base_rows + len(keep)
+            self._tombstones -= self._delta_tombstones
+            self._delta_tombstones = 0
+
+            # Row numbers changed: fall back to exact scans until rebuilt
+            self._epoch += 1
+            self.index = self.index.spawn()
+            self._maybe_rebuild()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Snapshot attach / export (see recommender.persistence)
+    # ────────────────────────────────────────────────
+    def attach_snapshot(self, ids: List[str], matrix: np.ndarray, metadata: Dict[str, Dict[str, Any]]):
+        """
+        Replace the store contents with a snapshot. `matrix` (normalized
+        float32 rows) becomes the read-only base segment and is never
+        copied, so a memory-mapped snapshot loads near-instantly.
+        """
+        with self._lock:
+            if matrix.shape[1]:
+                self.dim = matrix.shape[1]
+            else:
+                # An empty snapshot is (0, 0): keep the configured dim (or let the first _put set it)
+                matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._base = matrix
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._alive = np.ones(len(ids), dtype=bool)
+            self._ids = list(ids)
+            self._row_of = {tid: i for i, tid in enumerate(self._ids)}
+            self._size = len(ids)
+            self._tombstones = self._delta_tombstones = 0
+            self.version += 1
+            self._members_changed, self._members_base = [], 0
+            self._members_resets += 1
+            self.metadata = dict(metadata)
+            self._by_content = {meta["content_key"]: tid for tid, meta in self.metadata.items()
+                                if meta.get("content_key")}
+            self._sum = np.zeros(self.dim or 0, dtype=np.float64)
+            for start in range(0, len(ids), 65536):
+                self._sum += matrix[start:start + 65536].sum(axis=0, dtype=np.float64)
+
+            self._epoch += 1
+            self.index = self.index.spawn()
+            self._maybe_rebuild()
+
+    def export_rows(self, chunk_rows: int = 65536):
+        """
+        Return (ids, dim, chunks, metadata) for the live rows, where
+        `chunks` yields normalized row blocks in id order.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            ids = [self._ids[r] for r in live]
+            metadata = {tid: self.metadata.get(tid, {}) for tid in ids}
+            rows = self._rows()
+            dim = self.dim or 0
+
+        def chunks():
+            for start in range(0, len(live), chunk_rows):
+                yield rows[live[start:start + chunk_rows]]
+
+        return ids, dim, chunks(), metadata
+
+    # ────────────────────────────────────────────────
+    # 🔹 Background index rebuilds
+    # ────────────────────────────────────────────────
+    def _rebuild_args(self) -> tuple:
+        """Snapshot what a rebuild needs and start tracking writes (lock held)."""
+        self._rebuilding = True
+        self._dirty = []
+        return self._epoch, self._rows(), self._alive[:self._size].copy()
+
+    def _maybe_rebuild(self):
+        """Start a background rebuild if the index asks for one (lock held)."""
+        if self._rebuilding or not self.index.needs_rebuild(len(self._row_of)):
+            return
+        threading.Thread(target=self._rebuild, args=self._rebuild_args(), daemon=True).start()
+
+    def _rebuild(self, epoch: int, matrix: _Rows, alive: np.ndarray):
+        """Train a fresh index off-lock, replay rows written meanwhile, then swap."""
+        try:
+            fresh = self.index.spawn()
+            fresh.build(matrix, alive)
+            with self._lock:
+                if epoch == self._epoch:
+                    for row in self._dirty or []:
+                        if self._alive[row]:
+                            fresh.add(row, self._row(row))
+                    self.index = fresh
+                    print(f"🧭 Rebuilt {fresh.kind} index over {len(self._row_of)} vectors.")
+        except Exception as e:
+            print(f"⚠️ Index rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._dirty = None
+                if epoch != self._epoch:
+                    self._maybe_rebuild()
+
+    def rebuild_index(self, wait: bool = False):
+        """Rebuild the index from the current matrix (blocking if `wait`)."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            args = self._rebuild_args()
+        if wait:
+            self._rebuild(*args)
+        else:
+            threading.Thread(target=self._rebuild, args=args, daemon=True).start()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Write-ahead log + background checkpoints
+    # ────────────────────────────────────────────────
+    def attach_log(self, log: VectorLog, generation: Optional[str]):
+        """Replay `log` on top of snapshot `generation`, then log every write."""
+        with self._lock:
+            replayed = log.replay(self._apply_logged, generation, truncate=log.is_writer)
+            log.open(generation)
+            self.log = log
+            self._generation = generation
+        if replayed:
+            print(f"🔁 Replayed {replayed} logged vector writes.")
+
+    def _apply_logged(self, op: int, track_id: str, vector: Optional[np.ndarray], metadata: Dict[str, Any]):
+        if op == OP_PUT:
+            self._put(track_id, vector)
+            self._set_metadata(track_id, metadata)
+        elif op == OP_DELETE:
+            row = self._row_of.pop(track_id, None)
+            if row is not None:
+                self._kill(row)
+                self._drop_metadata(track_id)
+
+    def _maybe_checkpoint(self):
+        """Start a background checkpoint once the log is long enough (lock held, writer only)."""
+        if (self.log is None or not self.log.is_writer or self._checkpointing
+                or self.log.records < CHECKPOINT_RECORDS):
+            return
+        threading.Thread(target=self.checkpoint, daemon=True).start()
+
+    def _remap(self, snapshot):
+        """Map `snapshot` as the base and replay its logs from the start (lock held)."""
+        self.attach_snapshot(snapshot.ids, snapshot.matrix, snapshot.metadata)
+        self._generation = snapshot.manifest["generation"]
+        self.log.reset()
+        self.log.follow(self._apply_logged, self._generation)
+
+    def checkpoint(self, rebase: bool = True) -> Optional[str]:
+        """
+        Fold the write-ahead log into a new snapshot generation.
+        Only the writer process checkpoints (others return None). Under
+        the exclusive log lock it applies the other workers' pending
+        appends and switches everyone to the next generation's log; the
+        snapshot is written off-lock and published by atomic rename, and
+        only then are superseded logs deleted. With `rebase` the store
+        re-maps the new snapshot as its base, freeing the delta; the
+        other workers re-map it on their next refresh().
+        """
+        with self._lock:
+            if self.log is None or not self.log.is_writer or self._checkpointing:
+                return None
+            self._checkpointing = True
+            name = next_generation(self.log.index_dir)
+            with self.log.exclusive():
+                self.log.follow(self._apply_logged, self._generation)
+                superseded = self.log.rotate(name)
+            ids, dim, chunks, metadata = self.export_rows()
+
+        try:
+            write_snapshot(ids, dim, chunks, metadata, self.log.index_dir, name)
+            for path in superseded:
+                os.remove(path)
+            if rebase:
+                snapshot = load_index(self.log.index_dir)
+                with self._lock:
+                    self._remap(snapshot)
+            return name
+        except Exception as e:
+            print(f"⚠️ Checkpoint failed: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._checkpointing = False
+
+    # ────────────────────────────────────────────────
+    # 🔹 Sharing one index across worker processes
+    # ────────────────────────────────────────────────
+    def open(self, log: Optional[VectorLog] = None, follow: bool = True) -> bool:
+        """
+        Load the shared index: map the published snapshot (the first
+        process to take the writer lock seeds it from Redis), replay the
+        log and start following the other workers. Idempotent; returns
+        True if this call did the loading.
+        """
+        with self._open_lock:
+            if self.log is not None:
+                return False
+            if self._want_redis and self.redis is None:
+                self.connect_redis()
+            log = log or VectorLog()
+            log.try_acquire_writer()
+            snapshot = load_index(log.index_dir, migrate=log.is_writer)
+            if snapshot is not None:
+                self.attach_snapshot(snapshot.ids, snapshot.matrix, snapshot.metadata)
+            elif log.is_writer:
+                self.load_from_redis()
+            self.attach_log(log, snapshot.manifest["generation"] if snapshot else None)
+            if snapshot is None and log.is_writer and len(self):
+                self.checkpoint()       # publish what Redis held for the other workers to map
+            if follow:
+                self.start_follower()
+            return True
+
+    def refresh(self) -> bool:
+        """
+        Catch up with the other processes sharing the index directory:
+        re-map a newer published snapshot (page-cache shared, nothing is
+        copied), otherwise apply their new log records. Also takes over
+        checkpointing if the writer process died. Returns True if the
+        store changed.
+        """
+        log = self.log
+        if log is None:
+            return False
+        if not log.is_writer and log.try_acquire_writer():
+            print(f"👑 Worker {os.getpid()} took over vector checkpoints.")
+
+        generation = current_generation(log.index_dir)
+        if generation is not None and generation != self._generation and not self._checkpointing:
             try:
-                self.redis = redis.Redis(
-                    host="localhost", port=6379, db=0, decode_responses=True
-                )
-                self.redis.ping()
-                print("🧠 Connected to Redis for vector persistence.")
-            except Exception as e:
-                print(f"⚠️ Redis unavailable, using in-memory store: {e}")
-                self.redis = None
-                self.use_redis = False
+                snapshot = load_index(log.index_dir, migrate=False)
+            except FileNotFoundError:
+                return False        # pruned while we looked; the next refresh sees the newer one
+            if snapshot is not None:
+                with self._lock:
+                    self._remap(snapshot)
+                print(f"📂 Mapped vector snapshot {self._generation} ({len(self)} vectors).")
+                return True
+
+        with self._lock:
+            applied = log.follow(self._apply_logged, self._generation)
+            if applied:
+                self._maybe_rebuild()
+            self._maybe_checkpoint()
+        return applied > 0
+
+    def start_follower(self, interval: float = VECTOR_FOLLOW_SECONDS):
+        """Call refresh() every `interval` seconds on a daemon thread."""
+        if interval <= 0 or self._follower is not None:
+            return
+
+        def follow():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Vector store refresh failed: {e}")
+
+        self._follower = threading.Thread(target=follow, daemon=True)
+        self._follower.start()
 
     # ────────────────────────────────────────────────
     # 🔹 Add and persist vector
     # ────────────────────────────────────────────────
     def add_vector(self, track_id: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
         """Add or update a track embedding and optional metadata."""
-        self.vectors[track_id] = vector
-        self.metadata[track_id] = metadata or {}
+        with self._lock:
+            self._put(track_id, vector)
+            self._set_metadata(track_id, metadata)
+            if self.log is not None:
+                self.log.append(OP_PUT, track_id, vector, metadata)
+            self._maybe_rebuild()
+            self._maybe_checkpoint()
 
-        if self.use_redis and self.redis:
-            try:
-                self.redis.hset("vectors", track_id, json.dumps(vector.tolist()))
-                self.redis.hset("metadata", track_id, json.dumps(metadata or {}))
-            except Exception as e:
-                print(f"⚠️ Redis write failed: {e}")
+        self._redis_write({track_id: (vector, metadata)})
+
+    def add_vectors(self, items: Dict[str, Tuple[np.ndarray, Optional[Dict[str, Any]]]]):
+        """Bulk add/update: one lock acquisition and one pipelined Redis write."""
+        with self._lock:
+            for track_id, (vector, metadata) in items.items():
+                self._put(track_id, vector)
+                self._set_metadata(track_id, metadata)
+                if self.log is not None:
+                    self.log.append(OP_PUT, track_id, vector, metadata)
+            self._maybe_rebuild()
+            self._maybe_checkpoint()
+
+        self._redis_write(items)
+
+    def _redis_write(self, items: Dict[str, Tuple[np.ndarray, Optional[Dict[str, Any]]]]):
+        """Pipeline binary vectors + JSON metadata for many tracks in one round-trip."""
+        if not (self.use_redis and self.redis) or not items:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset("vectors", mapping={tid: _encode_vector(v) for tid, (v, _) in items.items()})
+            pipe.hset("metadata", mapping={tid: json.dumps(m or {}) for tid, (_, m) in items.items()})
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis write failed: {e}")
 
     # 🔹 Backward-compatible alias
     def add_track(self, track_id: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
         """Alias for add_vector() to support older routes."""
         return self.add_vector(track_id, vector, metadata)
 
+    # ────────────────────────────────────────────────
+    # 🔹 Remove vector (tombstone + lazy compaction)
+    # ────────────────────────────────────────────────
+    def remove_vector(self, track_id: str) -> bool:
+        """Tombstone a track's row; compacts once enough rows are dead."""
+        with self._lock:
+            row = self._row_of.pop(track_id, None)
+            if row is None:
+                return False
+            self._kill(row)
+            self._drop_metadata(track_id)
+            if self.log is not None:
+                self.log.append(OP_DELETE, track_id)
+            if self._delta_tombstones > COMPACT_RATIO * (self._size - len(self._base)):
+                self.compact()
+
+        if self.use_redis and self.redis:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.hdel("vectors", track_id)
+                pipe.hdel("metadata", track_id)
+                pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Redis delete failed: {e}")
+        return True
+
     # ────────────────────────────────────────────────
     # 🔹 Retrieve vector
     # ────────────────────────────────────────────────
     def get_vector(self, track_id: str) -> Optional[np.ndarray]:
-        if track_id in self.vectors:
-            return self.vectors[track_id]
+        """Return the (normalized) embedding for a track, if known."""
+        with self._lock:
+            row = self._row_of.get(track_id)
+            if row is not None:
+                return np.array(self._row(row))
 
         if self.use_redis and self.redis:
             data = self.redis.hget("vectors", track_id)
             if data:
-                vec = np.array(json.loads(data))
-                self.vectors[track_id] = vec
-                return vec
+                with self._lock:
+                    self._put(track_id, _decode_vector(data))
+                    self.metadata.setdefault(track_id, {})
+                    return np.array(self._row(self._row_of[track_id]))
         return None
 
     # ────────────────────────────────────────────────
-    # 🔹 Build a user’s mean embedding
+    # 🔹 Batched top-k similarity search
+    # ────────────────────────────────────────────────
+    def search(self, query: np.ndarray, top_k: int = 10, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        Return up to `top_k` (track_id, cosine similarity) pairs, best first.
+        The index narrows the candidate rows (unless `exact`), then one
+        matrix-vector product scores them and argpartition picks the top k.
+        """
+        with OPERATION_SECONDS.time("search"):
+            return self._search(query, top_k, exact)
+
+    def _search(self, query: np.ndarray, top_k: int, exact: bool) -> List[Tuple[str, float]]:
+        with self._lock:
+            size = self._size
+            if size == 0 or not self._row_of:
+                return []
+            q = _normalize(query)
+            if q.shape[0] != self.dim:
+                raise ValueError(f"Query dim {q.shape[0]} != store dim {self.dim}")
+            k = min(top_k, len(self._row_of))
+
+            rows = None if exact else self.index.candidates(q, k)
+            if rows is None:
+                scores = self._rows().scan(q)
+                if self._tombstones:
+                    scores[~self._alive[:size]] = -np.inf
+            else:
+                rows = np.unique(rows[rows < size])
+                rows = rows[self._alive[rows]]
+                scores = self._rows()[rows] @ q
+            ids = self._ids
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        row_of = top if rows is None else rows[top]
+        return [(ids[r], float(scores[i])) for i, r in zip(top, row_of)
+                if np.isfinite(scores[i]) and ids[r] is not None]
+
+    # ────────────────────────────────────────────────
+    # 🔹 User profile vector
     # ────────────────────────────────────────────────
     def get_user_vector(self, user_id: str) -> np.ndarray:
-        if not self.vectors:
-            return np.zeros(128)
-        arr = np.stack(list(self.vectors.values()))
-        return arr.mean(axis=0)
+        """
+        The user's time-decayed listening profile (see recommender.profiles);
+        users without history fall back to the catalog centroid, which is
+        maintained incrementally, so this never scans the catalog.
+        """
+        if self.profiles is not None:
+            vec = self.profiles.get(user_id)
+            if vec is not None and vec.shape[0] == self.dim:
+                return vec
+        with self._lock:
+            if not self._row_of:
+                return np.zeros(self.dim or 128)
+            return (self._sum / len(self._row_of)).astype(np.float32)
 
     # ────────────────────────────────────────────────
     # 🔹 Load from Redis (cold start recovery)
     # ────────────────────────────────────────────────
-    def load_from_redis(self):
+    def load_from_redis(self, chunk: int = REDIS_SCAN_CHUNK):
+        """
+        Bulk-load every vector with chunked HSCAN (+ one HMGET of metadata
+        per chunk), so no single reply holds the whole catalog.
+        Progress is tracked in `self.load_progress`.
+        """
         if not (self.use_redis and self.redis):
             return
         try:
-            all_vectors = self.redis.hgetall("vectors")
-            all_metadata = self.redis.hgetall("metadata")
+            self.load_progress = {"loaded": 0, "total": self.redis.hlen("vectors"), "done": False}
+            cursor = 0
+            while True:
+                cursor, batch = self.redis.hscan("vectors", cursor, count=chunk)
+                if batch:
+                    keys = list(batch)
+                    metas = self.redis.hmget("metadata", keys)
+                    with self._lock:
+                        for key, meta in zip(keys, metas):
+                            track_id = key.decode()
+                            self._put(track_id, _decode_vector(batch[key]))
+                            self._set_metadata(track_id, json.loads(meta) if meta else {})
+                    self.load_progress["loaded"] += len(keys)
+                if cursor == 0:
+                    break
 
-            for k, v in all_vectors.items():
-                self.vectors[k] = np.array(json.loads(v))
-                self.metadata[k] = json.loads(all_metadata.get(k, "{}"))
-            print(f"🔁 Synced {len(self.vectors)} vectors from Redis.")
+            with self._lock:
+                self._maybe_rebuild()
+            self.load_progress["done"] = True
+            print(f"🔁 Synced {len(self)} vectors from Redis.")
         except Exception as e:
             print(f"⚠️ Redis load failed: {e}")
 
+    def track_with_content(self, content_key: str) -> Optional[str]:
+        """Id of a stored track whose metadata records `content_key`, if any."""
+        with self._lock:
+            return self._by_content.get(content_key)
+
+    def membership_changes(self, since: Optional[Tuple[int, int]]) -> Tuple[Tuple[int, int], Optional[List[str]]]:
+        """
+        (cursor, ids): track ids added or removed since the caller's last
+        `cursor`, possibly with repeats, so per-track columns kept outside
+        the store can follow it without rescanning. ids is None when the
+        caller must rescan: first call, store replaced (snapshot mapped),
+        or the journal moved past `since`.
+        """
+        with self._lock:
+            cursor = (self._members_resets, self._members_base + len(self._members_changed))
+            if since is None or since[0] != self._members_resets or since[1] < self._members_base:
+                return cursor, None
+            return cursor, self._members_changed[since[1] - self._members_base:]
+
+    def content_version(self) -> tuple:
+        """
+        Version of the contents that compares across the processes sharing
+        the index: (snapshot generation, log bytes applied). Without a
+        shared log, or while our own appends are ahead of what we have
+        followed, it is this process's counter tagged with its pid, so it
+        never matches another worker's.
+        """
+        with self._lock:
+            position = self.log.position() if self.log is not None else None
+            if position is None:
+                return ("local", os.getpid(), self.version)
+            return (self._generation, position)
+
+    def stats(self) -> Dict[str, Any]:
+        """Sizes for /health and /metrics: mapped base vs private delta rows."""
+        base_rows = len(self._base)
+        return {
+            "vectors": len(self._row_of),
+            "dim": self.dim,
+            "base_rows": base_rows,
+            "delta_rows": self._size - base_rows,
+            "delta_bytes": int(self._matrix.nbytes),
+            "tombstones": self._tombstones,
+            "version": self.version,
+            "generation": self._generation,
+            "role": None if self.log is None else ("writer" if self.log.is_writer else "reader"),
+            "log_records": None if self.log is None else self.log.records,
+            "index": self.index.kind,
+        }
+
     # ────────────────────────────────────────────────
     # 🔹 Dict-like iteration support (fix legacy loops)
     # ────────────────────────────────────────────────
@@ -95,7 +796,7 @@ class VectorStore:
         return self.vectors.items()
 
     def __len__(self):
-        return len(self.vectors)
+        return len(self._row_of)
 
     def __iter__(self):
         return iter(self.vectors)
@@ -104,6 +805,29 @@ class VectorStore:
 # ────────────────────────────────────────────────
 # Instantiate shared store
 # ────────────────────────────────────────────────
-vector_store = VectorStore()
-vector_store.load_from_redis()
+# Nothing is loaded at import: vector_store.open() (run by the API's
+# warm-up, see api.lifecycle, or by CLI tools) maps the shared snapshot.
+# Every worker maps the same snapshot read-only and tails the same log;
+# one of them (the first to take writer.lock) seeds the index from Redis
+# and checkpoints, so the catalog is held once in the page cache, not
+# once per worker.
+vector_store = VectorStore(connect=False)
+
+
+def _played_vectors(user_id: str):
+    for track_id in user_streams.get(user_id, ()):
+        vec = vector_store.get_vector(track_id)
+        if vec is not None:
+            yield vec
+
+
+def _on_stream(user_id: str, track_id: str, ts: float):
+    vec = vector_store.get_vector(track_id)
+    if vec is not None:
+        user_profiles.observe(user_id, vec, ts)
+
 
+user_profiles = UserProfileStore(history=_played_vectors)     # Redis attached by open()
+vector_store.profiles = user_profiles
+# In the API, plays reach record_streams through api.lifecycle.play_follower
+stream_observers.append(_on_stream)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai_service.recommender import record_streams, sync_from_redis
+from ai_service.stream_consumer import StreamFollower
+from api.catalog import catalog
+from api.global_store import user_profiles, vector_store
+from api.location import locator
+from api.result_cache import connect_recommend_cache
+from recommender.trendflow import trend_store
+
+# ────────────────────────────────────────────────
+# 🚦 Application lifecycle: background warm-up + readiness
+# ────────────────────────────────────────────────
+# Requests (other than probes) wait this long for warm-up before a 503
+READY_WAIT_SECONDS = float(os.getenv("READY_WAIT_SECONDS", "10"))
+# Process start → serving must stay under this; warm-up never counts against it
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+
+def process_start_time() -> float:
+    """Wall-clock start of this process (interpreter launch), from /proc where available."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])     # field 22: starttime
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+def _load_trends():
+    trend_store.load()
+    trend_store.start_follower()
+
+
+def _load_catalog():
+    catalog.load()
+    catalog.start_watcher()
+
+
+# Each worker tails the listen stream itself, so every play reaches its
+# profile cache (the observer in api.global_store) and moves the user's
+# profile revision, which versions cached /recommend results
+play_follower = StreamFollower(apply=record_streams)
+
+
+def shutdown_profiles():
+    """Stop following plays, spill the hot profiles, and save where they end for the next start."""
+    play_follower.stop()
+    user_profiles.flush()
+    play_follower.save_position()
+
+
+class Lifecycle:
+    """
+    Import builds empty singletons only; the heavy loading (Redis sync,
+    snapshot mapping, catalog scan, offline tables) runs as ordered
+    warm-up steps on a background thread once the server is up, so the
+    first byte does not wait for it. Each step's state and duration are
+    reported by /health.
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], Any]]], started: Optional[float] = None):
+        self.steps = steps
+        self.started = process_start_time() if started is None else started
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self.timings: Dict[str, Optional[float]] = {"imported": None, "serving": None,
+                                                    "first_byte": None, "ready": None}
+        self.ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark(self, event: str):
+        """Record seconds since start for `event` (first occurrence only)."""
+        if self.timings.get(event) is None:
+            self.timings[event] = round(time.time() - self.started, 4)
+
+    # ────────────────────────────────────────────────
+    # 🔹 Warm-up
+    # ────────────────────────────────────────────────
+    def warm_up(self):
+        """Run every step in order; a failing step is reported, not fatal."""
+        for name, _ in self.steps:
+            self.status.setdefault(name, {"state": "pending"})
+        for name, step in self.steps:
+            entry = self.status[name]
+            entry["state"] = "loading"
+            start = time.time()
+            try:
+                step()
+                entry["state"] = "ready"
+            except Exception as e:
+                entry["state"] = "failed"
+                entry["error"] = str(e)
+                print(f"⚠️ Warm-up step {name} failed: {e}")
+            entry["seconds"] = round(time.time() - start, 3)
+        self.mark("ready")
+        self.ready.set()
+        print(f"✅ Warm-up complete {self.timings['ready']}s after start: "
+              + ", ".join(f"{name} {entry['seconds']}s" for name, entry in self.status.items()))
+
+    def start(self):
+        """Start warm-up in the background (once)."""
+        if self._thread is not None:
+            return
+        for name, _ in self.steps:
+            self.status.setdefault(name, {"state": "pending"})
+        self._thread = threading.Thread(target=self.warm_up, daemon=True, name="warm-up")
+        self._thread.start()
+
+    async def wait_ready(self, timeout: float = READY_WAIT_SECONDS) -> bool:
+        """Yield to the event loop until warm-up finishes or `timeout` passes."""
+        deadline = time.time() + timeout
+        while not self.ready.is_set():
+            if time.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    # ────────────────────────────────────────────────
+    # 🔹 Reporting
+    # ────────────────────────────────────────────────
+    @property
+    def state(self) -> str:
+        if not self.ready.is_set():
+            return "warming_up"
+        return "degraded" if any(e["state"] == "failed" for e in self.status.values()) else "ready"
+
+    def health(self) -> Dict[str, Any]:
+        serving = self.timings["serving"]
+        return {
+            "state": self.state,
+            "ready": self.ready.is_set(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "startup_s": dict(self.timings),
+            "startup_budget_s": STARTUP_BUDGET_SECONDS,
+            "within_budget": serving is not None and serving <= STARTUP_BUDGET_SECONDS,
+            "steps": {name: dict(entry) for name, entry in self.status.items()},
+        }
+
+
+lifecycle = Lifecycle([
+    ("result_cache", connect_recommend_cache),
+    ("analytics", sync_from_redis),
+    ("trends", _load_trends),
+    ("catalog", _load_catalog),
+    ("vectors", vector_store.open),
+    ("plays", play_follower.start),     # after vectors: plays are folded in as track embeddings
+    ("locations", locator.load),
+])
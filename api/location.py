@@ -0,0 +1,298 @@
+"""
+Location resolution for request handlers.
+
+Order of preference:
+  1. client-supplied lat/lng (query params / form fields)
+  2. client-supplied city, looked up in the offline city table
+  3. the client IP, looked up in the offline IP table
+  4. optionally (GEO_NETWORK_FALLBACK=1), a network geocoder lookup for
+     public addresses, bounded by GEO_LOOKUP_TIMEOUT and run on a small
+     thread pool so it never blocks the event loop
+
+Results (including misses) are kept in a TTL cache, so a slow or absent
+network costs at most one bounded lookup per key per GEO_MISS_TTL.
+
+Offline tables are plain CSV files with a header row:
+  GEO_IP_TABLE   network,lat,lng,city,country     (network: CIDR, v4 or v6)
+  GEO_CITY_TABLE city,lat,lng,country
+"""
+import asyncio
+import bisect
+import csv
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+GEO_IP_TABLE = os.getenv("GEO_IP_TABLE", "data/geo/ip_locations.csv")
+GEO_CITY_TABLE = os.getenv("GEO_CITY_TABLE", "data/geo/cities.csv")
+# Off by default: with it on, a cache miss makes an outbound geocoder call from the request path
+GEO_NETWORK_FALLBACK = os.getenv("GEO_NETWORK_FALLBACK", "0") == "1"
+GEO_LOOKUP_TIMEOUT = float(os.getenv("GEO_LOOKUP_TIMEOUT", "1.5"))
+GEO_CACHE_TTL = float(os.getenv("GEO_CACHE_TTL", "3600"))
+GEO_MISS_TTL = float(os.getenv("GEO_MISS_TTL", "60"))
+GEO_CACHE_SIZE = 10_000
+
+
+class Location(NamedTuple):
+    lat: Optional[float]
+    lng: Optional[float]
+    city: Optional[str] = None
+    country: Optional[str] = None
+    source: str = "unknown"
+
+    @property
+    def known(self) -> bool:
+        return self.lat is not None and self.lng is not None
+
+
+UNKNOWN = Location(None, None)
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _TTLCache:
+    """Small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = GEO_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Location]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Location]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, loc = entry
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return loc
+
+    def put(self, key: str, loc: Location, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, loc)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LocationResolver:
+    def __init__(self, ip_table: str = GEO_IP_TABLE, city_table: str = GEO_CITY_TABLE,
+                 network: bool = GEO_NETWORK_FALLBACK, timeout: float = GEO_LOOKUP_TIMEOUT,
+                 load_tables: bool = True):
+        self.network = network
+        self.timeout = timeout
+        self.cache = _TTLCache()
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ranges: Dict[int, List[Tuple[int, int, Location]]] = {4: [], 6: []}
+        self._cities: Dict[str, Location] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.RLock()   # done-callbacks may run inline under it
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="geo-lookup")
+        self.stats = {"client": 0, "cache": 0, "table": 0, "network": 0, "miss": 0, "timeout": 0}
+        self.ip_table, self.city_table = ip_table, city_table
+        self.loaded = False
+        if load_tables:
+            self.load()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Offline tables
+    # ────────────────────────────────────────────────
+    def load(self):
+        """Read the offline tables (once)."""
+        with self._lock:
+            if self.loaded:
+                return
+            self._load_ip_table(self.ip_table)
+            self._load_city_table(self.city_table)
+            self.loaded = True
+
+    def _load_ip_table(self, path: str):
+        if not os.path.exists(path):
+            return
+        rows = {4: [], 6: []}
+        with open(path, newline="") as f:
+            for rec in csv.DictReader(f):
+                try:
+                    net = ipaddress.ip_network(rec["network"].strip(), strict=False)
+                except (KeyError, ValueError):
+                    continue
+                loc = Location(_float(rec.get("lat")), _float(rec.get("lng")),
+                               rec.get("city") or None, rec.get("country") or None, "ip_table")
+                rows[net.version].append((int(net.network_address), int(net.broadcast_address), loc))
+        for version, ranges in rows.items():
+            ranges.sort(key=lambda r: r[0])
+            self._ranges[version] = ranges
+            self._starts[version] = [r[0] for r in ranges]
+        print(f"📂 IP location table loaded: {sum(len(r) for r in rows.values())} networks")
+
+    def _load_city_table(self, path: str):
+        if not os.path.exists(path):
+            return
+        with open(path, newline="") as f:
+            for rec in csv.DictReader(f):
+                name = (rec.get("city") or "").strip()
+                lat, lng = _float(rec.get("lat")), _float(rec.get("lng"))
+                if name and lat is not None and lng is not None:
+                    self._cities.setdefault(name.lower(), Location(lat, lng, name, rec.get("country") or None, "city_table"))
+        print(f"📂 City location table loaded: {len(self._cities)} cities")
+
+    def _ip_lookup(self, ip: str) -> Optional[Location]:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        value = int(addr)
+        i = bisect.bisect_right(self._starts[addr.version], value) - 1
+        if i >= 0:
+            start, end, loc = self._ranges[addr.version][i]
+            if start <= value <= end:
+                return loc
+        return None
+
+    # ────────────────────────────────────────────────
+    # 🔹 Network fallback (thread pool, bounded)
+    # ────────────────────────────────────────────────
+    @staticmethod
+    def _network_lookup(kind: str, query: str) -> Location:
+        import geocoder
+        try:
+            geo = geocoder.arcgis(query) if kind == "city" else geocoder.ip(query)
+        except Exception as e:
+            print(f"⚠️ Location lookup failed for {kind} {query}: {e}")
+            return UNKNOWN
+        if not geo.ok or geo.lat is None:
+            return UNKNOWN
+        return Location(float(geo.lat), float(geo.lng), geo.city or (query if kind == "city" else None),
+                        geo.country, "network")
+
+    def _start_lookup(self, key: str, kind: str, query: str) -> Future:
+        """One in-flight lookup per key; its result lands in the cache even after a caller times out."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._pool.submit(self._network_lookup, kind, query)
+                self._inflight[key] = future
+
+                def done(f: Future, key=key):
+                    with self._lock:
+                        self._inflight.pop(key, None)
+                    loc = f.result()
+                    self.cache.put(key, loc, GEO_CACHE_TTL if loc.known else GEO_MISS_TTL)
+
+                future.add_done_callback(done)
+        return future
+
+    # ────────────────────────────────────────────────
+    # 🔹 Resolution
+    # ────────────────────────────────────────────────
+    def _count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _local(self, lat, lng, city, ip) -> Tuple[Optional[Location], Optional[Tuple[str, str, str]]]:
+        """Resolve without the network: (location, or the network lookup to try)."""
+        if lat is not None and lng is not None:
+            self._count("client")
+            return Location(float(lat), float(lng), city, None, "client"), None
+
+        if city:
+            loc = self._cities.get(city.strip().lower())
+            if loc is not None:
+                self._count("table")
+                return loc, None
+            key, kind, query = f"city:{city.strip().lower()}", "city", city.strip()
+        else:
+            if ip:
+                loc = self._ip_lookup(ip)
+                if loc is not None:
+                    self._count("table")
+                    return loc, None
+            # Private/loopback clients are unknown: a geocoder would locate the server instead
+            if not _is_public_ip(ip):
+                self._count("miss")
+                return UNKNOWN, None
+            key, kind, query = f"ip:{ip}", "ip", ip
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache")
+            return cached, None
+        if not self.network:
+            self._count("miss")
+            return UNKNOWN, None
+        return None, (key, kind, query)
+
+    def resolve(self, lat: Optional[float] = None, lng: Optional[float] = None,
+                city: Optional[str] = None, ip: Optional[str] = None) -> Location:
+        """Blocking resolve (for threadpool handlers); network wait bounded by `timeout`."""
+        loc, lookup = self._local(lat, lng, city, ip)
+        if loc is not None:
+            return loc
+        future = self._start_lookup(*lookup)
+        try:
+            loc = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._count("timeout")
+            return UNKNOWN
+        self._count("network" if loc.known else "miss")
+        return loc
+
+    async def resolve_async(self, lat: Optional[float] = None, lng: Optional[float] = None,
+                            city: Optional[str] = None, ip: Optional[str] = None) -> Location:
+        """Event-loop friendly resolve: awaits the network lookup for at most `timeout`."""
+        loc, lookup = self._local(lat, lng, city, ip)
+        if loc is not None:
+            return loc
+        wrapped = asyncio.wrap_future(self._start_lookup(*lookup))
+        done, _ = await asyncio.wait({wrapped}, timeout=self.timeout)
+        if not done:
+            self._count("timeout")
+            return UNKNOWN
+        loc = wrapped.result()
+        self._count("network" if loc.known else "miss")
+        return loc
+
+    def info(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "ip_networks": sum(len(r) for r in self._ranges.values()),
+            "cities": len(self._cities),
+            "cached": len(self.cache),
+            "network_fallback": self.network,
+            "timeout_s": self.timeout,
+            **stats,
+        }
+
+
+def _is_public_ip(value: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(value).is_global
+    except ValueError:
+        return False
+
+
+def client_ip(request) -> Optional[str]:
+    """Client address, honouring the first X-Forwarded-For hop."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+locator = LocationResolver(load_tables=False)     # tables read by the API's warm-up, see api.lifecycle
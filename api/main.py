@@ -1,13 +1,60 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from api.catalog import catalog
+from api.global_store import vector_store
+from api.lifecycle import READY_WAIT_SECONDS, STARTUP_BUDGET_SECONDS, lifecycle, shutdown_profiles
+from api.metrics import (
+    CONTENT_TYPE, EMBED_FILES, OPERATION_ERRORS, OPERATION_SECONDS, REGISTRY, TREND_UPDATES,
+    Gauge, TimingMiddleware, timed_maintenance,
+)
+from api.result_cache import recommend_cache
 from api.routes_recommend import router as recommend_router
 from api.routes_embed import router as embed_router
 from api.routes_discover import router as discover_router
 from api.routes_artist import router as artist_router
-from recommender.trendflow import auto_decay_and_archive
-import os, time, atexit
+from api.routes_embed import embedding_cache
+from embeddings.worker_pool import embedding_pool
+from recommender.trendflow import auto_decay_and_archive, trend_store
+import os, time
 from apscheduler.schedulers.background import BackgroundScheduler
 
-app = FastAPI(title="AI Core Service", version="0.3")
+# Answered before warm-up completes (liveness / readiness probes, metrics, docs)
+PROBE_PATHS = {"/", "/health", "/health/ready", "/metrics", "/docs", "/openapi.json"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here may block on data: loading happens in the warm-up thread
+    lifecycle.start()
+    lifecycle.mark("serving")
+    serving = lifecycle.timings["serving"]
+    if serving > STARTUP_BUDGET_SECONDS:
+        print(f"⚠️ Startup took {serving:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)")
+    print(f"🚀 AI Core Service accepting requests {serving:.2f}s after process start")
+    yield
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    embedding_pool.shutdown()
+    shutdown_profiles()
+
+
+app = FastAPI(title="AI Core Service", version="0.3", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    """Hold requests that need loaded data until warm-up finishes (503 after READY_WAIT_SECONDS)."""
+    if request.url.path not in PROBE_PATHS and not await lifecycle.wait_ready(READY_WAIT_SECONDS):
+        return JSONResponse({"status": "warming_up", "health": "/health"}, status_code=503,
+                            headers={"Retry-After": "1"})
+    response = await call_next(request)
+    lifecycle.mark("first_byte")
+    return response
+
+
+app.add_middleware(TimingMiddleware)    # outermost: latency includes any warm-up wait
+
 
 # Include routers
 app.include_router(recommend_router, prefix="/recommend", tags=["recommendations"])
@@ -21,12 +68,97 @@ def root():
 
 @app.get("/health")
 def health():
+    """Liveness (always 200 while the process serves) plus warm-up progress and sizes."""
     try:
-        return {"status": "ok", "uptime_check": True}
+        return {"status": "ok", "uptime_check": True, **lifecycle.health(), "stats": service_stats()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: 503 until every warm-up step has run."""
+    report = lifecycle.health()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+# --------- 📏 Metrics (Prometheus text at /metrics) ---------
+def rss_bytes() -> int:
+    """Resident memory of this process (mapped snapshot pages included once touched)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def redis_ping_seconds():
+    client = vector_store.redis
+    if client is None:
+        return None
+    start = time.perf_counter()
+    client.ping()
+    return time.perf_counter() - start
+
+
+def service_stats():
+    return {
+        "vectors": vector_store.stats(),
+        "catalog": catalog.stats(),
+        "trending_tracks": len(trend_store),
+        "embed_queue": {"pending": embedding_pool.pending, "max_pending": embedding_pool.max_pending},
+        "recommend_cache_hit_rate": recommend_cache.stats()["hit_rate"],
+        "rss_bytes": rss_bytes(),
+    }
+
+
+def _cache_gauge(field):
+    def read():
+        values = {("recommend",): recommend_cache.stats()[field]}
+        embed = embedding_cache.stats()
+        if field in embed:
+            values[("embedding",)] = embed[field]
+        return values
+    return read
+
+
+def _on_embedding_job(job):
+    op = "embed" if job.files == 1 else "embed_batch"
+    OPERATION_SECONDS.observe(job.finished - job.created, op)
+    EMBED_FILES.inc("done" if job.state == "done" else "failed", amount=job.files)
+    if job.state != "done":
+        OPERATION_ERRORS.inc(op)
+
+
+def _on_trend_change(op, track_ids):
+    # Archives have their own counter; followed changes are counted by the process that made them
+    if op == "boost":
+        TREND_UPDATES.inc(amount=len(track_ids))
+
+
+Gauge("app_ready", "1 once warm-up has finished.", fn=lambda: lifecycle.ready.is_set())
+Gauge("process_resident_memory_bytes", "Resident set size.", fn=rss_bytes)
+Gauge("vector_store_vectors", "Live vectors in the store.", fn=lambda: len(vector_store))
+Gauge("vector_store_delta_bytes", "Private (unmapped) delta segment size.",
+      fn=lambda: vector_store.stats()["delta_bytes"])
+Gauge("vector_store_version", "Store content version.", fn=lambda: vector_store.version)
+Gauge("embed_queue_depth", "Embedding jobs in flight.", fn=lambda: embedding_pool.pending)
+Gauge("embed_queue_capacity", "Embedding jobs accepted before 503s.", fn=lambda: embedding_pool.max_pending)
+Gauge("catalog_tracks", "Tracks in the discovery catalog.", fn=lambda: len(catalog))
+Gauge("trend_tracks", "Tracks with a TrendFlow score.", fn=lambda: len(trend_store))
+Gauge("cache_hit_ratio", "Lifetime hit ratio per cache.", ("cache",), fn=_cache_gauge("hit_rate"))
+Gauge("cache_entries", "Entries per cache.", ("cache",), fn=_cache_gauge("entries"))
+Gauge("redis_ping_seconds", "Redis round-trip measured at scrape time.", fn=redis_ping_seconds)
+embedding_pool.listeners.append(_on_embedding_job)
+trend_store.listeners.append(_on_trend_change)
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 # --------- 🧠 Dynamic Maintenance Scheduler ---------
 scheduler = BackgroundScheduler()
 
@@ -48,15 +180,15 @@ def get_activity_level():
     return "low"
 
 
-def adaptive_interval():
-    level = get_activity_level()
+def adaptive_interval(level=None):
+    level = level or get_activity_level()
     return {"high": 6, "medium": 12}.get(level, 48)
 
 
 def scheduled_maintenance():
-    result = auto_decay_and_archive(threshold=0.3)
+    result = timed_maintenance(auto_decay_and_archive, threshold=0.3)
     level = get_activity_level()
-    interval = adaptive_interval()
+    interval = adaptive_interval(level)
     print(f"🧠 [TrendFlow] Maintenance run complete: {result}")
     print(f"📈 Activity: {level.upper()} — Next run in {interval} hours")
 
@@ -66,14 +198,17 @@ def scheduled_maintenance():
     scheduler.add_job(scheduled_maintenance, "interval", hours=interval)
 
 
-# --- Startup and shutdown hooks ---
-print(f"🧭 System boot: Activity level = {get_activity_level().upper()}")
-print(f"🕒 Initial maintenance interval = {adaptive_interval()} hours")
-
-if not scheduler.running:
+def start_scheduler():
+    """Last warm-up step: one activity scan, then the maintenance schedule."""
+    if scheduler.running:
+        return
+    level = get_activity_level()
+    print(f"🧭 System boot: Activity level = {level.upper()}")
+    print(f"🕒 Initial maintenance interval = {adaptive_interval(level)} hours")
     scheduler.add_job(scheduled_maintenance, "interval", hours=24)
     scheduler.start()
-    atexit.register(lambda: scheduler.shutdown())
 
-print("🚀 AI Core Service initialized and running on port 8080")
+
+lifecycle.steps.append(("scheduler", start_scheduler))
+lifecycle.mark("imported")
 
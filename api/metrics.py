@@ -0,0 +1,227 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# ────────────────────────────────────────────────
+# 📏 In-process metrics, rendered as Prometheus text (no client library)
+# ────────────────────────────────────────────────
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+GaugeValue = Union[float, Dict[Labels, float], None]
+
+
+def _fmt(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return str(int(value)) if float(value).is_integer() and abs(value) < 1e15 else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_label_str(self.labelnames, labels)} {_fmt(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value: set() explicitly, or pass `fn` to read it at
+    scrape time (a number, or {label values: number} for labelled gauges).
+    """
+    kind = "gauge"
+
+    def __init__(self, *args, fn: Optional[Callable[[], GaugeValue]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fn = fn
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def samples(self):
+        values = dict(self._values)
+        if self.fn is not None:
+            try:
+                current = self.fn()
+            except Exception as e:
+                print(f"⚠️ Gauge {self.name} failed: {e}")
+                current = None
+            if isinstance(current, dict):
+                values.update(current)
+            elif current is not None:
+                values[()] = float(current)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_label_str(self.labelnames, labels)} {_fmt(value)}"
+
+
+class Histogram(_Metric):
+    """Bucketed observations (latencies by default) per label set, plus sum and count."""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List] = {}      # labels → [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                yield f"{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labelnames, labels)} {_fmt(total)}"
+            yield f"{self.name}_count{_label_str(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ────────────────────────────────────────────────
+# 🔹 Per-route timing (pure ASGI: no per-request task or body copy)
+# ────────────────────────────────────────────────
+def route_template(scope) -> str:
+    """Matched route path with its prefix (e.g. /embed/jobs/{job_id}); "unmatched" for 404s."""
+    fastapi_scope = scope.get("fastapi")
+    context = fastapi_scope.get("effective_route_context") if isinstance(fastapi_scope, dict) else None
+    # Newer FastAPI nests included routers (scope["route"] lacks the prefix); older ones copy full routes
+    return getattr(context, "path", None) or getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class TimingMiddleware:
+    """Counts and times every HTTP request by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = route_template(scope)       # template, not the raw path: bounded label set
+            HTTP_SECONDS.observe(time.perf_counter() - start, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status[0]))
+
+
+# ────────────────────────────────────────────────
+# 🔹 Core metrics (scrape-time gauges are wired in api.main)
+# ────────────────────────────────────────────────
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by method, route and status.",
+                        ("method", "route", "status"))
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by method and route.",
+                         ("method", "route"))
+OPERATION_SECONDS = Histogram("operation_duration_seconds",
+                              "Latency of core operations (search, embed, discover, trending, trend maintenance).",
+                              ("op",))
+OPERATION_ERRORS = Counter("operation_errors_total", "Failed core operations.", ("op",))
+EMBED_FILES = Counter("embed_files_total", "Audio files through the embedding pool, by outcome.", ("outcome",))
+TREND_UPDATES = Counter("trend_updates_total", "TrendFlow score boosts (one per track per update).")
+TREND_ARCHIVED = Counter("trend_archived_total", "Tracks archived by TrendFlow maintenance.")
+TREND_MAINTENANCE_LAST = Gauge("trend_maintenance_last_run_timestamp_seconds",
+                               "Unix time of the last TrendFlow maintenance run.")
+
+
+def timed_maintenance(run: Callable[..., Dict], **kwargs) -> Dict:
+    """Run a TrendFlow maintenance pass (e.g. auto_decay_and_archive), recording its duration and outcome."""
+    with OPERATION_SECONDS.time("trend_maintenance"):
+        result = run(**kwargs)
+    TREND_ARCHIVED.inc(amount=result.get("archived", 0))
+    TREND_MAINTENANCE_LAST.set(time.time())
+    return result
@@ -0,0 +1,54 @@
+import os
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# ────────────────────────────────────────────────
+# 🎯 Composite scoring for /discover/ranked
+# ────────────────────────────────────────────────
+# score = audio * w_audio + context similarity * w_context + distance factor * w_distance
+RANK_WEIGHTS = {
+    "audio": float(os.getenv("RANK_WEIGHT_AUDIO", "0.4")),
+    "context": float(os.getenv("RANK_WEIGHT_CONTEXT", "0.4")),
+    "distance": float(os.getenv("RANK_WEIGHT_DISTANCE", "0.2")),
+}
+AUDIO_SIM_EMBEDDED = 0.5    # placeholder audio similarity for tracks in the vector store
+AUDIO_SIM_OTHER = 0.3
+
+
+def resolve_weights(overrides: Optional[Dict[str, Optional[float]]] = None) -> Dict[str, float]:
+    """Default weights with any non-None overrides applied."""
+    weights = dict(RANK_WEIGHTS)
+    for name, value in (overrides or {}).items():
+        if value is not None:
+            weights[name] = float(value)
+    return weights
+
+
+def composite_scores(context_unit: np.ndarray, in_store: np.ndarray, dist_km: np.ndarray,
+                     radius_km: float, user_context: np.ndarray,
+                     weights: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score every candidate at once. `context_unit` holds L2-normalized
+    context vectors (one row per candidate), so context similarity is a
+    single matrix-vector product. Returns (scores, context similarities).
+    """
+    user = np.asarray(user_context, dtype=np.float32)
+    norm = np.linalg.norm(user)
+    ctx_sim = context_unit @ (user / norm if norm > 0 else user)
+    audio_sim = np.where(in_store, AUDIO_SIM_EMBEDDED, AUDIO_SIM_OTHER)
+    distance_factor = np.maximum(0.0, 1.0 - dist_km / radius_km)
+    scores = (audio_sim * weights["audio"]
+              + ctx_sim * weights["context"]
+              + distance_factor * weights["distance"])
+    return scores, ctx_sim
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first, without a full sort."""
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
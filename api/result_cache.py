@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# ────────────────────────────────────────────────
+# 🧊 Query-result cache for /recommend
+# ────────────────────────────────────────────────
+RECOMMEND_CACHE_SIZE = int(os.getenv("RECOMMEND_CACHE_SIZE", "10000"))
+RECOMMEND_CACHE_TTL = float(os.getenv("RECOMMEND_CACHE_TTL", "30"))
+RECOMMEND_CACHE_REDIS = os.getenv("RECOMMEND_CACHE_REDIS", "0") == "1"   # share across workers
+REDIS_PREFIX = "recommend_cache:"
+
+
+class ResultCache:
+    """
+    TTL + LRU cache of query results. Each entry remembers the `version`
+    it was computed against (e.g. the store's content version and the
+    user's profile revision); a lookup with a different version is a miss
+    and drops the entry, so writes invalidate without any explicit purge.
+    Versions shared through Redis must mean the same data in every worker.
+
+    Values are kept as JSON bytes, which makes the memory footprint exact
+    and is also the format of the optional Redis tier: a local miss falls
+    through to Redis (SETEX with the same TTL), so workers sharing Redis
+    share results.
+    """
+
+    def __init__(self, max_entries: int = RECOMMEND_CACHE_SIZE, ttl: float = RECOMMEND_CACHE_TTL,
+                 redis_client=None, prefix: str = REDIS_PREFIX):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis_client
+        self.prefix = prefix
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.stats_counts = {"hits": 0, "redis_hits": 0, "misses": 0, "invalidated": 0,
+                             "expired": 0, "evicted": 0, "redis_errors": 0}
+
+    def _redis_key(self, key: Hashable) -> str:
+        return self.prefix + json.dumps(key, default=str)
+
+    def _drop(self, key: Hashable):
+        _, _, payload = self._data.pop(key)
+        self.nbytes -= len(payload)
+
+    def _store(self, key: Hashable, version: Any, payload: bytes, expires: float):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, version, payload)
+            self.nbytes += len(payload)
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self.stats_counts["evicted"] += 1
+
+    # ────────────────────────────────────────────────
+    # 🔹 Lookups
+    # ────────────────────────────────────────────────
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        version = json.loads(json.dumps(version, default=str))     # compare as stored
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, cached_version, payload = entry
+                if expires < time.time():
+                    self._drop(key)
+                    self.stats_counts["expired"] += 1
+                elif cached_version != version:
+                    self._drop(key)
+                    self.stats_counts["invalidated"] += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.stats_counts["hits"] += 1
+                    return json.loads(payload)
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(key))
+            except Exception as e:
+                self.stats_counts["redis_errors"] += 1
+                print(f"⚠️ Result cache read from Redis failed: {e}")
+                raw = None
+            if raw is not None:
+                shared = json.loads(raw)
+                if shared["version"] == version:
+                    payload = json.dumps(shared["value"]).encode()
+                    self._store(key, version, payload, time.time() + self.ttl)
+                    self.stats_counts["redis_hits"] += 1
+                    return shared["value"]
+
+        self.stats_counts["misses"] += 1
+        return None
+
+    def put(self, key: Hashable, version: Any, value: Any):
+        version = json.loads(json.dumps(version, default=str))
+        payload = json.dumps(value).encode()
+        self._store(key, version, payload, time.time() + self.ttl)
+        if self.redis is not None:
+            try:
+                self.redis.setex(self._redis_key(key), max(1, int(self.ttl)),
+                                 json.dumps({"version": version, "value": value}))
+            except Exception as e:
+                self.stats_counts["redis_errors"] += 1
+                print(f"⚠️ Result cache write to Redis failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self.stats_counts)
+        lookups = counts["hits"] + counts["redis_hits"] + counts["misses"]
+        return {
+            "entries": len(self._data),
+            "bytes": self.nbytes,
+            "hit_rate": round((counts["hits"] + counts["redis_hits"]) / lookups, 4) if lookups else 0.0,
+            "ttl_s": self.ttl,
+            "max_entries": self.max_entries,
+            "shared": self.redis is not None,
+            **counts,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _shared_client():
+    if not RECOMMEND_CACHE_REDIS:
+        return None
+    try:
+        from ai_service.redis_pool import get_redis
+        client = get_redis()
+        client.ping()
+        return client
+    except Exception as e:
+        print(f"⚠️ Redis unavailable, result cache stays per-worker: {e}")
+        return None
+
+
+def connect_recommend_cache():
+    """Attach the shared Redis tier (if enabled); run at warm-up rather than import."""
+    recommend_cache.redis = _shared_client()
+
+
+recommend_cache = ResultCache()
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from embeddings.audio_embedder import AudioEmbedder
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from embeddings.worker_pool import spool_upload
 from api.global_store import vector_store as vs
-from recommender.persistence import save_index
-import tempfile, shutil, os, json, datetime, geocoder, numpy as np
+from api.catalog import catalog
+from api.location import Location, client_ip, locator
+from api.routes_embed import job_response, submit_embedding
+import os, json, datetime, numpy as np
 
 # --- ContextEngine Fallback (replaces missing ai_context module) ---
 class ContextEngine:
@@ -36,61 +39,70 @@ class ContextEngine:
         return base / np.linalg.norm(base)
 
 router = APIRouter()
-ae = AudioEmbedder()
+
+
+def _store_artist_track(vec, track_id: str, artist_name: str, genre: str, mood: str, city: str,
+                        loc: Location) -> dict:
+    vs.add_track(track_id, vec)
+
+    # geo / context enrichment (resolved before queueing, see api.location)
+    lat, lng = loc.lat, loc.lng
+    detected_city = loc.city or city or "Unknown"
+    ctx = ContextEngine(city=detected_city)
+    context_vec = ctx.build_context_vector(mood)
+
+    os.makedirs("data/artists", exist_ok=True)
+    meta = {
+        "artist_name": artist_name,
+        "track_id": track_id,
+        "genre": genre,
+        "mood": mood,
+        "city": detected_city,
+        "lat": lat,
+        "lng": lng,
+        "time": datetime.datetime.now().isoformat(),
+        "vector": context_vec.tolist()
+    }
+
+    with open(f"data/artists/{track_id}.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    catalog.upsert_artist(track_id, meta)
+
+    return {
+        "status": "ok",
+        "artist": artist_name,
+        "track_id": track_id,
+        "city": detected_city,
+        "context_vector": np.round(context_vec, 3).tolist()
+    }
+
 
 @router.post("/upload")
 async def upload_artist_track(
+    request: Request,
     file: UploadFile = File(...),
     artist_name: str = Form(...),
     genre: str = Form(None),
     mood: str = Form(None),
-    city: str = Form(None)
+    city: str = Form(None),
+    lat: float = Form(None),
+    lng: float = Form(None),
+    wait: bool = Query(True),
+    timeout: float = Query(30.0, gt=0, le=300)
 ):
     """
     Artists upload their track + metadata.
-    System embeds it and saves a geo/context fingerprint.
+    System embeds it on the worker pool and saves a geo/context fingerprint.
+    With wait=false (or on timeout) returns 202 and a job to poll at /embed/jobs/{id}.
     """
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        vec = ae.embed(tmp_path)
-        track_id = file.filename
-        vs.add_track(track_id, vec)
-        save_index(vs)
-
-        # geo / context enrichment
-        geo = geocoder.ip("me")
-        lat, lng = geo.lat, geo.lng
-        detected_city = geo.city or city or "Unknown"
-        ctx = ContextEngine(city=detected_city)
-        context_vec = ctx.build_context_vector(mood)
-
-        os.makedirs("data/artists", exist_ok=True)
-        meta = {
-            "artist_name": artist_name,
-            "track_id": track_id,
-            "genre": genre,
-            "mood": mood,
-            "city": detected_city,
-            "lat": lat,
-            "lng": lng,
-            "time": datetime.datetime.now().isoformat(),
-            "vector": context_vec.tolist()
-        }
-
-        with open(f"data/artists/{track_id}.json", "w") as f:
-            json.dump(meta, f, indent=2)
-
-        return {
-            "status": "ok",
-            "artist": artist_name,
-            "track_id": track_id,
-            "city": detected_city,
-            "context_vector": np.round(context_vec, 3).tolist()
-        }
-
+        tmp_path = await run_in_threadpool(spool_upload, file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    track_id = file.filename
+    loc = await locator.resolve_async(lat=lat, lng=lng, city=city, ip=client_ip(request))
+    job = submit_embedding(
+        tmp_path, lambda vec, _fallback: _store_artist_track(vec, track_id, artist_name, genre, mood, city, loc)
+    )
+    return await job_response(job, wait, timeout)
@@ -1,50 +1,44 @@
-from fastapi import APIRouter, Query, HTTPException
-import os, json, math, geocoder, numpy as np
+from fastapi import APIRouter, Query, HTTPException, Request
+import time, numpy as np
+from typing import Optional
+from api.catalog import catalog
+from api.location import Location, client_ip, locator
+from api.ranking import composite_scores, resolve_weights, top_k
 from api.global_store import vector_store as vs
+from api.metrics import timed_maintenance
 
 router = APIRouter()
 
-# ---------- Utilities ----------
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Distance between two lat/lng points in kilometers."""
-    R = 6371
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def _locate(request: Request, lat: Optional[float], lng: Optional[float], city: Optional[str]) -> Location:
+    """Client lat/lng or city first, then the client IP (see api.location)."""
+    loc = locator.resolve(lat=lat, lng=lng, city=city, ip=client_ip(request))
+    if not loc.known:
+        raise HTTPException(status_code=400, detail="Location unavailable: pass lat/lng or city.")
+    return loc
 
 # ---------- Local Discovery ----------
 
 @router.get("/")
-def discover_local(radius_km: float = Query(50.0)):
+def discover_local(request: Request,
+                   radius_km: float = Query(50.0),
+                   lat: Optional[float] = Query(None, ge=-90, le=90),
+                   lng: Optional[float] = Query(None, ge=-180, le=180),
+                   city: Optional[str] = Query(None)):
     """Basic discovery by physical proximity."""
-    geo = geocoder.ip("me")
-    user_lat, user_lng = geo.lat, geo.lng
-    base_path = "data/context_meta"
-    if not os.path.exists(base_path):
+    loc = _locate(request, lat, lng, city)
+    user_lat, user_lng = loc.lat, loc.lng
+    if not catalog.has_context_data:
         return {"error": "No context metadata available yet."}
 
-    nearby = []
-    for file in os.listdir(base_path):
-        if not file.endswith(".json"):
-            continue
-        with open(os.path.join(base_path, file), "r") as f:
-            data = json.load(f)
-        lat, lng = data.get("lat"), data.get("lng")
-        if lat is None or lng is None:
-            continue
-        distance = haversine(user_lat, user_lng, lat, lng)
-        if distance <= radius_km:
-            nearby.append({
-                "track_id": file.replace(".json", ""),
-                "city": data.get("city"),
-                "distance_km": round(distance, 2),
-                "context_vector": data.get("vector"),
-                "time": data.get("time")
-            })
-    nearby.sort(key=lambda x: x["distance_km"])
+    rows, dists = catalog.nearby(user_lat, user_lng, radius_km)
+    nearby = [{
+        "track_id": catalog.track_ids[row],
+        "city": catalog.city[row],
+        "distance_km": round(distance, 2),
+        "context_vector": catalog.context[row].tolist() if catalog.has_context[row] else None,
+        "time": catalog.time_iso[row]
+    } for row, distance in zip(rows.tolist(), dists.tolist())]
     return {"location": {"lat": user_lat, "lng": user_lng, "radius_km": radius_km},
             "count": len(nearby),
             "results": nearby}
@@ -52,78 +46,49 @@ def discover_local(radius_km: float = Query(50.0)):
 # ---------- Ranked Local Discovery ----------
 
 @router.get("/ranked")
-def discover_ranked(radius_km: float = Query(100.0),
-                    mood: str = Query(None)):
+def discover_ranked(request: Request,
+                    radius_km: float = Query(100.0, gt=0),
+                    mood: str = Query(None),
+                    lat: Optional[float] = Query(None, ge=-90, le=90),
+                    lng: Optional[float] = Query(None, ge=-180, le=180),
+                    city: Optional[str] = Query(None),
+                    w_audio: Optional[float] = Query(None, description="Audio similarity weight"),
+                    w_context: Optional[float] = Query(None, description="Context match weight"),
+                    w_distance: Optional[float] = Query(None, description="Proximity weight")):
     """
     Rank local tracks by a composite AI score:
       distance + audio similarity + context match + genre/mood relevance
+    Scored column-wise over every track in the radius; weights default
+    to RANK_WEIGHTS and can be overridden per request.
     """
+    loc = _locate(request, lat, lng, city)
+    user_lat, user_lng = loc.lat, loc.lng
     try:
-        geo = geocoder.ip("me")
-        user_lat, user_lng = geo.lat, geo.lng
 
         # user context vector (simulate from mood)
         user_context = np.array([0.5, 0.2, 0.7], dtype=np.float32)
-        base_meta = "data/context_meta"
-        base_artist = "data/artists"
-
-        if not os.path.exists(base_meta):
+        if not catalog.has_context_data:
             return {"error": "No tracks in database."}
 
-        ranked = []
-
-        for file in os.listdir(base_meta):
-            if not file.endswith(".json"):
-                continue
-            with open(os.path.join(base_meta, file), "r") as f:
-                data = json.load(f)
-
-            lat, lng = data.get("lat"), data.get("lng")
-            if lat is None or lng is None:
-                continue
-
-            distance = haversine(user_lat, user_lng, lat, lng)
-            if distance > radius_km:
-                continue
-
-            # load artist metadata if available
-            artist_meta_path = os.path.join(base_artist, file)
-            artist_info = {}
-            if os.path.exists(artist_meta_path):
-                with open(artist_meta_path, "r") as f:
-                    artist_info = json.load(f)
-
-            # compute context similarity
-            track_vec = np.array(data.get("vector", [0.5, 0.5, 0.5]), dtype=np.float32)
-            ctx_sim = float(np.dot(user_context, track_vec) /
-                            (np.linalg.norm(user_context) * np.linalg.norm(track_vec)))
-
-            # mock audio similarity (if same track exists in FAISS)
-            if file.replace(".json", "") in vs.vectors:
-                audio_sim = 0.5  # placeholder: 0.0–1.0 range
-            else:
-                audio_sim = 0.3
-
-            # normalize distance (closer = higher score)
-            distance_factor = max(0.0, 1 - (distance / radius_km))
-
-            # composite score
-            score = (audio_sim * 0.4) + (ctx_sim * 0.4) + (distance_factor * 0.2)
-
-            ranked.append({
-                "track_id": file.replace(".json", ""),
-                "artist": artist_info.get("artist_name", "Unknown"),
-                "city": data.get("city"),
-                "distance_km": round(distance, 2),
-                "context_similarity": round(ctx_sim, 3),
-                "score": round(score, 3)
-            })
-
-        ranked.sort(key=lambda x: x["score"], reverse=True)
+        weights = resolve_weights({"audio": w_audio, "context": w_context, "distance": w_distance})
+        rows, dists = catalog.nearby(user_lat, user_lng, radius_km, sort=False)
+        scores, ctx_sim = composite_scores(catalog.context_unit[rows], catalog.in_store(vs)[rows],
+                                           dists, radius_km, user_context, weights)
+        best = top_k(scores, 10)
+
+        ranked = [{
+            "track_id": catalog.track_ids[rows[i]],
+            "artist": catalog.artist[rows[i]],
+            "city": catalog.city[rows[i]],
+            "distance_km": round(float(dists[i]), 2),
+            "context_similarity": round(float(ctx_sim[i]), 3),
+            "score": round(float(scores[i]), 3)
+        } for i in best.tolist()]
         return {
             "location": {"lat": user_lat, "lng": user_lng, "radius_km": radius_km},
-            "count": len(ranked),
-            "results": ranked[:10]
+            "weights": weights,
+            "count": len(rows),
+            "results": ranked
         }
 
     except Exception as e:
@@ -131,67 +96,39 @@ def discover_ranked(radius_km: float = Query(100.0),
 
 # ---------- Trending Discovery (TrendFlow AI) ----------
 
-from datetime import datetime
-
 @router.get("/trending")
-def trending_local(radius_km: float = 100.0):
+def trending_local(request: Request,
+                   radius_km: float = 100.0,
+                   lat: Optional[float] = Query(None, ge=-90, le=90),
+                   lng: Optional[float] = Query(None, ge=-180, le=180),
+                   city: Optional[str] = Query(None)):
     """
     Predict and rank trending local tracks.
-    Uses time-decay scoring on plays + recommendations + recency.
+    Uses time-decay scoring on plays + recommendations + recency, read from
+    the catalog's per-cell trending leaderboards (see api.trending).
     """
+    loc = _locate(request, lat, lng, city)
+    user_lat, user_lng = loc.lat, loc.lng
     try:
-        geo = geocoder.ip("me")
-        user_lat, user_lng = geo.lat, geo.lng
-        base_meta = "data/context_meta"
-        base_artist = "data/artists"
-
-        if not os.path.exists(base_artist) or not os.path.exists(base_meta):
+        if not catalog.has_artist_data or not catalog.has_context_data:
             return {"error": "No artist or context data available."}
 
-        results = []
-        for file in os.listdir(base_artist):
-            if not file.endswith(".json"):
-                continue
-            artist_path = os.path.join(base_artist, file)
-            meta_path = os.path.join(base_meta, file)
-            if not os.path.exists(meta_path):
-                continue
-
-            with open(artist_path, "r") as f:
-                artist_data = json.load(f)
-            with open(meta_path, "r") as f:
-                ctx_data = json.load(f)
-
-            lat, lng = ctx_data.get("lat"), ctx_data.get("lng")
-            if lat is None or lng is None:
-                continue
-
-            distance = haversine(user_lat, user_lng, lat, lng)
-            if distance > radius_km:
-                continue
-
-            # --- Trend score ---
-            plays = artist_data.get("plays", 20)
-            recs = artist_data.get("recommendations", 5)
-            days = (datetime.now() - datetime.fromisoformat(ctx_data["time"])).days
-            decay = math.exp(-days / 7.0)  # 7-day half-life
-
-            trend_score = (plays * 0.6 + recs * 0.4) * decay
-
-            results.append({
-                "track": file.replace(".json", ""),
-                "artist": artist_data.get("artist_name", "Unknown"),
-                "city": ctx_data.get("city"),
-                "trend_score": round(trend_score, 3),
-                "distance_km": round(distance, 2),
-                "age_days": days
-            })
-
-        results.sort(key=lambda x: x["trend_score"], reverse=True)
+        now = time.time()
+        count = catalog.trending.count(user_lat, user_lng, radius_km)
+
+        results = [{
+            "track": catalog.track_ids[row],
+            "artist": catalog.artist[row],
+            "city": catalog.city[row],
+            "trend_score": round(trend_score, 3),
+            "distance_km": round(distance, 2),
+            "age_days": int((now - catalog.time[row]) // 86400)
+        } for row, trend_score, distance in catalog.trending.top(user_lat, user_lng, radius_km, k=10, now=now)]
+
         return {
             "location": {"lat": user_lat, "lng": user_lng, "radius_km": radius_km},
-            "count": len(results),
-            "top_trending": results[:10]
+            "count": count,
+            "top_trending": results
         }
 
     except Exception as e:
@@ -204,6 +141,6 @@ def run_trend_maintenance():
     """
     Run periodic trend decay and archival cleanup.
     """
-    result = auto_decay_and_archive(threshold=0.3)
+    result = timed_maintenance(auto_decay_and_archive, threshold=0.3)
     return {"status": "maintenance complete", "result": result}
 
@@ -1,66 +1,179 @@
+import collections
 import datetime
 import os
-import json
-import tempfile
-import shutil
-import geocoder
+from typing import List
 import numpy as np
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from embeddings.audio_embedder import AudioEmbedder
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from embeddings.embedding_cache import EmbeddingCache
+from embeddings.worker_pool import EmbeddingJob, QueueFull, embedding_pool, spool_upload
 from api.global_store import vector_store as vs
-from recommender.persistence import save_index
+from api.location import Location, client_ip, locator
 
 router = APIRouter()
-ae = AudioEmbedder()
+embedding_cache = EmbeddingCache()
+
+
+def submit_embedding(tmp_path: str, finalize) -> EmbeddingJob:
+    """Queue an upload on the shared embedding pool, mapping backpressure to 503."""
+    try:
+        return embedding_pool.submit(tmp_path, finalize)
+    except QueueFull as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+async def job_response(job: EmbeddingJob, wait: bool, timeout: float):
+    """Await the job up to `timeout`; otherwise answer 202 with a poll URL."""
+    if wait and await embedding_pool.wait(job, timeout):
+        if job.state == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        return job.result
+    return JSONResponse(status_code=202, content=job.status())
+
+
+def _store_embedding(track_id: str, vec: np.ndarray, fallback: bool, loc: Location, content_key: str) -> dict:
+    # --- Contextual metadata ---
+    geo_context = {
+        "city": loc.city,
+        "country": loc.country,
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "source": "upload",
+    }
+    if not fallback:
+        # A random fallback vector says nothing about the content: a later upload must not dedupe against it
+        geo_context["content_key"] = content_key
+
+    # --- Store in vector store (appended to the write-ahead log) ---
+    vs.add_vector(track_id, vec, metadata=geo_context)
+
+    return {
+        "status": "success",
+        "track_id": track_id,
+        "embedding_dim": len(vec),
+        "context": geo_context,
+        "total_vectors": len(vs.vectors),
+    }
 
 
 @router.post("/")
-async def embed_track(file: UploadFile = File(...)):
+async def embed_track(
+    request: Request,
+    file: UploadFile = File(...),
+    wait: bool = Query(True, description="Wait for the embedding instead of returning a job id"),
+    timeout: float = Query(30.0, gt=0, le=300, description="Seconds to wait before answering 202"),
+):
     """
-    Receive an audio file, create its embedding,
-    add it to the FAISS vector index, and store contextual metadata.
+    Receive an audio file, create its embedding on the worker pool,
+    add it to the vector index, and store contextual metadata.
     """
     try:
-        # --- Save upload to a temporary file ---
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        # --- Generate embedding ---
-        vec = ae.embed(tmp_path)
-        if vec is None or not len(vec):
-            raise HTTPException(status_code=400, detail="Embedding failed")
-
-        # --- Contextual metadata ---
-        geo = geocoder.ip("me")
-        geo_context = {
-            "city": geo.city,
-            "country": geo.country,
-            "timestamp": datetime.datetime.utcnow().isoformat(),
-            "source": "upload",
-        }
-
-        # --- Store in vector memory store ---
-        track_id = os.path.basename(tmp_path)
-        vs.add_vector(track_id, vec, metadata=geo_context)
-
-        # --- Save persistent FAISS index ---
-        save_index(vs.vectors)
-
-        return {
-            "status": "success",
-            "track_id": track_id,
-            "embedding_dim": len(vec),
-            "context": geo_context,
-            "total_vectors": len(vs.vectors),
-        }
+        tmp_path = await run_in_threadpool(spool_upload, file)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    try:
+        key = await run_in_threadpool(embedding_pool.content_key, tmp_path)
+    except Exception as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=500, detail=str(e))
 
+    track_id = os.path.basename(tmp_path)
+    loc = await locator.resolve_async(ip=client_ip(request))
+    job = submit_embedding(tmp_path, lambda vec, fallback: _store_embedding(track_id, vec, fallback, loc, key))
+    return await job_response(job, wait, timeout)
+
+
+def _store_batch(track_ids: List[str], keys: List[str], vecs: List[np.ndarray], fallbacks: List[bool],
+                 skipped: List[str]) -> dict:
+    timestamp = datetime.datetime.utcnow().isoformat()
+    items = {}
+    for track_id, key, vec, fallback in zip(track_ids, keys, vecs, fallbacks):
+        metadata = {"timestamp": timestamp, "source": "batch"}
+        if not fallback:
+            metadata["content_key"] = key
+        items[track_id] = (vec, metadata)
+    vs.add_vectors(items)
+    return {
+        "status": "success",
+        "embedded": track_ids,
+        "skipped": skipped,
+        "total_vectors": len(vs),
+    }
+
+
+@router.post("/batch")
+async def embed_batch(
+    files: List[UploadFile] = File(...),
+    wait: bool = Query(True, description="Wait for the batch instead of returning a job id"),
+    timeout: float = Query(300.0, gt=0, le=3600, description="Seconds to wait before answering 202"),
+):
+    """
+    Embed many files as one job across the worker pool and commit them
+    in a single bulk write. Each filename becomes its track id, so every
+    file needs one and names must be unique within the batch. Files whose
+    name is already a track id, or whose content (same bytes under the
+    same embedder config) is already stored or earlier in the batch, are
+    skipped.
+    """
+    names = [f.filename for f in files]
+    if not all(names):
+        raise HTTPException(status_code=400, detail="Every file needs a filename (it becomes the track id)")
+    duplicates = sorted(name for name, count in collections.Counter(names).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate filenames in batch: {duplicates}")
+
+    skipped = [f.filename for f in files if f.filename in vs.vectors]
+    todo = [f for f in files if f.filename not in vs.vectors]
+    if not todo:
+        return {"status": "success", "embedded": [], "skipped": skipped, "total_vectors": len(vs)}
+
+    paths = []
+    try:
+        for f in todo:
+            paths.append(await run_in_threadpool(spool_upload, f))
+        keys = await run_in_threadpool(lambda: [embedding_pool.content_key(path) for path in paths])
     except Exception as e:
+        for path in paths:
+            os.remove(path)
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+    # --- Skip content that is already embedded, in the store or earlier in this batch ---
+    seen = set()
+    track_ids, new_paths, new_keys = [], [], []
+    for f, path, key in zip(todo, paths, keys):
+        if key in seen or vs.track_with_content(key) is not None:
+            skipped.append(f.filename)
+            os.remove(path)
+            continue
+        seen.add(key)
+        track_ids.append(f.filename)
+        new_paths.append(path)
+        new_keys.append(key)
+    if not track_ids:
+        return {"status": "success", "embedded": [], "skipped": skipped, "total_vectors": len(vs)}
+
+    try:
+        job = embedding_pool.submit_batch(
+            new_paths, lambda vecs, fallbacks: _store_batch(track_ids, new_keys, vecs, fallbacks, skipped)
+        )
+    except QueueFull as e:
+        for path in new_paths:
+            os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return await job_response(job, wait, timeout)
+
+
+@router.get("/jobs/{job_id}")
+def embedding_job(job_id: str):
+    """Poll an /embed or /artist/upload job."""
+    job = embedding_pool.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.status()
+
 
+@router.get("/cache")
+def embedding_cache_stats():
+    """Hit/miss counters and size of the shared embedding cache."""
+    return embedding_cache.stats()
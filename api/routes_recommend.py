@@ -8,6 +8,7 @@ from typing import Optional
 import numpy as np
 
 from api.global_store import vector_store
+from api.result_cache import recommend_cache
 from ai_service.recommender import mood_to_vector, track_counts, user_streams
 
 router = APIRouter()
@@ -72,37 +73,15 @@ def recommend(
     if len(vector_store) == 0:
         return {"error": "No tracks available yet. Embed or stream some songs first."}
 
-    # --- Build user's mean embedding ---
-    user_vec = vector_store.get_user_vector(user_id)
-    if user_vec is None or np.all(user_vec == 0):
-        raise HTTPException(status_code=400, detail="No valid user embedding available.")
-
-    # --- Optional mood vector fusion ---
-    mood_vec = mood_to_vector(mood) if mood else None
-    context_vec = np.array(mood_vec, dtype=np.float32) if mood_vec is not None else None
-    fused_user_vec = weighted_fusion(user_vec, context_vec, weight=0.25)
-
-    # --- Compute cosine similarity for each stored track ---
-    results = []
-    for track_id, track_vec in vector_store.vectors.items():
-        try:
-            sim = cosine_similarity(fused_user_vec, track_vec)
-            meta = vector_store.metadata.get(track_id, {})
-            results.append({
-                "track_id": track_id,
-                "artist": meta.get("artist", "Unknown Artist"),
-                "similarity": round(sim, 6),
-            })
-        except Exception as e:
-            print(f"⚠️ Skipping track {track_id}: {e}")
-            continue
-
-    if not results:
-        raise HTTPException(status_code=404, detail="No valid track embeddings found.")
-
-    # --- Sort & return top N ---
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    top_results = results[:top_n]
+    # --- Cached result? Valid while the catalog and this user's profile are unchanged ---
+    cache_key = (user_id, mood or "", top_n)
+    profiles = vector_store.profiles
+    cache_version = (vector_store.content_version(),
+                     profiles.revision(user_id) if profiles is not None else None)
+    top_results = recommend_cache.get(cache_key, cache_version)
+    if top_results is None:
+        top_results = _compute_recommendations(user_id, mood, top_n)
+        recommend_cache.put(cache_key, cache_version, top_results)
 
     # --- System Analytics ---
     total_users = len(user_streams)
@@ -118,3 +97,40 @@ def recommend(
         },
     }
 
+
+@router.get("/cache")
+def recommend_cache_stats():
+    """Hit rate and memory footprint of the /recommend result cache."""
+    return recommend_cache.stats()
+
+
+def _compute_recommendations(user_id: str, mood: Optional[str], top_n: int):
+    # --- Build user's mean embedding ---
+    user_vec = vector_store.get_user_vector(user_id)
+    if user_vec is None or np.all(user_vec == 0):
+        raise HTTPException(status_code=400, detail="No valid user embedding available.")
+
+    # --- Optional mood vector fusion ---
+    mood_vec = mood_to_vector(mood) if mood else None
+    context_vec = np.array(mood_vec, dtype=np.float32) if mood_vec is not None else None
+    fused_user_vec = weighted_fusion(user_vec, context_vec, weight=0.25)
+
+    # --- Batched similarity search over the store matrix ---
+    try:
+        hits = vector_store.search(fused_user_vec, top_k=top_n)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    top_results = []
+    for track_id, sim in hits:
+        meta = vector_store.metadata.get(track_id, {})
+        top_results.append({
+            "track_id": track_id,
+            "artist": meta.get("artist", "Unknown Artist"),
+            "similarity": round(sim, 6),
+        })
+
+    if not top_results:
+        raise HTTPException(status_code=404, detail="No valid track embeddings found.")
+    return top_results
+
@@ -0,0 +1,176 @@
+import bisect
+import heapq
+import itertools
+import math
+import threading
+import time
+import numpy as np
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from api.geo_index import EARTH_RADIUS_KM, KM_PER_DEG_LAT, GeoIndex, haversine_km
+from api.metrics import OPERATION_SECONDS
+
+# ────────────────────────────────────────────────
+# 🔥 Regional trending leaderboards for /discover/trending
+# ────────────────────────────────────────────────
+# trend_score = (plays * 0.6 + recommendations * 0.4) * exp(-age_days / 7)
+# with age_days = whole days since upload
+DAY_SECONDS = 86400
+AGE_DECAY_DAYS = 7.0
+PLAY_WEIGHT = 0.6
+RECOMMENDATION_WEIGHT = 0.4
+STEP = 1.0 / AGE_DECAY_DAYS    # log-score drop per whole day of age
+SLACK = 1e-9                   # float headroom when bounding not-yet-walked entries
+
+
+def base_score(plays: float, recommendations: float) -> float:
+    return plays * PLAY_WEIGHT + recommendations * RECOMMENDATION_WEIGHT
+
+
+def age_days(created: float, now: float) -> int:
+    return int((now - created) // DAY_SECONDS)
+
+
+def rank_key(base: float, created: float) -> float:
+    """
+    Time-invariant part of the log trend score. Whole days since upload
+    are floor(now) - floor(created) in days, or one less, so at any time
+    the log score is rank_key - floor(now_days) / 7 plus 0 or 1/7.
+    """
+    if base <= 0:
+        return -math.inf
+    return math.log(base) + (created // DAY_SECONDS) * STEP
+
+
+def _distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+class TrendingIndex:
+    """
+    Per-region leaderboards: for every grid cell (the GeoIndex grid), the
+    cell's tracks sorted by a time-invariant rank key, so a board never
+    needs re-sorting as time passes; updates re-insert one track (bisect).
+    The rank key is within one day's decay of the exact score, and walking
+    a board holds entries back until nothing later on it can beat them,
+    so boards still yield tracks in exact trend-score order.
+
+    A query walks the boards of the cells its radius overlaps, best first,
+    and lazily merges them, stopping after `k` tracks inside the radius,
+    so it touches a handful of entries per cell instead of scoring the
+    whole region.
+    """
+
+    def __init__(self, grid: Optional[GeoIndex] = None):
+        self.grid = grid or GeoIndex()
+        self._boards: Dict[Tuple[int, int], List[Tuple[float, Hashable]]] = {}   # (-rank, key) ascending
+        # key -> (board, -rank, lat, lng, base score, upload time)
+        self._where: Dict[Hashable, Tuple[Tuple[int, int], float, float, float, float, float]] = {}
+        self._lock = threading.RLock()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Updates
+    # ────────────────────────────────────────────────
+    def upsert(self, key: Hashable, lat: float, lng: float, base: float, created: float):
+        with self._lock:
+            self.remove(key)
+            board_id = self.grid.cell(lat, lng)
+            rank = rank_key(base, created)
+            bisect.insort(self._boards.setdefault(board_id, []), (-rank, key))
+            self._where[key] = (board_id, -rank, lat, lng, base, created)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            where = self._where.pop(key, None)
+            if where is None:
+                return
+            board_id, neg_rank = where[0], where[1]
+            board = self._boards[board_id]
+            del board[bisect.bisect_left(board, (neg_rank, key))]
+            if not board:
+                del self._boards[board_id]
+
+    # ────────────────────────────────────────────────
+    # 🔹 Queries
+    # ────────────────────────────────────────────────
+    def _board_ids(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, int]]:
+        grid_rows, grid_cols = self.grid.cells_near(lat, lng, radius_km)
+        if len(grid_rows) * len(grid_cols) >= len(self._boards):
+            # More cells to probe than boards exist: filter the boards instead
+            cols = set(grid_cols)
+            boards = [b for b in self._boards if b[0] in grid_rows and b[1] in cols]
+        else:
+            boards = [(r, c) for r in grid_rows for c in grid_cols if (r, c) in self._boards]
+        # Drop bounding-box corner cells lying wholly outside the circle: walking them finds nothing
+        deg = self.grid.cell_deg
+        reach = radius_km + deg * KM_PER_DEG_LAT / math.sqrt(2)    # + half the cell diagonal
+        return [b for b in boards
+                if _distance_km(lat, lng, -90.0 + (b[0] + 0.5) * deg, -180.0 + (b[1] + 0.5) * deg) <= reach]
+
+    def _walk(self, board_id, lat: float, lng: float, radius_km: float,
+              now: float) -> Iterator[Tuple[float, Hashable, float, float]]:
+        """Board entries inside the radius, best first: (-log score, key, trend score, distance)."""
+        today = (now // DAY_SECONDS) * STEP
+        where = self._where
+        pending: List[Tuple[float, Hashable, float, float]] = []
+        for neg_rank, key in self._boards[board_id]:
+            # Nothing from here on scores above rank + 1/7 - today: release what already beats that
+            bound = neg_rank + today - STEP - SLACK
+            while pending and pending[0][0] <= bound:
+                yield heapq.heappop(pending)
+            _, _, key_lat, key_lng, base, created = where[key]
+            dist = _distance_km(lat, lng, key_lat, key_lng)
+            if dist <= radius_km:
+                days = age_days(created, now)
+                score = base * math.exp(-days / AGE_DECAY_DAYS)
+                neg_log = -math.log(base) + days * STEP if base > 0 else math.inf
+                heapq.heappush(pending, (neg_log, key, score, dist))
+        while pending:
+            yield heapq.heappop(pending)
+
+    def top(self, lat: float, lng: float, radius_km: float, k: int = 10,
+            now: Optional[float] = None) -> List[Tuple[Hashable, float, float]]:
+        """(key, trend score, distance_km) of the `k` best tracks within `radius_km`, best first."""
+        now = time.time() if now is None else now
+        with OPERATION_SECONDS.time("trending_top"), self._lock:
+            merged = heapq.merge(*(self._walk(b, lat, lng, radius_km, now)
+                                   for b in self._board_ids(lat, lng, radius_km)))
+            return [(key, score, dist) for _, key, score, dist in itertools.islice(merged, k)]
+
+    def count(self, lat: float, lng: float, radius_km: float) -> int:
+        """
+        Tracks within `radius_km`. Cells lying wholly inside the circle
+        (all four corners within it) count their board's size; only the
+        cells on its edge measure each track.
+        """
+        with self._lock:
+            board_ids = self._board_ids(lat, lng, radius_km)
+            if not board_ids:
+                return 0
+            deg = self.grid.cell_deg
+            cells = np.array(board_ids, dtype=np.float64)
+            lat0, lng0 = -90.0 + cells[:, 0] * deg, -180.0 + cells[:, 1] * deg
+            inside = np.ones(len(board_ids), dtype=bool)
+            for corner_lat, corner_lng in ((lat0, lng0), (lat0 + deg, lng0), (lat0, lng0 + deg),
+                                           (lat0 + deg, lng0 + deg)):
+                inside &= haversine_km(lat, lng, corner_lat, corner_lng) <= radius_km
+
+            total, edge = 0, []
+            for board_id, whole in zip(board_ids, inside.tolist()):
+                if whole:
+                    total += len(self._boards[board_id])
+                else:
+                    edge.extend(self._where[key][2:4] for _, key in self._boards[board_id])
+            if edge:
+                coords = np.array(edge, dtype=np.float64)
+                total += int(np.count_nonzero(haversine_km(lat, lng, coords[:, 0], coords[:, 1]) <= radius_km))
+            return total
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def __len__(self) -> int:
+        return len(self._where)
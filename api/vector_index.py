@@ -0,0 +1,319 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import faiss  # optional: HNSW backend when installed
+except ImportError:
+    faiss = None
+
+# Below this many rows an exact scan is already sub-millisecond
+MIN_INDEX_ROWS = 50_000
+# Retrain once the catalog has grown this much since the last build
+REBUILD_GROWTH = 2.0
+# IVF must keep this share of the exact top-10 on its build-time probe set...
+IVF_MIN_RECALL = float(os.getenv("IVF_MIN_RECALL", "0.95"))
+# ...while scanning at most this share of its buckets; otherwise search stays exact
+IVF_MAX_PROBE_FRACTION = 0.25
+RECALL_QUERIES = 64
+RECALL_K = 10
+
+
+# ────────────────────────────────────────────────
+# 🔹 Exact backend
+# ────────────────────────────────────────────────
+class FlatIndex:
+    """
+    Exact brute-force search: the store scans every row.
+    Indexes only propose candidate rows; VectorStore always re-scores
+    them exactly against its matrix, so stale entries never leak.
+    """
+
+    kind = "flat"
+
+    def spawn(self) -> "FlatIndex":
+        """Return an empty index with the same settings (used for rebuilds)."""
+        return FlatIndex()
+
+    def build(self, matrix: np.ndarray, alive: np.ndarray):
+        pass
+
+    def add(self, row: int, vec: np.ndarray):
+        pass
+
+    def needs_rebuild(self, size: int) -> bool:
+        return False
+
+    def candidates(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        """Candidate rows for `query`, or None to scan everything."""
+        return None
+
+    def info(self) -> Dict[str, object]:
+        return {"kind": self.kind}
+
+
+# ────────────────────────────────────────────────
+# 🔹 IVF backend (pure NumPy)
+# ────────────────────────────────────────────────
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (x / norms).astype(np.float32)
+
+
+def _kmeans(x: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (nlist, d) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = x[rng.choice(len(x), int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _exact_top(matrix, rows: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k rows (among `rows`) for each query, scanned in blocks: (n_queries, k)."""
+    best_rows, best_sims = [], []
+    for start in range(0, len(rows), 65536):
+        chunk = rows[start:start + 65536]
+        sims = queries @ np.asarray(matrix[chunk]).T
+        kk = min(k, len(chunk))
+        top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+        best_rows.append(chunk[top])
+        best_sims.append(np.take_along_axis(sims, top, axis=1))
+    all_rows, all_sims = np.concatenate(best_rows, axis=1), np.concatenate(best_sims, axis=1)
+    top = np.argpartition(-all_sims, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(all_rows, top, axis=1)
+
+
+def _probe_queries(matrix, rows: np.ndarray, n: int, rng) -> np.ndarray:
+    """Recall probes shaped like real queries: noisy catalog rows and profile-like means of a few rows."""
+    picks = np.asarray(matrix[np.sort(rng.choice(rows, n * 5))]).reshape(n, 5, -1)
+    noisy = picks[:n // 2, 0] + rng.standard_normal(picks[:n // 2, 0].shape).astype(np.float32) * 0.05
+    means = picks[n // 2:].mean(axis=1)
+    return _normalize_rows(np.concatenate([noisy, means]))
+
+
+class IVFIndex(FlatIndex):
+    """
+    Inverted-file index: rows are bucketed under k-means centroids and a
+    query only scans the `nprobe` closest buckets.
+
+    Every build measures recall against exact search on a probe set and
+    raises `nprobe` until it reaches `min_recall`; if that would scan more
+    than IVF_MAX_PROBE_FRACTION of the buckets, the index stays untrained
+    and search stays exact (data with no cluster structure gains nothing).
+
+    Knobs:
+      nlist      — number of buckets (default ≈ sqrt(N), clipped to 16..4096)
+      nprobe     — minimum buckets scanned per query (calibrated upwards)
+      min_recall — recall@10 the calibrated nprobe must reach
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_rows: int = MIN_INDEX_ROWS, train_per_list: int = 32,
+                 min_recall: float = IVF_MIN_RECALL):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self.train_per_list = train_per_list
+        self.min_recall = min_recall
+
+        self._centroids: Optional[np.ndarray] = None
+        self._order = np.zeros(0, dtype=np.int64)     # rows sorted by bucket
+        self._bounds = np.zeros(1, dtype=np.int64)    # bucket c = order[bounds[c]:bounds[c+1]]
+        self._extra: Dict[int, List[int]] = {}        # incremental inserts per bucket
+        self._built_rows = 0
+        self._probe = nprobe        # calibrated at build
+        self.recall: Optional[float] = None
+
+    def spawn(self) -> "IVFIndex":
+        return IVFIndex(self.nlist, self.nprobe, self.min_rows, self.train_per_list, self.min_recall)
+
+    def _calibrate(self, matrix, rows: np.ndarray, assign: np.ndarray, centroids: np.ndarray,
+                   rng) -> Tuple[int, float]:
+        """Smallest nprobe (≥ self.nprobe) reaching min_recall, and the recall it gets."""
+        bucket_of = np.full(int(rows[-1]) + 1, -1, dtype=np.int64)
+        bucket_of[rows] = assign
+        queries = _probe_queries(matrix, rows, RECALL_QUERIES, rng)
+        truth = _exact_top(matrix, rows, queries, min(RECALL_K, len(rows)))
+
+        # Rank of each true neighbour's bucket among the query's closest centroids
+        order = np.argsort(-(queries @ centroids.T), axis=1)
+        rank_of = np.empty_like(order)
+        np.put_along_axis(rank_of, order, np.arange(order.shape[1])[None, :], axis=1)
+        ranks = np.sort(np.take_along_axis(rank_of, bucket_of[truth], axis=1).ravel())
+
+        needed = int(ranks[int(np.ceil(self.min_recall * len(ranks))) - 1]) + 1
+        nprobe = min(max(self.nprobe, needed), len(centroids))
+        return nprobe, float(np.mean(ranks < nprobe))
+
+    def build(self, matrix: np.ndarray, alive: np.ndarray):
+        rows = np.flatnonzero(alive)
+        if len(rows) < self.min_rows:
+            return
+        nlist = self.nlist or int(np.clip(np.sqrt(len(rows)), 16, 4096))
+
+        rng = np.random.default_rng(0)
+        sample = rng.choice(rows, min(len(rows), nlist * self.train_per_list), replace=False)
+        centroids = _kmeans(np.asarray(matrix[np.sort(sample)]), nlist)
+
+        # Assign every live row in batches to bound peak memory
+        assign = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), 65536):
+            block = np.asarray(matrix[rows[start:start + 65536]])
+            assign[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+
+        self._built_rows = len(rows)
+        nprobe, recall = self._calibrate(matrix, rows, assign, centroids, rng)
+        self.recall = recall
+        if nprobe > IVF_MAX_PROBE_FRACTION * nlist:
+            print(f"⚠️ IVF needs nprobe {nprobe}/{nlist} for recall {self.min_recall:.2f}; "
+                  f"keeping exact search over {len(rows)} vectors.")
+            return
+
+        order = np.argsort(assign, kind="stable")
+        self._order = rows[order]
+        self._bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._centroids = centroids
+        self._probe = nprobe
+        self._extra = {}
+
+    def add(self, row: int, vec: np.ndarray):
+        if self._centroids is None:
+            return
+        bucket = int(np.argmax(self._centroids @ vec))
+        self._extra.setdefault(bucket, []).append(row)
+
+    def needs_rebuild(self, size: int) -> bool:
+        if not self._built_rows:
+            return size >= self.min_rows
+        # Also retries a build that fell back to exact, once the catalog has grown
+        return size >= REBUILD_GROWTH * self._built_rows
+
+    def candidates(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        nprobe = min(self._probe, len(self._centroids))
+        sims = self._centroids @ query
+        probe = np.argpartition(-sims, nprobe - 1)[:nprobe]
+
+        parts = [self._order[self._bounds[c]:self._bounds[c + 1]] for c in probe]
+        parts += [np.asarray(self._extra[c], dtype=np.int64) for c in probe if c in self._extra]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def info(self) -> Dict[str, object]:
+        return {
+            "kind": self.kind,
+            "trained": self._centroids is not None,
+            "exact_fallback": self._centroids is None and self._built_rows > 0,
+            "nlist": 0 if self._centroids is None else len(self._centroids),
+            "nprobe": self._probe,
+            "recall_estimate": None if self.recall is None else round(self.recall, 3),
+            "indexed_rows": 0 if self._centroids is None
+            else self._built_rows + sum(len(v) for v in self._extra.values()),
+        }
+
+
+# ────────────────────────────────────────────────
+# 🔹 HNSW backend (FAISS, optional)
+# ────────────────────────────────────────────────
+class HNSWIndex(FlatIndex):
+    """
+    FAISS HNSW graph over inner product.
+
+    Knobs:
+      m               — graph degree (memory vs recall)
+      ef_construction — build-time beam width
+      ef_search       — query-time beam width; higher = better recall, slower
+      oversample      — candidates fetched per requested result
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 oversample: int = 2, min_rows: int = MIN_INDEX_ROWS):
+        if faiss is None:
+            raise RuntimeError("HNSW index requires faiss (pip install faiss-cpu)")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.oversample = oversample
+        self.min_rows = min_rows
+
+        self._hnsw = None
+        self._index = None
+        self._built_rows = 0
+
+    def spawn(self) -> "HNSWIndex":
+        return HNSWIndex(self.m, self.ef_construction, self.ef_search, self.oversample, self.min_rows)
+
+    def build(self, matrix: np.ndarray, alive: np.ndarray):
+        rows = np.flatnonzero(alive)
+        if len(rows) < self.min_rows:
+            return
+        hnsw = faiss.IndexHNSWFlat(matrix.shape[1], self.m, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = self.ef_construction
+        index = faiss.IndexIDMap(hnsw)
+        for start in range(0, len(rows), 65536):
+            chunk = rows[start:start + 65536]
+            index.add_with_ids(np.ascontiguousarray(matrix[chunk], dtype=np.float32), chunk.astype(np.int64))
+        self._hnsw, self._index = hnsw, index
+        self._built_rows = len(rows)
+
+    def add(self, row: int, vec: np.ndarray):
+        if self._index is None:
+            return
+        self._index.add_with_ids(vec.reshape(1, -1).astype(np.float32), np.array([row], dtype=np.int64))
+
+    def needs_rebuild(self, size: int) -> bool:
+        if self._index is None:
+            return size >= self.min_rows
+        return size >= REBUILD_GROWTH * self._built_rows
+
+    def candidates(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        if self._index is None:
+            return None
+        fetch = k * self.oversample
+        self._hnsw.hnsw.efSearch = max(self.ef_search, fetch)
+        _, ids = self._index.search(query.reshape(1, -1).astype(np.float32), fetch)
+        ids = ids[0]
+        return ids[ids >= 0]
+
+    def info(self) -> Dict[str, object]:
+        return {
+            "kind": self.kind,
+            "trained": self._index is not None,
+            "m": self.m,
+            "ef_search": self.ef_search,
+            "indexed_rows": 0 if self._index is None else int(self._index.ntotal),
+        }
+
+
+# ────────────────────────────────────────────────
+# 🔹 Factory
+# ────────────────────────────────────────────────
+def make_index(kind: Optional[str] = None, **params) -> FlatIndex:
+    """
+    Build an index by name: "flat", "ivf", "hnsw" or "auto"
+    (HNSW when faiss is installed, exact otherwise).
+    Defaults to the VECTOR_INDEX environment variable, else exact search:
+    approximate backends are opt-in.
+    """
+    kind = (kind or os.getenv("VECTOR_INDEX", "flat")).lower()
+    if kind == "auto":
+        kind = "hnsw" if faiss is not None else "flat"
+    if kind == "flat":
+        return FlatIndex()
+    if kind == "ivf":
+        return IVFIndex(**params)
+    if kind == "hnsw":
+        return HNSWIndex(**params)
+    raise ValueError(f"Unknown vector index: {kind}")
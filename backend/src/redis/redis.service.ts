@@ -12,5 +12,10 @@ export class RedisService implements OnModuleInit {
   async publish(channel: string, message: any) {
     await this.client.publish(channel, JSON.stringify(message));
   }
+
+  // Durable copy for Redis Streams consumer groups (ai_service/stream_consumer.py)
+  async appendToStream(stream: string, message: any, maxLen = 1_000_000) {
+    await this.client.xadd(stream, 'MAXLEN', '~', maxLen, '*', 'data', JSON.stringify(message));
+  }
 }
 
@@ -16,11 +16,13 @@ export class StreamsService {
     });
 
     // Publish event to Redis for real-time or analytics
-    await this.redis.publish('stream.recorded', {
+    const event = {
       userId,
       trackId,
       timestamp: new Date().toISOString(),
-    });
+    };
+    await this.redis.publish('stream.recorded', event);
+    await this.redis.appendToStream('stream.recorded', event);
 
     return stream;
   }
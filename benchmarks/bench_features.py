@@ -0,0 +1,110 @@
+"""
+Feature-extraction benchmark: the original per-feature librosa calls
+(each recomputing its own STFT) against AudioEmbedder.extract_features
+on one shared STFT, in every harmonic mode.
+
+    python -m benchmarks.bench_features [audio files...] [--repeat N]
+
+Without files it synthesizes a 60 s test tone mix. Reports per-file
+latency (median of N runs), peak traced memory, and the largest absolute
+difference of the normalized 128-D embedding against the original.
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import librosa
+from typing import Callable, Dict, List
+
+from embeddings.audio_embedder import HARMONIC_MODES, AudioEmbedder
+
+# "exact" must reproduce the original embedding to within this (float32 rounding)
+EXACT_TOLERANCE = 1e-5
+
+
+def legacy_features(y: np.ndarray, sr: int) -> np.ndarray:
+    """The pre-shared-STFT extraction, kept verbatim for comparison."""
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    spec_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+    tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(y), sr=sr)
+    return np.concatenate([
+        mfcc.mean(axis=1), mfcc.std(axis=1),
+        chroma.mean(axis=1), chroma.std(axis=1),
+        spec_contrast.mean(axis=1), spec_contrast.std(axis=1),
+        tonnetz.mean(axis=1), tonnetz.std(axis=1)
+    ])
+
+
+def _embedding(features: np.ndarray, dim: int = 128) -> np.ndarray:
+    vec = np.zeros((dim,), dtype=np.float32)
+    length = min(dim, len(features))
+    vec[:length] = features[:length]
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def synth_track(seconds: float = 60, sr: int = 22050) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    y = sum(np.sin(2 * np.pi * f * t) * a for f, a in ((220, 0.5), (277.2, 0.3), (329.6, 0.3), (55, 0.4)))
+    y = y * (0.6 + 0.4 * np.sin(2 * np.pi * 2 * t)) + 0.05 * rng.standard_normal(len(t))
+    return (y / np.abs(y).max()).astype(np.float32)
+
+
+def measure(fn: Callable[[], np.ndarray], repeat: int) -> Dict[str, float]:
+    fn()  # warm-up (numba JIT, filter caches)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": float(np.median(times)) * 1000, "peak_mb": peak / 2**20}
+
+
+def run(signals: List[np.ndarray], sr: int, repeat: int):
+    rows = {"original": []}
+    rows.update({mode: [] for mode in HARMONIC_MODES})
+    for y in signals:
+        reference = _embedding(legacy_features(y, sr))
+        rows["original"].append({**measure(lambda: legacy_features(y, sr), repeat), "max_abs_diff": 0.0})
+        for mode in HARMONIC_MODES:
+            embedder = AudioEmbedder(sr=sr, harmonic=mode)
+            result = measure(lambda: embedder.extract_features(y, sr), repeat)
+            result["max_abs_diff"] = float(np.abs(_embedding(embedder.extract_features(y, sr)) - reference).max())
+            rows[mode].append(result)
+
+    base_ms = np.mean([r["ms"] for r in rows["original"]])
+    print(f"{'pipeline':<10} {'ms/file':>9} {'speedup':>8} {'peak MB':>9} {'max |Δ|':>10}")
+    for name, results in rows.items():
+        ms = np.mean([r["ms"] for r in results])
+        peak = max(r["peak_mb"] for r in results)
+        diff = max(r["max_abs_diff"] for r in results)
+        print(f"{name:<10} {ms:>9.1f} {base_ms / ms:>7.2f}x {peak:>9.1f} {diff:>10.2e}")
+
+    exact_diff = max(r["max_abs_diff"] for r in rows["exact"])
+    verdict = "✅" if exact_diff <= EXACT_TOLERANCE else "⚠️"
+    print(f"{verdict} exact mode max |Δ| {exact_diff:.2e} (tolerance {EXACT_TOLERANCE:.0e})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shared-STFT feature extraction.")
+    parser.add_argument("files", nargs="*", help="audio files (default: a synthetic 60 s track)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sr", type=int, default=22050)
+    parser.add_argument("--duration", type=float, default=60)
+    args = parser.parse_args(argv)
+
+    if args.files:
+        signals = [librosa.load(f, sr=args.sr, mono=True, duration=args.duration)[0] for f in args.files]
+    else:
+        signals = [synth_track(args.duration, args.sr)]
+    run(signals, args.sr, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+/discover/ranked scoring benchmark: the original per-track loop against
+the columnar engine (TrackCatalog radius query + api.ranking), on
+synthetic catalogs scattered around one user location.
+
+    python -m benchmarks.bench_ranked [--sizes 10000 100000 1000000] [--repeat N]
+
+Both sides work from memory (the loop gets pre-parsed records), so the
+numbers isolate scoring cost from the file I/O the catalog removed.
+"""
+import argparse
+import math
+import time
+import numpy as np
+from typing import Dict, List
+
+from api.catalog import TrackCatalog
+from api.ranking import composite_scores, resolve_weights, top_k
+
+USER_LAT, USER_LNG, RADIUS_KM = 40.7, -74.0, 100.0
+USER_CONTEXT = np.array([0.5, 0.2, 0.7], dtype=np.float32)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def legacy_ranked(records: List[Dict], embedded: set) -> List[Dict]:
+    """The original discover_ranked loop, minus the per-file json.load."""
+    ranked = []
+    for data in records:
+        distance = _haversine(USER_LAT, USER_LNG, data["lat"], data["lng"])
+        if distance > RADIUS_KM:
+            continue
+        track_vec = np.array(data.get("vector", [0.5, 0.5, 0.5]), dtype=np.float32)
+        ctx_sim = float(np.dot(USER_CONTEXT, track_vec) /
+                        (np.linalg.norm(USER_CONTEXT) * np.linalg.norm(track_vec)))
+        audio_sim = 0.5 if data["track_id"] in embedded else 0.3
+        distance_factor = max(0.0, 1 - (distance / RADIUS_KM))
+        score = (audio_sim * 0.4) + (ctx_sim * 0.4) + (distance_factor * 0.2)
+        ranked.append({"track_id": data["track_id"], "score": round(score, 3)})
+    ranked.sort(key=lambda x: x["score"], reverse=True)
+    return ranked[:10]
+
+
+def columnar_ranked(catalog: TrackCatalog, in_store: np.ndarray) -> List[Dict]:
+    rows, dists = catalog.nearby(USER_LAT, USER_LNG, RADIUS_KM, sort=False)
+    scores, _ = composite_scores(catalog.context_unit[rows], in_store[rows], dists,
+                                 RADIUS_KM, USER_CONTEXT, resolve_weights())
+    return [{"track_id": catalog.track_ids[rows[i]], "score": round(float(scores[i]), 3)}
+            for i in top_k(scores, 10).tolist()]
+
+
+def synth_records(n: int, seed: int = 0) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    lat = USER_LAT + rng.uniform(-1.5, 1.5, n)
+    lng = USER_LNG + rng.uniform(-2.0, 2.0, n)
+    ctx = rng.random((n, 3))
+    return [{"track_id": f"t{i}", "lat": float(lat[i]), "lng": float(lng[i]), "vector": ctx[i].tolist()}
+            for i in range(n)]
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /discover/ranked scoring.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'tracks':>9} {'in radius':>10} {'build s':>8} {'loop ms':>9} {'columnar ms':>12} {'speedup':>8}")
+    for n in args.sizes:
+        records = synth_records(n)
+        embedded = {r["track_id"] for r in records[::3]}
+
+        start = time.perf_counter()
+        catalog = TrackCatalog(meta_dir="", artist_dir="")
+        for r in records:
+            catalog.upsert_context(r["track_id"], r)
+        in_store = np.array([tid in embedded for tid in catalog.track_ids] +
+                            [False] * (len(catalog.lat) - len(catalog.track_ids)))
+        build = time.perf_counter() - start
+
+        expected = legacy_ranked(records, embedded)
+        got = columnar_ranked(catalog, in_store)
+        assert [r["score"] for r in got] == [r["score"] for r in expected], "rankings differ"
+
+        loop = timed(lambda: legacy_ranked(records, embedded), max(1, args.repeat if n <= 100_000 else 1))
+        columnar = timed(lambda: columnar_ranked(catalog, in_store), args.repeat)
+        in_radius = len(catalog.nearby(USER_LAT, USER_LNG, RADIUS_KM, sort=False)[0])
+        print(f"{n:>9} {in_radius:>10} {build:>8.1f} {loop * 1000:>9.1f} {columnar * 1000:>12.2f} {loop / columnar:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Hot-path benchmark suite: /recommend, /discover/ranked, /discover/trending,
+/embed and the TrendFlow writes (update_trend, auto_decay_and_archive),
+timed both in-process (handler or function called directly) and through
+the ASGI app (TestClient, full middleware stack).
+
+    python -m benchmarks.bench_suite [--sizes 10000 100000 1000000] [--requests 200]
+                                     [--modes inprocess asgi] [--only recommend embed ...]
+                                     [--out results.json] [--compare baseline.json]
+
+Each catalog size runs in a fresh process inside a temporary working
+directory, on synthetic data only: unit vectors, geo-tagged context and
+artist metadata, a trend table with spread ages, listening profiles and
+generated WAV files. Redis, network geo lookups and the API warm-up are
+never touched, so runs are repeatable. Results are JSON (latency
+percentiles in ms and throughput per scenario, mode and size) stamped
+with the git commit; --compare reports p50/p99 changes against an
+earlier results file and flags regressions beyond --tolerance.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("recommend", "discover_ranked", "discover_trending", "embed",
+             "update_trend", "update_trends", "auto_decay_and_archive")
+MODES = ("inprocess", "asgi")
+DIM = 128
+SAMPLE_RATE = 22050
+USER_LAT, USER_LNG, RADIUS_KM = 40.7, -74.0, 100.0
+PLAYS_PER_USER = 20
+TREND_BATCH = 500               # events per update_trends call
+MAINTENANCE_STEP_S = 3600.0     # simulated time between in-process archive passes
+
+
+# ────────────────────────────────────────────────
+# 🔹 Synthetic data
+# ────────────────────────────────────────────────
+def synth_vectors(n: int, seed: int = 0) -> Tuple[List[str], np.ndarray]:
+    rng = np.random.default_rng(seed)
+    matrix = np.empty((n, DIM), dtype=np.float32)
+    for start in range(0, n, 65536):
+        block = rng.standard_normal((min(65536, n - start), DIM), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        matrix[start:start + len(block)] = block
+    return [f"t{i}" for i in range(n)], matrix
+
+
+def synth_catalog(catalog, ids: List[str], seed: int = 1):
+    """Context metadata for every track, artist counters for every second one."""
+    rng = np.random.default_rng(seed)
+    n = len(ids)
+    lat = USER_LAT + rng.uniform(-3.0, 3.0, n)
+    lng = USER_LNG + rng.uniform(-4.0, 4.0, n)
+    ctx = rng.random((n, 3))
+    now = time.time()
+    ages = rng.uniform(0, 60 * 86400, n)
+    plays = rng.integers(0, 5000, n)
+    recs = rng.integers(0, 500, n)
+    for i, track_id in enumerate(ids):
+        catalog.upsert_context(track_id, {
+            "lat": float(lat[i]), "lng": float(lng[i]), "city": "Synthville",
+            "time": datetime.datetime.utcfromtimestamp(now - ages[i]).isoformat(),
+            "vector": ctx[i].tolist(),
+        })
+        if i % 2 == 0:
+            catalog.upsert_artist(track_id, {"artist_name": f"artist{i % 997}",
+                                             "plays": int(plays[i]), "recommendations": int(recs[i])})
+
+
+def synth_trends(ids: List[str], seed: int = 2) -> Dict[str, Dict]:
+    """Legacy-shape trend table for the artist tracks, last updated 0-30 days ago."""
+    rng = np.random.default_rng(seed)
+    tracked = ids[::2]
+    scores = rng.lognormal(0.0, 0.6, len(tracked))
+    ages = rng.uniform(0, 30 * 86400, len(tracked))
+    now = time.time()
+    return {track_id: {"score": float(scores[i]),
+                       "last_update": str(datetime.datetime.utcfromtimestamp(now - ages[i]))}
+            for i, track_id in enumerate(tracked)}
+
+
+def synth_profiles(profiles, matrix: np.ndarray, users: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    for u in range(users):
+        for row in rng.integers(0, len(matrix), PLAYS_PER_USER).tolist():
+            profiles.observe(f"u{u}", matrix[row], now - float(rng.uniform(0, 14 * 86400)))
+
+
+def write_wav(path: str, seconds: float, seed: int, sr: int = SAMPLE_RATE):
+    """Distinct chord + noise per seed, so the embedding cache never hits."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    y = sum(np.sin(2 * np.pi * f * t) for f in rng.uniform(110, 880, 3)) / 3
+    y = 0.6 * y + 0.05 * rng.standard_normal(len(t))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+# ────────────────────────────────────────────────
+# 🔹 Timing
+# ────────────────────────────────────────────────
+def summarize(times: List[float], errors: int) -> Dict[str, Any]:
+    if not times:
+        return {"n": 0, "errors": errors}
+    ms = np.asarray(times) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "n": len(times), "errors": errors,
+        "p50_ms": round(float(p50), 3), "p90_ms": round(float(p90), 3), "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3), "max_ms": round(float(ms.max()), 3),
+        "throughput_per_s": round(len(times) / float(np.sum(times)), 1),
+    }
+
+
+def measure(fn: Callable[[int], Any], n: int, warmup: int) -> Dict[str, Any]:
+    """Call fn(i) for warm-up then measured indexes (distinct inputs per call); errors are counted."""
+    times, errors = [], 0
+    for i in range(warmup + n):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            if i >= warmup:
+                errors += 1
+            if errors == 1:
+                print(f"⚠️ {getattr(fn, '__name__', 'call')} failed: {e}")
+            continue
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+    return summarize(times, errors)
+
+
+def _check(result: Any, key: str):
+    if not isinstance(result, dict) or key not in result:
+        raise RuntimeError(f"unexpected result: {str(result)[:200]}")
+    return result
+
+
+def _ok(response, key: Optional[str] = None):
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    if key is not None:
+        _check(response.json(), key)
+
+
+# ────────────────────────────────────────────────
+# 🔹 One catalog size (runs in its own process)
+# ────────────────────────────────────────────────
+def run_size(size: int, args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.chdir(workdir)       # every relative data/ path now points at synthetic data
+
+    from starlette.requests import Request
+    from api import routes_discover, routes_recommend
+    from api.catalog import catalog
+    from api.global_store import user_profiles, vector_store
+    from api.location import locator
+    from api.result_cache import recommend_cache
+    from recommender.trendflow import trend_store, update_trend, update_trends
+
+    locator.network = False
+    setup: Dict[str, float] = {}
+    users = args.requests + args.warmup
+    rng = np.random.default_rng(size)
+
+    start = time.perf_counter()
+    ids, matrix = synth_vectors(size)
+    vector_store.attach_snapshot(ids, matrix, {})
+    while vector_store._rebuilding:     # let the background index build finish before timing searches
+        time.sleep(0.05)
+    setup["vectors_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    trend_store.load()
+    os.makedirs(catalog.meta_dir, exist_ok=True)
+    os.makedirs(catalog.artist_dir, exist_ok=True)
+    catalog.sync()
+    synth_catalog(catalog, ids)
+    setup["catalog_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    trend_store.replace(synth_trends(ids))
+    setup["trends_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    synth_profiles(user_profiles, matrix, users)
+    setup["profiles_s"] = round(time.perf_counter() - start, 3)
+
+    wav_dir = os.path.join(workdir, "wavs")
+    os.makedirs(wav_dir)
+    wavs: Dict[str, List[str]] = {}
+    for m, mode in enumerate(MODES):
+        wavs[mode] = []
+        for i in range(args.embed_files + 1):
+            path = os.path.join(wav_dir, f"{mode}-{i}.wav")
+            write_wav(path, args.wav_seconds, seed=1000 * (m + 1) + i)
+            wavs[mode].append(path)
+    print(f"🧪 {size:,} vectors ready: " + ", ".join(f"{k} {v}s" for k, v in setup.items()))
+
+    points = [(USER_LAT + float(a), USER_LNG + float(b)) for a, b in rng.uniform(-0.5, 0.5, (users, 2))]
+    trend_ids = ids[::2]
+    n, warmup = args.requests, args.warmup
+
+    def request():
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": [],
+                        "query_string": b"", "client": ("127.0.0.1", 0)})
+
+    # ── In-process: the route handlers and module functions themselves ──
+    def inprocess(name: str) -> Optional[Dict[str, Any]]:
+        if name == "recommend":
+            recommend_cache.clear()
+            return measure(lambda i: _check(routes_recommend.recommend(
+                user_id=f"u{i}", mood=None, top_n=10), "recommendations"), n, warmup)
+        if name == "discover_ranked":
+            return measure(lambda i: _check(routes_discover.discover_ranked(
+                request(), radius_km=RADIUS_KM, mood=None, lat=points[i][0], lng=points[i][1], city=None,
+                w_audio=None, w_context=None, w_distance=None), "results"), n, warmup)
+        if name == "discover_trending":
+            return measure(lambda i: _check(routes_discover.trending_local(
+                request(), radius_km=RADIUS_KM, lat=points[i][0], lng=points[i][1], city=None),
+                "top_trending"), n, warmup)
+        if name == "embed":
+            from embeddings.worker_pool import _embed_file, _init_worker
+            _init_worker(DIM, SAMPLE_RATE)      # what a pool worker runs, minus the process hop
+            files = wavs["inprocess"]
+            return measure(lambda i: _embed_file(files[i]), args.embed_files, 1)
+        if name == "update_trend":
+            picks = rng.integers(0, len(trend_ids), warmup + n).tolist()
+            return measure(lambda i: update_trend(trend_ids[picks[i]], 1.1), n, warmup)
+        if name == "update_trends":
+            def batch(i):
+                rows = rng.integers(0, len(trend_ids), TREND_BATCH).tolist()
+                update_trends([(trend_ids[r], 1.1) for r in rows])
+            result = measure(batch, n, warmup)
+            result["events_per_call"] = TREND_BATCH
+            return result
+        if name == "auto_decay_and_archive":
+            # Each pass runs an hour "later", so it archives what expired since the previous one
+            base = time.time()
+            result = measure(lambda i: trend_store.archive(0.3, now=base + i * MAINTENANCE_STEP_S), n, warmup)
+            result["simulated_step_s"] = MAINTENANCE_STEP_S
+            result["remaining"] = len(trend_store)
+            return result
+        return None
+
+    # ── ASGI: the same paths through middleware, routing and serialization ──
+    def asgi(name: str, client) -> Optional[Dict[str, Any]]:
+        if name == "recommend":
+            recommend_cache.clear()
+            return measure(lambda i: _ok(client.get(
+                "/recommend/", params={"user_id": f"u{i}", "top_n": 10}), "recommendations"), n, warmup)
+        if name == "discover_ranked":
+            return measure(lambda i: _ok(client.get("/discover/ranked", params={
+                "lat": points[i][0], "lng": points[i][1], "radius_km": RADIUS_KM}), "results"), n, warmup)
+        if name == "discover_trending":
+            return measure(lambda i: _ok(client.get("/discover/trending", params={
+                "lat": points[i][0], "lng": points[i][1], "radius_km": RADIUS_KM}), "top_trending"), n, warmup)
+        if name == "embed":
+            files = wavs["asgi"]
+
+            def upload(i):
+                with open(files[i], "rb") as f:
+                    _ok(client.post("/embed/", params={"wait": "true", "timeout": 120},
+                                    files={"file": (os.path.basename(files[i]), f, "audio/wav")}), "track_id")
+            return measure(upload, args.embed_files, 1)      # first call also spawns the pool
+        if name == "auto_decay_and_archive":
+            return measure(lambda i: _ok(client.post("/discover/maintenance"), "result"), n, warmup)
+        return None                                         # TrendFlow writes have no HTTP route
+
+    scenarios = [s for s in SCENARIOS if not args.only or s in args.only]
+    results: List[Dict[str, Any]] = []
+
+    def record(name: str, mode: str, result: Optional[Dict[str, Any]]):
+        if result is None:
+            return
+        results.append({"scenario": name, "mode": mode, "size": size, **result})
+        print(f"  {name:24s} {mode:10s} p50 {result.get('p50_ms', float('nan')):9.3f} ms  "
+              f"p99 {result.get('p99_ms', float('nan')):9.3f} ms  "
+              f"{result.get('throughput_per_s', 0):9.1f}/s  errors {result['errors']}")
+
+    if "inprocess" in args.modes:
+        for name in scenarios:
+            record(name, "inprocess", inprocess(name))
+
+    if "asgi" in args.modes:
+        from fastapi.testclient import TestClient
+        from api.lifecycle import lifecycle
+        from api.main import app
+        lifecycle.steps[:] = []             # data is already in place: ready at once, no Redis or scheduler
+        with TestClient(app) as client:
+            for name in scenarios:
+                record(name, "asgi", asgi(name, client))
+
+    return {"size": size, "setup": setup, "results": results}
+
+
+# ────────────────────────────────────────────────
+# 🔹 Runs, results files and comparison
+# ────────────────────────────────────────────────
+def _git(*cmd: str) -> str:
+    try:
+        return subprocess.run(["git", *cmd], cwd=REPO_ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run_meta(args) -> Dict[str, Any]:
+    return {
+        "commit": _git("rev-parse", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "child", "child_out")},
+    }
+
+
+def run_child(size: int, argv: List[str]) -> Dict[str, Any]:
+    """Benchmark one size in a fresh interpreter (clean singletons, no state across sizes)."""
+    fd, out = tempfile.mkstemp(suffix=".json", prefix="bench_suite_")
+    os.close(fd)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+    try:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_suite", *argv, "--child", str(size), "--child-out", out],
+                       env=env, check=True)
+        with open(out) as f:
+            return json.load(f)
+    finally:
+        os.remove(out)
+
+
+def child_argv(args) -> List[str]:
+    """The per-size flags, forwarded to each child run."""
+    argv = ["--requests", str(args.requests), "--warmup", str(args.warmup),
+           "--embed-files", str(args.embed_files), "--wav-seconds", str(args.wav_seconds),
+           "--modes", *args.modes]
+    if args.only:
+        argv += ["--only", *args.only]
+    return argv
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print p50/p99 change per matching (scenario, mode, size); return the regressions."""
+    key = lambda r: (r["scenario"], r["mode"], r["size"])
+    before = {key(r): r for r in baseline.get("results", []) if "p50_ms" in r}
+    regressions = []
+    print(f"\nvs {str(baseline.get('meta', {}).get('commit'))[:12]} (tolerance {tolerance:.0%})")
+    print(f"{'scenario':24s} {'mode':10s} {'size':>9s} {'p50 before':>11s} {'after':>9s} {'change':>8s} "
+          f"{'p99 before':>11s} {'after':>9s} {'change':>8s}")
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None or "p50_ms" not in r:
+            continue
+        changes = [(r[p] - old[p]) / old[p] if old[p] else 0.0 for p in ("p50_ms", "p99_ms")]
+        flag = ""
+        if changes[0] > tolerance:
+            flag = "  ⚠️ slower"
+            regressions.append(f"{r['scenario']}/{r['mode']}/{r['size']}")
+        print(f"{r['scenario']:24s} {r['mode']:10s} {r['size']:9d} {old['p50_ms']:11.3f} {r['p50_ms']:9.3f} "
+              f"{changes[0]:+8.1%} {old['p99_ms']:11.3f} {r['p99_ms']:9.3f} {changes[1]:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommend, discover, embed and TrendFlow hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--requests", type=int, default=200, help="measured calls per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured calls per scenario")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, help="run only these scenarios")
+    parser.add_argument("--embed-files", type=int, default=8, help="distinct WAVs embedded per mode")
+    parser.add_argument("--wav-seconds", type=float, default=10.0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="results JSON of an earlier run to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="p50 slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        result = run_size(args.child, args)
+        with open(args.child_out, "w") as f:
+            json.dump(result, f)
+        scratch = os.getcwd()       # run_size's synthetic data directory
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(scratch, ignore_errors=True)
+        return
+
+    report: Dict[str, Any] = {"meta": run_meta(args), "setup": {}, "results": []}
+    for size in args.sizes:
+        print(f"\n📊 {size:,} vectors")
+        child = run_child(size, child_argv(args))
+        report["setup"][str(size)] = child["setup"]
+        report["results"].extend(child["results"])
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"⚠️ {len(regressions)} regression(s): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,238 @@
 import numpy as np
 import soundfile as sf
 import librosa
+from typing import Optional, Tuple
+from embeddings.embedding_cache import EmbeddingCache, array_digest, file_digest
+
+# Bump whenever feature extraction changes, so cached embeddings are not reused
+FEATURE_VERSION = 1
+
+# STFT shared by every feature family (librosa's defaults, so features match
+# the per-feature librosa calls they replace)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Harmonic source for tonnetz:
+#   "exact" – HPSS on the shared STFT + inverse STFT + CQT chroma
+#             (same result as tonnetz(y=effects.harmonic(y)), one STFT fewer)
+#   "fast"  – HPSS on the shared power spectrogram below HARMONIC_FMAX only,
+#             chroma straight from the harmonic part (no inverse STFT, no CQT)
+#   "none"  – no separation, tonnetz from the full-signal chroma
+HARMONIC_MODES = ("exact", "fast", "none")
+HARMONIC_FMAX = 3000.0   # Hz; chroma's octave weighting leaves little energy above this
+
+# Rows per feature family in the frame matrix: mfcc, chroma, spectral contrast, tonnetz
+FEATURE_SIZES = (20, 12, 7, 6)
+
+# Streaming mode: decode this much audio at a time, so memory does not grow
+# with the file; segment sampling reads SEGMENT_SECONDS windows spread
+# across the whole track instead of only its head
+STREAM_BLOCK_SECONDS = 20.0
+SEGMENT_SECONDS = 10.0
+
+
+def pool_features(mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """[family mean, family std] per feature family, in FEATURE_SIZES order."""
+    parts, start = [], 0
+    for size in FEATURE_SIZES:
+        parts += [mean[start:start + size], std[start:start + size]]
+        start += size
+    return np.concatenate(parts)
+
+
+class RunningStats:
+    """Per-row mean/std over feature frames fed in blocks (Chan et al. merge)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean: Optional[np.ndarray] = None
+        self.m2: Optional[np.ndarray] = None
+
+    def update(self, frames: np.ndarray):
+        frames = np.asarray(frames, dtype=np.float64)
+        n_b = frames.shape[1]
+        if n_b == 0:
+            return
+        mean_b = frames.mean(axis=1)
+        m2_b = ((frames - mean_b[:, None]) ** 2).sum(axis=1)
+        if self.n == 0:
+            self.n, self.mean, self.m2 = n_b, mean_b, m2_b
+            return
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * n_b / n)
+        self.n = n
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / self.n)
+
 
 class AudioEmbedder:
     """
     Converts audio files into numeric embeddings that represent
     timbre, rhythm, and spectral structure.
     Gracefully falls back to random embeddings if audio loading fails.
+    With a cache, identical content (same file bytes or same decoded
+    audio) under the same config is embedded only once.
+
+    With `streaming=True` the file is decoded block by block and features
+    are pooled with running statistics, so memory stays flat however long
+    the upload is; `segments=N` samples N windows across the full track
+    instead of its first `duration` seconds (`duration=None` reads it all).
     """
 
-    def __init__(self, dim: int = 128, sr: int = 22050):
+    def __init__(self, dim: int = 128, sr: int = 22050, duration: Optional[float] = 60,
+                 cache: Optional[EmbeddingCache] = None, harmonic: str = "exact",
+                 streaming: bool = False, segments: int = 0):
+        if harmonic not in HARMONIC_MODES:
+            raise ValueError(f"harmonic must be one of {HARMONIC_MODES}, got {harmonic!r}")
         self.dim = dim
         self.sr = sr
+        self.duration = duration
+        self.cache = cache
+        self.harmonic = harmonic
+        self.streaming = streaming or segments > 0
+        self.segments = segments
+
+    @property
+    def config(self) -> str:
+        config = f"d{self.dim}-sr{self.sr}-t{self.duration}-v{FEATURE_VERSION}"
+        # "exact" matches the original extraction, so it keeps the original cache keys
+        if self.harmonic != "exact":
+            config += f"-h{self.harmonic}"
+        if self.segments:
+            config += f"-seg{self.segments}x{SEGMENT_SECONDS:g}"
+        elif self.streaming:
+            config += f"-stream{STREAM_BLOCK_SECONDS:g}"
+        return config
+
+    def extract_features(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """Mean/std-pooled features of a whole in-memory signal."""
+        frames = self.frame_features(y, sr)
+        return pool_features(frames.mean(axis=1), frames.std(axis=1))
+
+    def frame_features(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """
+        Per-frame mfcc, chroma, spectral contrast and tonnetz stacked into
+        one (sum(FEATURE_SIZES), frames) matrix, all derived from a single
+        STFT of `y` instead of one per feature.
+        """
+        D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        S = np.abs(D)
+        S_power = S ** 2
+
+        mel = librosa.feature.melspectrogram(S=S_power, sr=sr)
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=20)
+        del mel
+        chroma = librosa.feature.chroma_stft(S=S_power, sr=sr)
+        spec_contrast = librosa.feature.spectral_contrast(S=S, sr=sr)
+        del S
+
+        if self.harmonic == "none":
+            tonnetz = librosa.feature.tonnetz(chroma=chroma, sr=sr)
+        elif self.harmonic == "fast":
+            low = int(np.searchsorted(librosa.fft_frequencies(sr=sr, n_fft=N_FFT), HARMONIC_FMAX))
+            harmonic_power = np.zeros_like(S_power)
+            harmonic_power[:low] = librosa.decompose.hpss(S_power[:low])[0]
+            tonnetz = librosa.feature.tonnetz(chroma=librosa.feature.chroma_stft(S=harmonic_power, sr=sr), sr=sr)
+        else:
+            del S_power
+            D_harmonic = librosa.decompose.hpss(D)[0]
+            del D
+            y_harmonic = librosa.istft(D_harmonic, hop_length=HOP_LENGTH, length=len(y), dtype=y.dtype)
+            tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=sr)
+
+        frames = min(m.shape[1] for m in (mfcc, chroma, spec_contrast, tonnetz))
+        return np.vstack([m[:, :frames] for m in (mfcc, chroma, spec_contrast, tonnetz)])
+
+    # ────────────────────────────────────────────────
+    # 🔹 Streaming decode
+    # ────────────────────────────────────────────────
+    def _blocks(self, filepath: str):
+        """Yield (samples, native_sr) blocks: sampled segments, or the head/whole file in order."""
+        with sf.SoundFile(filepath) as f:
+            native_sr = f.samplerate
+            seg = int(SEGMENT_SECONDS * native_sr)
+            if self.segments and f.frames > seg * self.segments:
+                starts = np.linspace(0, max(f.frames - seg, 0), self.segments).astype(int)
+                for start in sorted(set(starts.tolist())):
+                    f.seek(start)
+                    yield f.read(seg, dtype="float32", always_2d=True), native_sr
+                return
+        # Short tracks under segment sampling are simply read whole
+        frames = -1 if self.duration is None or self.segments else int(self.duration * native_sr)
+        block = int(STREAM_BLOCK_SECONDS * native_sr)
+        for data in sf.blocks(filepath, blocksize=block, frames=frames, dtype="float32", always_2d=True):
+            yield data, native_sr
+
+    def stream_features(self, filepath: str) -> np.ndarray:
+        """Pooled features from block-wise decoding, with bounded memory."""
+        stats = RunningStats()
+        for data, native_sr in self._blocks(filepath):
+            y = data.mean(axis=1)
+            if native_sr != self.sr:
+                y = librosa.resample(y, orig_sr=native_sr, target_sr=self.sr)
+            # A sliver of a tail block adds nothing but edge effects
+            if len(y) < N_FFT * 4 and stats.n:
+                continue
+            stats.update(self.frame_features(y, self.sr))
+        if stats.n == 0:
+            raise ValueError("Empty audio file")
+        return pool_features(stats.mean, stats.std)
 
     def embed(self, filepath: str) -> np.ndarray:
         """
         Generate a 128-D embedding for an audio file, with safe fallbacks.
         """
+        return self.embed_checked(filepath)[0]
+
+    def embed_checked(self, filepath: str) -> Tuple[np.ndarray, bool]:
+        """
+        Like embed(), but returns (vector, fallback): fallback is True when
+        the file could not be embedded and the vector is random, so callers
+        can avoid treating it as the file's content.
+        """
+        raw_key = None
+        if self.cache is not None:
+            try:
+                raw_key = self.cache.key("raw", file_digest(filepath), self.config)
+            except OSError:
+                pass
+            cached = self.cache.get(raw_key) if raw_key else None
+            if cached is not None:
+                self.cache.record(hit=True)
+                return cached, False
+
         try:
-            # 1️⃣ Try loading normally
-            y, sr = librosa.load(filepath, sr=self.sr, mono=True, duration=60)
-            if len(y) == 0:
-                raise ValueError("Empty audio file")
-
-            # 2️⃣ Extract spectral features
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-            spec_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-            tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(y), sr=sr)
-
-            # 3️⃣ Combine mean + std pooling
-            features = np.concatenate([
-                mfcc.mean(axis=1), mfcc.std(axis=1),
-                chroma.mean(axis=1), chroma.std(axis=1),
-                spec_contrast.mean(axis=1), spec_contrast.std(axis=1),
-                tonnetz.mean(axis=1), tonnetz.std(axis=1)
-            ])
+            pcm_key = None
+            features = None
+            if self.streaming:
+                try:
+                    # 1️⃣ Decode block by block (libsndfile formats)
+                    features = self.stream_features(filepath)
+                except sf.LibsndfileError as e:
+                    print(f"⚠️ Streaming decode unsupported for {filepath} ({e}), loading in memory")
+
+            if features is None:
+                # 1️⃣ Try loading normally
+                y, sr = librosa.load(filepath, sr=self.sr, mono=True, duration=self.duration)
+                if len(y) == 0:
+                    raise ValueError("Empty audio file")
+
+                if self.cache is not None:
+                    pcm_key = self.cache.key("pcm", array_digest(y), self.config)
+                    cached = self.cache.get(pcm_key)
+                    if cached is not None:
+                        self.cache.record(hit=True)
+                        if raw_key:
+                            self.cache.put(raw_key, cached)
+                        return cached, False
+
+                # 2️⃣ + 3️⃣ Spectral features from one shared STFT, mean + std pooled
+                features = self.extract_features(y, sr)
+                del y
 
             # 4️⃣ Normalize to fixed length
             vec = np.zeros((self.dim,), dtype=np.float32)
@@ -44,11 +241,17 @@ class AudioEmbedder:
             norm = np.linalg.norm(vec)
             if norm > 0:
                 vec /= norm
-            return vec
+
+            if self.cache is not None:
+                self.cache.record(hit=False)
+                for key in (raw_key, pcm_key):
+                    if key:
+                        self.cache.put(key, vec)
+            return vec, False
 
         except Exception as e:
             # 🧩 Graceful fallback
             print(f"[WARN] AudioEmbedder fallback used due to error: {e}")
             np.random.seed(abs(hash(filepath)) % (2**32))
-            return np.random.rand(self.dim).astype(np.float32)
+            return np.random.rand(self.dim).astype(np.float32), True
 
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, Optional
+
+CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/embedding_cache.sqlite")
+CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def file_digest(path: str) -> str:
+    """Hash of the raw file bytes (cheap: no decoding)."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def array_digest(y: np.ndarray) -> str:
+    """Hash of decoded audio samples."""
+    return hashlib.blake2b(np.ascontiguousarray(y).tobytes(), digest_size=20).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded LRU cache of embeddings keyed by content hash
+    plus embedder config. Backed by SQLite (WAL mode), so every worker
+    process of the embedding pool can share it; hit/miss counters live in
+    the same file. Cache failures never break embedding: they read as misses.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                         "key TEXT PRIMARY KEY, vec BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('bytes', 0)")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(kind: str, digest: str, config: str) -> str:
+        return f"{kind}:{digest}:{config}"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        try:
+            db = self._db()
+            row = db.execute("SELECT vec FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            return np.frombuffer(row[0], dtype=np.float32).copy()
+        except sqlite3.Error as e:
+            print(f"⚠️ Embedding cache read failed: {e}")
+            return None
+
+    def record(self, hit: bool):
+        """Count one embed() outcome (a lookup may probe several keys)."""
+        try:
+            self._db().execute("UPDATE stats SET value = value + 1 WHERE name = ?", ("hits" if hit else "misses",))
+        except sqlite3.Error:
+            pass
+
+    def put(self, key: str, vec: np.ndarray):
+        data = np.asarray(vec, dtype=np.float32).tobytes()
+        try:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                cur = db.execute("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)",
+                                 (key, data, len(data), time.time()))
+                if cur.rowcount:
+                    db.execute("UPDATE stats SET value = value + ? WHERE name = 'bytes'", (len(data),))
+            self._evict(db)
+        except sqlite3.Error as e:
+            print(f"⚠️ Embedding cache write failed: {e}")
+
+    def _evict(self, db: sqlite3.Connection):
+        """Drop least-recently-used entries until under `max_bytes`."""
+        total = db.execute("SELECT value FROM stats WHERE name = 'bytes'").fetchone()[0]
+        while total > self.max_bytes:
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                victims = db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 256").fetchall()
+                if not victims:
+                    break
+                db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+                freed = sum(size for _, size in victims)
+                db.execute("UPDATE stats SET value = value - ? WHERE name = 'bytes'", (freed,))
+            total -= freed
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            db = self._db()
+            counters = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error as e:
+            return {"error": str(e)}
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "bytes": counters["bytes"],
+            "max_bytes": self.max_bytes,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,106 @@
+"""
+Bulk catalog ingestion.
+
+    python -m embeddings.ingest <directory | manifest> [--workers N]
+
+A manifest is a text file with one audio path per line, or one JSON
+object per line: {"path": ..., "track_id": ..., "metadata": {...}}.
+Files whose track id is already in the VectorStore, or whose content is
+(same bytes under the same embedder config, recorded as each track's
+"content_key"), are skipped; the rest are embedded across all cores and committed in one bulk write followed
+by a snapshot checkpoint. It writes the same data/vector_index the
+server maps: with the API running, the workers pick the new vectors up
+from the shared log and the API's writer process checkpoints them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from embeddings.worker_pool import EMBED_HARMONIC, EMBED_WORKERS, _embed_file, _init_worker, content_key
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aif", ".aiff"}
+
+Source = Tuple[str, str, Dict[str, Any]]   # (path, track_id, metadata)
+
+
+def iter_sources(source: str) -> Iterator[Source]:
+    """Yield (path, track_id, metadata) from a directory tree or a manifest file."""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    yield os.path.join(root, name), name, {"source": "ingest"}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            path = entry["path"] if os.path.isabs(entry["path"]) else os.path.join(base, entry["path"])
+            track_id = entry.get("track_id") or os.path.basename(path)
+            yield path, track_id, {"source": "ingest", **entry.get("metadata", {})}
+
+
+def ingest(sources: List[Source], store, workers: int = EMBED_WORKERS, chunksize: int = 4) -> Dict[str, Any]:
+    """Embed every new source in parallel and commit them to `store` in one bulk write."""
+    candidates = [s for s in sources if s[1] not in store.vectors]
+
+    start = time.time()
+    items = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(128, 22050, EMBED_HARMONIC)) as pool:
+        # --- Skip content already stored (or repeated in this run) ---
+        keys = pool.map(content_key, [path for path, _, _ in candidates], chunksize=chunksize)
+        seen = set()
+        todo = []
+        for (path, track_id, metadata), key in zip(candidates, keys):
+            if key not in seen and store.track_with_content(key) is None:
+                seen.add(key)
+                todo.append((path, track_id, {**metadata, "content_key": key}))
+        skipped = len(sources) - len(todo)
+        print(f"🎧 {len(todo)} files to embed, {skipped} already embedded, {workers} workers")
+
+        results = pool.map(_embed_file, [path for path, _, _ in todo], chunksize=chunksize)
+        for n, ((_, track_id, metadata), (vec, fallback)) in enumerate(zip(todo, results), 1):
+            if fallback:
+                metadata.pop("content_key")     # random stand-in: let a later run embed this content
+            items[track_id] = (vec, metadata)
+            if n % 100 == 0:
+                print(f"   {n}/{len(todo)} embedded ({n / (time.time() - start):.1f} files/s)")
+    embed_seconds = time.time() - start
+
+    if items:
+        store.add_vectors(items)
+        store.checkpoint()
+    elapsed = time.time() - start
+
+    stats = {
+        "embedded": len(items),
+        "skipped": skipped,
+        "seconds": round(elapsed, 2),
+        "files_per_sec": round(len(items) / embed_seconds, 2) if embed_seconds > 0 else 0.0,
+    }
+    print(f"✅ Ingest complete: {stats}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-embed an audio catalog into the vector store.")
+    parser.add_argument("source", help="directory to walk or manifest file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    from api.global_store import vector_store
+    vector_store.open(follow=False)
+    ingest(list(iter_sources(args.source)), vector_store, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
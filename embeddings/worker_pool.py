@@ -0,0 +1,218 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from embeddings.audio_embedder import AudioEmbedder
+from embeddings.embedding_cache import EmbeddingCache, file_digest
+
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+EMBED_HARMONIC = os.getenv("EMBED_HARMONIC", "exact")   # see audio_embedder.HARMONIC_MODES
+EMBED_STREAMING = os.getenv("EMBED_STREAMING", "1") == "1"   # block-wise decode, flat memory
+EMBED_SEGMENTS = int(os.getenv("EMBED_SEGMENTS", "0"))       # >0: sample windows across the full track
+KEEP_FINISHED_JOBS = 1000
+
+
+class QueueFull(Exception):
+    """Raised when the embedding queue is at capacity (backpressure)."""
+
+
+# ────────────────────────────────────────────────
+# 🔹 Worker process side
+# ────────────────────────────────────────────────
+_embedder: Optional[AudioEmbedder] = None
+
+
+def _init_worker(dim: int, sr: int, harmonic: str = EMBED_HARMONIC,
+                 streaming: bool = EMBED_STREAMING, segments: int = EMBED_SEGMENTS):
+    global _embedder
+    _embedder = AudioEmbedder(dim=dim, sr=sr, cache=EmbeddingCache(), harmonic=harmonic,
+                              streaming=streaming, segments=segments)
+
+
+def _embed_file(path: str) -> Tuple[np.ndarray, bool]:
+    """(vector, fallback) for `path`; see AudioEmbedder.embed_checked."""
+    return _embedder.embed_checked(path)
+
+
+def content_key(path: str, dim: int = 128, sr: int = 22050, harmonic: str = EMBED_HARMONIC) -> str:
+    """Raw embedding-cache key a worker started with these settings uses for `path`."""
+    config = AudioEmbedder(dim=dim, sr=sr, harmonic=harmonic, streaming=EMBED_STREAMING,
+                           segments=EMBED_SEGMENTS).config
+    return EmbeddingCache.key("raw", file_digest(path), config)
+
+
+# ────────────────────────────────────────────────
+# 🔹 Upload spooling
+# ────────────────────────────────────────────────
+SPOOL_CHUNK = 1 << 20
+
+
+def spool_upload(upload, suffix: Optional[str] = None) -> str:
+    """
+    Copy an UploadFile to a temp file in fixed-size chunks (blocking: run
+    it in a threadpool). Keeps the upload's extension so decoders that go
+    by name (audioread) still recognise it.
+    """
+    if suffix is None:
+        suffix = os.path.splitext(upload.filename or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(upload.file, tmp, SPOOL_CHUNK)
+        return tmp.name
+
+
+# ────────────────────────────────────────────────
+# 🔹 Jobs
+# ────────────────────────────────────────────────
+class EmbeddingJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.state = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.files = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict[str, Any]:
+        status = {"job_id": self.id, "state": self.state, "poll": f"/embed/jobs/{self.id}"}
+        if self.result is not None:
+            status["result"] = self.result
+        if self.error is not None:
+            status["error"] = self.error
+        if self.finished is not None:
+            seconds = max(self.finished - self.created, 1e-9)
+            status["seconds"] = round(seconds, 3)
+            if self.files > 1:
+                status["files"] = self.files
+                status["files_per_sec"] = round(self.files / seconds, 2)
+        return status
+
+
+class EmbeddingPool:
+    """
+    Bounded process pool for AudioEmbedder work, so librosa never runs on
+    the event loop. Jobs are submitted from async routes, can be awaited
+    with a timeout or polled by id, and submit() raises QueueFull once
+    `max_pending` jobs are in flight.
+    """
+
+    def __init__(self, workers: int = EMBED_WORKERS, max_pending: Optional[int] = None,
+                 dim: int = 128, sr: int = 22050):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.dim, self.sr = dim, sr
+        self.pending = 0
+        self.jobs: Dict[str, EmbeddingJob] = {}
+        self.listeners: List[Callable[[EmbeddingJob], None]] = []    # called with each finished job
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.dim, self.sr),
+            )
+        return self._executor
+
+    def content_key(self, path: str) -> str:
+        """Identity of `path`'s content as this pool embeds it (its raw cache key)."""
+        return content_key(path, self.dim, self.sr)
+
+    def submit(self, path: str, finalize: Callable[[np.ndarray, bool], Dict[str, Any]]) -> EmbeddingJob:
+        """
+        Queue `path` for embedding; `finalize(vec, fallback)` then runs in a
+        thread (store writes, geo lookup) and its return value is the job
+        result. fallback is True when `vec` is the embedder's random
+        stand-in. The file at `path` is removed when the job ends.
+        """
+        return self.submit_batch([path], lambda vecs, fallbacks: finalize(vecs[0], fallbacks[0]))
+
+    def submit_batch(self, paths: List[str],
+                     finalize: Callable[[List[np.ndarray], List[bool]], Dict[str, Any]]) -> EmbeddingJob:
+        """
+        Queue many files as one job; `finalize(vecs, fallbacks)` receives the
+        vectors and fallback flags in `paths` order (e.g. for one bulk store
+        write). A batch keeps at most `workers` files in flight, so single
+        uploads still interleave.
+        """
+        if self.pending >= self.max_pending:
+            raise QueueFull(f"{self.pending} embedding jobs already pending")
+        job = EmbeddingJob()
+        job.files = len(paths)
+        self.jobs[job.id] = job
+        self.pending += 1
+        job.task = asyncio.get_running_loop().create_task(self._run(job, paths, finalize))
+        return job
+
+    async def _run(self, job: EmbeddingJob, paths: List[str], finalize):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+
+        async def embed(path: str) -> Tuple[np.ndarray, bool]:
+            async with slots:
+                vec, fallback = await loop.run_in_executor(self._get_executor(), _embed_file, path)
+            if vec is None or not len(vec):
+                raise ValueError(f"Embedding failed: {os.path.basename(path)}")
+            return vec, fallback
+
+        try:
+            results = await asyncio.gather(*(embed(p) for p in paths))
+            vecs = [vec for vec, _ in results]
+            fallbacks = [fallback for _, fallback in results]
+            job.result = await loop.run_in_executor(None, finalize, vecs, fallbacks)
+            job.state = "done"
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None  # a worker died: start a fresh pool next time
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            self.pending -= 1
+            job.finished = time.time()
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            for listener in self.listeners:
+                try:
+                    listener(job)
+                except Exception as e:
+                    print(f"⚠️ Embedding job listener failed: {e}")
+            self._prune()
+
+    async def wait(self, job: EmbeddingJob, timeout: float) -> bool:
+        """Wait up to `timeout` seconds; True if the job has finished."""
+        await asyncio.wait({job.task}, timeout=timeout)
+        return job.task.done()
+
+    def get(self, job_id: str) -> Optional[EmbeddingJob]:
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.finished is not None]
+        if len(finished) <= KEEP_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda j: j.finished)
+        for job in finished[:len(finished) - KEEP_FINISHED_JOBS]:
+            self.jobs.pop(job.id, None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared by /embed and /artist/upload
+embedding_pool = EmbeddingPool()
@@ -10,18 +10,14 @@ class HybridRecommender:
         self.vs = vector_store
 
     def recommend(self, user_vec: np.ndarray, context: Dict[str, Any]) -> List[Dict[str, Any]]:
-        if not self.vs.vectors:
+        if not len(self.vs):
             return [{"error": "No tracks available yet. Embed or stream some songs first."}]
 
-        results = []
-        for track_id, vec in self.vs.vectors.items():
-            sim = self.cosine_similarity(user_vec, vec)
-            mood_bonus = self.mood_factor(context.get("mood"))
-            final_score = sim * mood_bonus
-            results.append({"track_id": track_id, "score": float(final_score)})
-
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:10]
+        # Batched top-k from the store; the mood bonus is a uniform scale,
+        # so it never changes the ranking.
+        mood_bonus = self.mood_factor(context.get("mood"))
+        hits = self.vs.search(user_vec, top_k=10)
+        return [{"track_id": track_id, "score": float(sim * mood_bonus)} for track_id, sim in hits]
 
     @staticmethod
     def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
@@ -1,29 +1,445 @@
 import os
+import sys
 import json
+import fcntl
+import shutil
+import struct
+import zlib
+import datetime
 import numpy as np
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
-INDEX_PATH = "data/vector_index.json"
+# Versioned binary snapshot layout:
+#   data/vector_index/CURRENT              → name of the live generation
+#   data/vector_index/gen-000001/
+#       manifest.json   format, version, dim, count, dtype
+#       vectors.npy     (count, dim) float32, L2-normalized rows
+#       ids.json        track ids, row order
+#       metadata.json   track_id → metadata sidecar
+#   data/vector_index/wal-000001.log       → puts/deletes on top of gen-000001
+#   data/vector_index/wal.lock             → flock: shared while appending, exclusive to rotate
+#   data/vector_index/writer.lock          → flock held by the one process that checkpoints
+INDEX_DIR = "data/vector_index"
+LEGACY_INDEX_PATH = "data/vector_index.json"
+INDEX_PATH = LEGACY_INDEX_PATH  # legacy name, kept for older imports
 
+FORMAT_NAME = "ai-core-vectors"
+FORMAT_VERSION = 1
+KEEP_GENERATIONS = 2
+WAL_LOCK = "wal.lock"
+WRITER_LOCK = "writer.lock"
 
-def save_index(vectors: dict):
+
+class IndexSnapshot(NamedTuple):
+    ids: List[str]
+    matrix: np.ndarray                  # memory-mapped read-only unless mmap=False
+    metadata: Dict[str, Dict[str, Any]]
+    manifest: Dict[str, Any]
+
+
+# ────────────────────────────────────────────────
+# 🔹 Generation helpers
+# ────────────────────────────────────────────────
+def _generation_number(name: str) -> int:
+    return int(name.split("-", 1)[1])
+
+
+def next_generation(index_dir: str = INDEX_DIR) -> str:
+    current = current_generation(index_dir)
+    return f"gen-{(_generation_number(current) + 1) if current else 1:06d}"
+
+
+def current_generation(index_dir: str = INDEX_DIR) -> Optional[str]:
+    """Name of the live snapshot generation, or None if there is none."""
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), "r") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name if os.path.isdir(os.path.join(index_dir, name)) else None
+
+
+def _write_json(path: str, obj: Any):
+    with open(path, "w") as f:
+        json.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _publish(index_dir: str, name: str):
+    """Atomically point CURRENT at `name` and prune old generations."""
+    tmp = os.path.join(index_dir, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(index_dir, "CURRENT"))
+
+    gens = sorted((g for g in os.listdir(index_dir) if g.startswith("gen-")), key=_generation_number)
+    for old in gens[:-KEEP_GENERATIONS]:
+        if old != name:
+            shutil.rmtree(os.path.join(index_dir, old), ignore_errors=True)
+
+
+# ────────────────────────────────────────────────
+# 🔹 Save
+# ────────────────────────────────────────────────
+def _rows_from_mapping(vectors) -> tuple:
+    ids = list(vectors)
+    if not ids:
+        return ids, 0, iter(()), {}
+    matrix = np.stack([np.asarray(vectors[k], dtype=np.float32).ravel() for k in ids])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return ids, matrix.shape[1], iter([matrix / norms]), {}
+
+
+def write_snapshot(ids: List[str], dim: int, chunks, metadata: Dict[str, Dict[str, Any]],
+                   index_dir: str, name: str):
+    """Write generation `name` from row chunks, then publish it atomically."""
+    gen_dir = os.path.join(index_dir, name)
+    shutil.rmtree(gen_dir, ignore_errors=True)
+    os.makedirs(gen_dir)
+
+    out = np.lib.format.open_memmap(
+        os.path.join(gen_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(len(ids), dim)
+    )
+    start = 0
+    for block in chunks:
+        out[start:start + len(block)] = block
+        start += len(block)
+    out.flush()
+    del out
+
+    _write_json(os.path.join(gen_dir, "ids.json"), ids)
+    _write_json(os.path.join(gen_dir, "metadata.json"), metadata)
+    _write_json(os.path.join(gen_dir, "manifest.json"), {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "dim": dim,
+        "count": len(ids),
+        "dtype": "float32",
+        "normalized": True,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    })
+    _publish(index_dir, name)
+    print(f"💾 Saved {len(ids)} vectors to {gen_dir}")
+
+
+def save_index(vectors, index_dir: str = INDEX_DIR) -> str:
+    """
+    Write a new binary snapshot generation and publish it atomically.
+    Accepts a VectorStore (streams its rows, metadata included) or a
+    plain track_id → vector mapping. Returns the generation name.
+
+    A store with a write-ahead log attached is checkpointed instead,
+    so concurrent appends are never lost.
+    """
+    if getattr(vectors, "log", None) is not None:
+        return vectors.checkpoint()
+    if hasattr(vectors, "export_rows"):
+        ids, dim, chunks, metadata = vectors.export_rows()
+    else:
+        ids, dim, chunks, metadata = _rows_from_mapping(vectors)
+
+    os.makedirs(index_dir, exist_ok=True)
+    name = next_generation(index_dir)
+    write_snapshot(ids, dim, chunks, metadata, index_dir, name)
+    return name
+
+
+# ────────────────────────────────────────────────
+# 🔹 Load
+# ────────────────────────────────────────────────
+def load_index(index_dir: str = INDEX_DIR, mmap: bool = True, migrate: bool = True) -> Optional[IndexSnapshot]:
+    """
+    Open the live snapshot. With `mmap` the matrix is a read-only
+    np.memmap: nothing is parsed or copied, pages load on demand (and
+    are shared through the page cache by every process mapping them).
+    Migrates a legacy JSON index on first use if `migrate`.
+    """
+    name = current_generation(index_dir)
+    if name is None:
+        if not migrate or not os.path.exists(LEGACY_INDEX_PATH):
+            return None
+        name = migrate_json_index(LEGACY_INDEX_PATH, index_dir)
+
+    gen_dir = os.path.join(index_dir, name)
+    with open(os.path.join(gen_dir, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported vector index format in {gen_dir}: {manifest}")
+
+    matrix = np.load(os.path.join(gen_dir, "vectors.npy"), mmap_mode="r" if mmap else None)
+    with open(os.path.join(gen_dir, "ids.json"), "r") as f:
+        ids = json.load(f)
+    with open(os.path.join(gen_dir, "metadata.json"), "r") as f:
+        metadata = json.load(f)
+
+    manifest["generation"] = name
+    print(f"📂 Loaded {len(ids)} vectors from {gen_dir}")
+    return IndexSnapshot(ids, matrix, metadata, manifest)
+
+
+# ────────────────────────────────────────────────
+# 🔹 Write-ahead log
+# ────────────────────────────────────────────────
+# Record: crc32(body) | body, body = op, id_len, meta_len, dim | id | meta json | float32 vector
+_CRC = struct.Struct("<I")
+_BODY = struct.Struct("<BHII")
+OP_PUT = 1
+OP_DELETE = 2
+
+
+def _wal_number(name: str) -> int:
+    return int(name[len("wal-"):-len(".log")])
+
+
+def _iter_records(data: bytes):
+    """Yield (start, end, op, track_id, vector, metadata) per intact record; stops at a torn or corrupt one."""
+    offset = 0
+    while offset + _CRC.size + _BODY.size <= len(data):
+        (crc,) = _CRC.unpack_from(data, offset)
+        op, id_len, meta_len, dim = _BODY.unpack_from(data, offset + _CRC.size)
+        end = offset + _CRC.size + _BODY.size + id_len + meta_len + 4 * dim
+        if end > len(data) or zlib.crc32(data[offset + _CRC.size:end]) != crc:
+            return
+        pos = offset + _CRC.size + _BODY.size
+        track_id = data[pos:pos + id_len].decode()
+        pos += id_len
+        metadata = json.loads(data[pos:pos + meta_len]) if meta_len else {}
+        pos += meta_len
+        vector = np.frombuffer(data, dtype=np.float32, count=dim, offset=pos) if dim else None
+        yield offset, end, op, track_id, vector, metadata
+        offset = end
+
+
+def _read_log(path: str, apply: Callable, offset: int = 0, truncate: bool = True,
+              skip: Optional[Set[int]] = None) -> Tuple[int, int]:
     """
-    Save vector embeddings to disk in JSON format.
+    Apply every intact record in `path` from byte `offset`, except those
+    starting at an offset in `skip`. Returns (records applied, end offset).
+    With `truncate` a torn or corrupt tail is cut off; only do that while
+    no other process can be appending.
     """
-    os.makedirs("data", exist_ok=True)
-    serializable = {k: v.tolist() for k, v in vectors.items()}
-    with open(INDEX_PATH, "w") as f:
-        json.dump(serializable, f)
-    print(f"💾 Saved {len(vectors)} vectors to {INDEX_PATH}")
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+
+    count = end = 0
+    for start, end, op, track_id, vector, metadata in _iter_records(data):
+        if skip and offset + start in skip:
+            skip.discard(offset + start)
+            continue
+        apply(op, track_id, vector, metadata)
+        count += 1
 
+    if truncate and end < len(data):
+        print(f"⚠️ Truncating {len(data) - end} bytes of torn log tail in {path}")
+        os.truncate(path, offset + end)
+    return count, offset + end
 
-def load_index() -> dict:
+
+class VectorLog:
     """
-    Load vector embeddings from disk (if available).
+    Append-only write-ahead log of vector puts and deletes.
+    Each upload costs one O(1) append (a single O_APPEND write, so
+    concurrent writers never interleave records) instead of a full
+    index rewrite; VectorStore.checkpoint() folds the log into a new
+    snapshot generation in the background.
+
+    The log is shared by every process using the same index_dir (e.g.
+    uvicorn workers): all of them append, each one follow()s the records
+    the others appended, and only the process holding the writer lock
+    checkpoints. Appends hold wal.lock shared; rotation and torn-tail
+    repair hold it exclusively, so no append can land in a retired log.
     """
-    if not os.path.exists(INDEX_PATH):
-        return {}
-    with open(INDEX_PATH, "r") as f:
+
+    def __init__(self, index_dir: str = INDEX_DIR, sync: bool = True):
+        self.index_dir = index_dir
+        self.sync = sync            # fsync each append (durable across power loss)
+        self.path: Optional[str] = None
+        self.records = 0            # records in the live log (own appends + followed)
+        self.offsets: Dict[str, int] = {}       # log path → bytes already applied
+        self.is_writer = False
+        self._own: Dict[str, Set[int]] = {}     # log path → start offsets of our own (applied) appends
+        self._fd: Optional[int] = None
+        self._lock_fd: Optional[int] = None
+        self._writer_fd: Optional[int] = None
+
+    # ────────────────────────────────────────────────
+    # 🔹 Cross-process locks
+    # ────────────────────────────────────────────────
+    @contextmanager
+    def _wal_lock(self, mode: int):
+        # flock is per open file: callers serialize in-process use (VectorStore holds its lock)
+        if self._lock_fd is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._lock_fd = os.open(os.path.join(self.index_dir, WAL_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def try_acquire_writer(self) -> bool:
+        """Become the checkpointing process if no live process holds the writer lock."""
+        if self.is_writer:
+            return True
+        os.makedirs(self.index_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.index_dir, WRITER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._writer_fd = fd        # released by the OS when this process exits
+        self.is_writer = True
+        return True
+
+    def _path_for(self, generation: Optional[str]) -> str:
+        number = _generation_number(generation) if generation else 0
+        return os.path.join(self.index_dir, f"wal-{number:06d}.log")
+
+    def _files_from(self, number: int) -> List[str]:
+        if not os.path.isdir(self.index_dir):
+            return []
+        names = sorted((n for n in os.listdir(self.index_dir) if n.startswith("wal-") and n.endswith(".log")),
+                       key=_wal_number)
+        return [os.path.join(self.index_dir, n) for n in names if _wal_number(n) >= number]
+
+    def open(self, generation: Optional[str]):
+        """Start appending to the log that sits on top of `generation`."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.close()
+        self.path = self._path_for(generation)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _advance(self):
+        """Move appends to the newest log if another process rotated (wal.lock held)."""
+        number = _wal_number(os.path.basename(self.path))
+        while os.path.exists(os.path.join(self.index_dir, f"wal-{number + 1:06d}.log")):
+            number += 1
+        path = os.path.join(self.index_dir, f"wal-{number:06d}.log")
+        if path != self.path:
+            self.close()
+            self.path = path
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self.records = 0
+
+    def append(self, op: int, track_id: str, vector: Optional[np.ndarray] = None,
+               metadata: Optional[Dict[str, Any]] = None):
+        tid = track_id.encode()
+        meta = json.dumps(metadata).encode() if metadata else b""
+        vec = np.asarray(vector, dtype=np.float32).ravel().tobytes() if vector is not None else b""
+        body = _BODY.pack(op, len(tid), len(meta), len(vec) // 4) + tid + meta + vec
+        record = memoryview(_CRC.pack(zlib.crc32(body)) + body)
+        size = len(record)
+        with self._wal_lock(fcntl.LOCK_SH):
+            self._advance()
+            while record:
+                record = record[os.write(self._fd, record):]
+            end = os.lseek(self._fd, 0, os.SEEK_CUR)    # O_APPEND: just past our record
+            if self.sync:
+                os.fsync(self._fd)
+        self._own.setdefault(self.path, set()).add(end - size)
+        self.records += 1
+
+    def replay(self, apply: Callable, generation: Optional[str], truncate: bool = True) -> int:
+        """
+        Re-apply logged mutations on top of snapshot `generation`.
+        Logs of later generations are replayed too: they exist only if a
+        checkpoint crashed before publishing, and replaying them is safe.
+        Torn tails are repaired (under the exclusive lock) if `truncate`.
+        """
+        number = _generation_number(generation) if generation else 0
+        count = 0
+        self.offsets, self._own = {}, {}
+        for path in self._files_from(number):
+            if truncate:
+                with self._wal_lock(fcntl.LOCK_EX):
+                    n, self.offsets[path] = _read_log(path, apply)
+            else:
+                n, self.offsets[path] = _read_log(path, apply, truncate=False)
+            count += n
+            if path == self._path_for(generation):
+                self.records = n
+        return count
+
+    def follow(self, apply: Callable, generation: Optional[str]) -> int:
+        """
+        Apply records other processes appended on top of snapshot
+        `generation` since the last call; our own appends are skipped
+        (they were applied when written). Cheap when nothing changed:
+        one directory listing and a stat per log.
+        """
+        number = _generation_number(generation) if generation else 0
+        count = 0
+        for path in self._files_from(number):
+            offset = self.offsets.get(path, 0)
+            try:
+                if os.path.getsize(path) <= offset:
+                    continue
+                n, self.offsets[path] = _read_log(path, apply, offset, truncate=False, skip=self._own.get(path))
+            except FileNotFoundError:
+                continue        # retired by a checkpoint; its records are in the new snapshot
+            count += n
+            if path == self.path:
+                self.records += n
+        return count
+
+    def position(self) -> Optional[Tuple[Tuple[str, int], ...]]:
+        """
+        Bytes applied per log file: equal in every process that applied the
+        same records. None while some of our own appends lie beyond what
+        follow() has read (our contents are then ahead of that position).
+        """
+        if any(self._own.values()):
+            return None
+        return tuple(sorted((os.path.basename(path), offset) for path, offset in self.offsets.items() if offset))
+
+    def reset(self):
+        """Forget what was applied (after re-mapping a snapshot: its logs are replayed from the start)."""
+        self.offsets, self._own = {}, {}
+
+    def exclusive(self):
+        """Hold off every appender (all processes) for the duration."""
+        return self._wal_lock(fcntl.LOCK_EX)
+
+    def rotate(self, next_generation: str) -> List[str]:
+        """
+        Switch appends to the log for `next_generation`; return the logs
+        it supersedes. Call inside exclusive() when other processes may append.
+        """
+        number = _generation_number(next_generation)
+        superseded = [p for p in self._files_from(0) if _wal_number(os.path.basename(p)) < number]
+        self.open(next_generation)
+        self.records = 0
+        return superseded
+
+
+# ────────────────────────────────────────────────
+# 🔹 One-shot migration from vector_index.json
+# ────────────────────────────────────────────────
+def migrate_json_index(json_path: str = LEGACY_INDEX_PATH, index_dir: str = INDEX_DIR) -> str:
+    """Convert the legacy JSON index into a binary snapshot, then retire it."""
+    with open(json_path, "r") as f:
         data = json.load(f)
-    print(f"📂 Loaded {len(data)} vectors from {INDEX_PATH}")
-    return {k: np.array(v) for k, v in data.items()}
+    name = save_index({k: np.asarray(v, dtype=np.float32) for k, v in data.items()}, index_dir)
+    os.replace(json_path, json_path + ".migrated")
+    print(f"🔁 Migrated {len(data)} vectors from {json_path}")
+    return name
+
 
+if __name__ == "__main__":
+    # python -m recommender.persistence migrate [json_path] [index_dir]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        migrate_json_index(*sys.argv[2:4])
+    else:
+        print("usage: python -m recommender.persistence migrate [json_path] [index_dir]")
@@ -0,0 +1,151 @@
+import dbm
+import os
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+PROFILE_DB = "data/user_profiles.db"
+PROFILE_CAPACITY = 100_000        # profiles kept hot in memory
+PROFILE_HALF_LIFE_DAYS = 30.0     # a play loses half its weight after this long
+REDIS_KEY = "user_profiles"
+
+
+class UserProfileStore:
+    """
+    Per-user taste profiles: time-decayed running means of the embeddings
+    of tracks a user played. Each play is an O(d) update. A bounded LRU
+    hot set lives in memory; evicted profiles spill to Redis when
+    available, otherwise to a local dbm file, and are reloaded on demand.
+
+    State per user is one float64 array: [weight, last_ts, sum...].
+    """
+
+    def __init__(self, capacity: int = PROFILE_CAPACITY, half_life_days: float = PROFILE_HALF_LIFE_DAYS,
+                 redis_client=None, db_path: str = PROFILE_DB,
+                 history: Optional[Callable[[str], Iterable[np.ndarray]]] = None):
+        self.capacity = capacity
+        self.half_life = half_life_days * 86400.0
+        self.redis = redis_client
+        self.db_path = db_path
+        self.history = history      # user_id → played track vectors (cold bootstrap)
+        self._hot: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Spill storage (Redis or local dbm)
+    # ────────────────────────────────────────────────
+    def _spill(self, user_id: str, state: np.ndarray):
+        data = state.astype(np.float64).tobytes()
+        try:
+            if self.redis is not None:
+                self.redis.hset(REDIS_KEY, user_id, data)
+                return
+        except Exception as e:
+            print(f"⚠️ Profile spill to Redis failed, using disk: {e}")
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with dbm.open(self.db_path, "c") as db:
+            db[user_id.encode()] = data
+
+    def _unspill(self, user_id: str) -> Optional[np.ndarray]:
+        data = None
+        try:
+            if self.redis is not None:
+                data = self.redis.hget(REDIS_KEY, user_id)
+        except Exception as e:
+            print(f"⚠️ Profile load from Redis failed: {e}")
+        if data is None:
+            try:
+                with dbm.open(self.db_path, "r") as db:
+                    data = db.get(user_id.encode())
+            except dbm.error:
+                pass  # nothing spilled to disk yet
+        return None if data is None else np.frombuffer(data, dtype=np.float64).copy()
+
+    def _state(self, user_id: str) -> Optional[np.ndarray]:
+        """Fetch a profile into the hot set (lock held)."""
+        state = self._hot.get(user_id)
+        if state is not None:
+            self._hot.move_to_end(user_id)
+            return state
+        state = self._unspill(user_id)
+        if state is not None:
+            self._remember(user_id, state)
+        return state
+
+    def _remember(self, user_id: str, state: np.ndarray):
+        self._hot[user_id] = state
+        self._hot.move_to_end(user_id)
+        while len(self._hot) > self.capacity:
+            old_id, old_state = self._hot.popitem(last=False)
+            self._spill(old_id, old_state)
+
+    # ────────────────────────────────────────────────
+    # 🔹 Updates and reads
+    # ────────────────────────────────────────────────
+    def observe(self, user_id: str, vector: np.ndarray, ts: Optional[float] = None):
+        """Fold one played track into the user's profile in O(d)."""
+        ts = time.time() if ts is None else ts
+        vec = np.asarray(vector, dtype=np.float64).ravel()
+        with self._lock:
+            state = self._state(user_id)
+            if state is None or len(state) != 2 + len(vec):
+                state = np.zeros(2 + len(vec), dtype=np.float64)
+                state[1] = ts
+                self._remember(user_id, state)
+
+            if ts >= state[1]:
+                decay = 0.5 ** ((ts - state[1]) / self.half_life)
+                state[0] = state[0] * decay + 1.0
+                state[2:] = state[2:] * decay + vec
+                state[1] = ts
+            else:
+                # Late event: decay the new play instead of the profile
+                weight = 0.5 ** ((state[1] - ts) / self.half_life)
+                state[0] += weight
+                state[2:] += weight * vec
+
+    def _load(self, user_id: str) -> Optional[np.ndarray]:
+        """The user's state, bootstrapped from history if unseen."""
+        with self._lock:
+            state = self._state(user_id)
+        if state is None and self.history is not None:
+            for vec in self.history(user_id):
+                self.observe(user_id, vec)
+            with self._lock:
+                state = self._state(user_id)
+        return state
+
+    def get(self, user_id: str) -> Optional[np.ndarray]:
+        """Return the user's profile vector, bootstrapping from history if unseen."""
+        state = self._load(user_id)
+        if state is None or state[0] <= 0:
+            return None
+        return (state[2:] / state[0]).astype(np.float32)
+
+    def revision(self, user_id: str) -> Optional[tuple]:
+        """Changes whenever the user's profile does: (weight, last play time), None if unseen."""
+        state = self._load(user_id)
+        with self._lock:
+            return None if state is None else (float(state[0]), float(state[1]))
+
+    def flush(self, chunk: int = 1000):
+        """Spill every hot profile (e.g. at shutdown), in bulk."""
+        with self._lock:
+            items = [(user_id, state.astype(np.float64).tobytes()) for user_id, state in self._hot.items()]
+        try:
+            if self.redis is not None:
+                for i in range(0, len(items), chunk):
+                    self.redis.hset(REDIS_KEY, mapping=dict(items[i:i + chunk]))
+                return
+        except Exception as e:
+            print(f"⚠️ Profile flush to Redis failed, using disk: {e}")
+        if items:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with dbm.open(self.db_path, "c") as db:
+                for user_id, data in items:
+                    db[user_id.encode()] = data
+
+    def __len__(self):
+        return len(self._hot)
@@ -1,43 +1,579 @@
 import os
+import bisect
+import fcntl
+import heapq
 import json
-from datetime import datetime, timedelta
+import math
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-TREND_FILE = "data/trends.json"
+TREND_FILE = "data/trends.json"        # legacy whole-file store, migrated on first load
+TREND_DIR = "data/trends"
+TREND_CHECKPOINT_RECORDS = int(os.getenv("TREND_CHECKPOINT_RECORDS", "200000"))
+TREND_FSYNC = os.getenv("TREND_FSYNC", "0") == "1"
+TREND_FOLLOW_SECONDS = float(os.getenv("TREND_FOLLOW_SECONDS", "1.0"))  # pick up other workers' events
+DECAY_PER_DAY = 0.98
+DECAY_RATE = -math.log(DECAY_PER_DAY) / 86400.0     # log-score lost per second
+SNAPSHOT_FORMAT = 2
 
+# Log layout (event sourcing):
+#   data/trends/snapshot.json      {"format": 2, "log": N, "trends": {track_id: [log_score, ref_time]}}
+#   data/trends/log-00000N.log     events applied on top of that snapshot
+#   data/trends/log.lock           flock: shared while appending, exclusive to rotate or repair
+#   data/trends/writer.lock        flock held by the one process that checkpoints
+# Record: crc32 | op u8 | value f64 | ts f64 | id_len u16 | track_id
+_CRC = struct.Struct("<I")
+_BODY = struct.Struct("<BddH")
+OP_BOOST = 1        # value = multiplicative boost
+OP_ARCHIVE = 2      # value = archive threshold; ts = maintenance time
+OP_REPLACE = 3      # value = entry count; the next `value` OP_SET records are the new table
+OP_SET = 4          # value = log_score, ts = ref_time (only inside an OP_REPLACE group)
+LOG_LOCK = "log.lock"
+WRITER_LOCK = "writer.lock"
 
+
+def _log_number(name: str) -> int:
+    return int(name[len("log-"):-len(".log")])
+
+
+def _epoch(utc_text: str) -> float:
+    """Legacy naive-UTC timestamp string → epoch seconds."""
+    dt = datetime.fromisoformat(utc_text)
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _encode(op: int, value: float, ts: float, track_id: str = "") -> bytes:
+    tid = track_id.encode()
+    body = _BODY.pack(op, value, ts, len(tid)) + tid
+    return _CRC.pack(zlib.crc32(body)) + body
+
+
+def _read_log(path: str, apply: Callable[[int, str, float, float], None], offset: int = 0,
+              truncate: bool = True, skip: Optional[List[Tuple[int, int]]] = None) -> Tuple[int, int]:
+    """
+    Apply every intact record in `path` from byte `offset`, except those
+    starting inside a `skip` range (this process's own appends, applied
+    when written). Returns (records applied, end offset). With `truncate`
+    a torn or corrupt tail is cut off; only do that while no other
+    process can be appending.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    starts = [lo for lo, _ in skip] if skip else []
+    pos = count = 0
+    while pos + _CRC.size + _BODY.size <= len(data):
+        (crc,) = _CRC.unpack_from(data, pos)
+        op, value, ts, id_len = _BODY.unpack_from(data, pos + _CRC.size)
+        end = pos + _CRC.size + _BODY.size + id_len
+        if end > len(data) or zlib.crc32(data[pos + _CRC.size:end]) != crc:
+            break
+        i = bisect.bisect_right(starts, offset + pos) - 1
+        if i < 0 or offset + pos >= skip[i][1]:
+            apply(op, data[end - id_len:end].decode(), value, ts)
+            count += 1
+        pos = end
+    if skip:
+        skip[:] = [(lo, hi) for lo, hi in skip if hi > offset + pos]
+    if truncate and pos < len(data):
+        print(f"⚠️ Truncating {len(data) - pos} bytes of torn trend log tail in {path}")
+        os.truncate(path, offset + pos)
+    return count, offset + pos
+
+
+class TrendStore:
+    """
+    In-memory TrendFlow scores, persisted by event sourcing: every boost
+    or maintenance pass is one appended log record (a batch of boosts is
+    one write), and checkpoint() folds the log into a snapshot. A lock
+    serializes writers, so concurrent play events never lose updates.
+
+    State per track: [log_score, ref_time (epoch seconds, UTC)]. Scores
+    decay continuously by DECAY_PER_DAY, evaluated lazily on read:
+        score(t) = exp(log_score - DECAY_RATE * (t - ref_time))
+    Every track decays at the same rate, so `log_score + DECAY_RATE *
+    ref_time` (the entry's key) orders tracks by current score at any
+    time. A min-heap on that key makes archival a pop of the entries
+    whose projected score fell below the threshold, not a full sweep.
+
+    Like recommender.persistence.VectorLog, the log is shared by every
+    process using the same trend_dir (e.g. uvicorn workers): all of them
+    append, each one follow()s what the others appended, and only the
+    process holding writer.lock checkpoints. Appends hold log.lock shared;
+    rotation and torn-tail repair hold it exclusively, so no append can
+    land in a log the writer is about to delete.
+    """
+
+    def __init__(self, trend_dir: str = TREND_DIR, sync: bool = TREND_FSYNC,
+                 checkpoint_records: int = TREND_CHECKPOINT_RECORDS):
+        self.trend_dir = trend_dir
+        self.sync = sync
+        self.checkpoint_records = checkpoint_records
+        self.trends: Dict[str, List[float]] = {}
+        self._heap: List[Tuple[float, str]] = []     # (key, track_id); stale entries skipped on pop
+        self.listeners: List[Callable[[str, List[str]], None]] = []   # called with (op, changed track ids)
+        self.records = 0            # records in the live log
+        self._log_no = 1
+        self._fd: Optional[int] = None
+        self._lock = threading.RLock()
+        self._checkpointing = False
+        self._replacing: Optional[Tuple[Dict[str, List[float]], int]] = None   # group being read
+        self.loaded = False
+
+        self.is_writer = False
+        self._base = 1                  # log number the loaded snapshot sits on
+        self._snapshot_stamp: Optional[Tuple[int, int]] = None      # (inode, mtime) of that snapshot
+        self._offsets: Dict[int, int] = {}                  # log number → bytes applied
+        self._own: Dict[int, List[Tuple[int, int]]] = {}    # log number → byte ranges of our own appends
+        self._lock_fd: Optional[int] = None
+        self._writer_fd: Optional[int] = None
+        self._follower: Optional[threading.Thread] = None
+
+    # ────────────────────────────────────────────────
+    # 🔹 Event application (live writes and replay share it)
+    # ────────────────────────────────────────────────
+    def _apply(self, op: int, track_id: str, value: float, ts: float) -> List[str]:
+        """Apply one event; returns the track ids whose entry changed."""
+        if op != OP_SET:
+            self._drop_replace()
+        if op == OP_REPLACE:
+            self._replacing = ({}, int(value))
+            return self._finish_replace()
+        if op == OP_SET:
+            if self._replacing is None:
+                return []
+            self._replacing[0][track_id] = [value, ts]
+            return self._finish_replace()
+        if op == OP_BOOST:
+            entry = self.trends.get(track_id)
+            if entry is None:
+                entry = self.trends[track_id] = [math.log(value), ts]
+            else:
+                entry[0] += math.log(value) - DECAY_RATE * (ts - entry[1])
+                entry[1] = ts
+            self._push(track_id, entry)
+            return [track_id]
+        if op == OP_ARCHIVE:
+            return self._archive(value, ts)
+        return []
+
+    def _drop_replace(self):
+        if self._replacing is not None:
+            print(f"⚠️ Dropping an incomplete trend replace ({len(self._replacing[0])} of "
+                  f"{self._replacing[1]} entries logged)")
+            self._replacing = None
+
+    def _finish_replace(self) -> List[str]:
+        """Swap in the replacement table once its whole group has been applied."""
+        table, expected = self._replacing
+        if len(table) < expected:
+            return []
+        changed = list(set(self.trends) | set(table))
+        self.trends = table
+        self._rebuild_heap()
+        self._replacing = None
+        return changed
+
+    @staticmethod
+    def _key(entry: List[float]) -> float:
+        return entry[0] + DECAY_RATE * entry[1]
+
+    def _push(self, track_id: str, entry: List[float]):
+        heapq.heappush(self._heap, (self._key(entry), track_id))
+        if len(self._heap) > 2 * len(self.trends) + 1024:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(self._key(entry), track_id) for track_id, entry in self.trends.items()]
+        heapq.heapify(self._heap)
+
+    def _archive(self, threshold: float, now: float) -> List[str]:
+        """Drop tracks whose projected score at `now` is below `threshold`; returns their ids."""
+        cutoff = math.log(threshold) + DECAY_RATE * now if threshold > 0 else -math.inf
+        heap, archived = self._heap, []
+        while heap and heap[0][0] < cutoff:
+            key, track_id = heapq.heappop(heap)
+            entry = self.trends.get(track_id)
+            if entry is not None and self._key(entry) == key:
+                del self.trends[track_id]
+                archived.append(track_id)
+        return archived
+
+    def _notify(self, op: str, track_ids: List[str]):
+        """op: "boost", "archive", "replace", or "follow" for changes read from other processes' logs."""
+        for listener in self.listeners:
+            try:
+                listener(op, track_ids)
+            except Exception as e:
+                print(f"⚠️ Trend listener failed: {e}")
+
+    # ────────────────────────────────────────────────
+    # 🔹 Log files
+    # ────────────────────────────────────────────────
+    def _log_path(self, number: int) -> str:
+        return os.path.join(self.trend_dir, f"log-{number:06d}.log")
+
+    def _log_numbers(self) -> List[int]:
+        return sorted(_log_number(n) for n in os.listdir(self.trend_dir)
+                      if n.startswith("log-") and n.endswith(".log"))
+
+    def _open_log(self, number: int):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._log_no = number
+        self._fd = os.open(self._log_path(number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def _log_lock(self, mode: int):
+        # flock is per open file: in-process callers are serialized by self._lock
+        if self._lock_fd is None:
+            self._lock_fd = os.open(os.path.join(self.trend_dir, LOG_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def try_acquire_writer(self) -> bool:
+        """Become the checkpointing process if no live process holds the writer lock."""
+        if self.is_writer:
+            return True
+        os.makedirs(self.trend_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.trend_dir, WRITER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._writer_fd = fd        # released by the OS when this process exits
+        self.is_writer = True
+        return True
+
+    def _advance(self):
+        """Move appends to the newest log if the writer rotated (log lock held)."""
+        number = self._log_no
+        while os.path.exists(self._log_path(number + 1)):
+            number += 1
+        if number != self._log_no:
+            self._open_log(number)
+            self.records = 0
+
+    def _append(self, data: bytes, n: int, sync: bool = False):
+        """One O_APPEND write (callers hold self._lock); remembers its range so follow() skips it."""
+        record = memoryview(data)
+        with self._log_lock(fcntl.LOCK_SH):
+            self._advance()
+            while record:
+                record = record[os.write(self._fd, record):]
+            end = os.lseek(self._fd, 0, os.SEEK_CUR)    # O_APPEND: just past our write
+            if self.sync or sync:
+                os.fsync(self._fd)
+        self._own.setdefault(self._log_no, []).append((end - len(data), end))
+        self.records += n
+
+    # ────────────────────────────────────────────────
+    # 🔹 Load / snapshot
+    # ────────────────────────────────────────────────
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.trend_dir, "snapshot.json")
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._snapshot_path())
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _load_state(self, truncate: bool) -> List[int]:
+        """Reset to the published snapshot plus its logs; returns the log numbers replayed."""
+        self.trends, self._heap, self._replacing = {}, [], None
+        self._base, self._snapshot_stamp = 1, None
+        try:
+            with open(self._snapshot_path(), "r") as f:
+                st = os.fstat(f.fileno())
+                snap = json.load(f)
+        except FileNotFoundError:
+            snap = None
+        if snap is not None:
+            if snap.get("format", 1) >= SNAPSHOT_FORMAT:
+                self.trends = {k: list(v) for k, v in snap["trends"].items()}
+            else:   # format 1 stored [score, last_update]
+                self.trends = {k: [math.log(score), ts] for k, (score, ts) in snap["trends"].items() if score > 0}
+            self._rebuild_heap()
+            self._base, self._snapshot_stamp = snap["log"], (st.st_ino, st.st_mtime_ns)
+
+        self._offsets, self._own = {}, {}
+        self.records = 0
+        numbers = [n for n in self._log_numbers() if n >= self._base]
+        for number in numbers:
+            try:
+                self.records, self._offsets[number] = _read_log(self._log_path(number), self._apply,
+                                                                truncate=truncate)
+            except FileNotFoundError:
+                continue        # retired by a checkpoint meanwhile; the next follow() reloads
+        if truncate:
+            self._drop_replace()        # a group cut short by a crash never takes effect
+        return numbers
+
+    def load(self):
+        """Snapshot + log replay; the writer imports a legacy trends.json once. Loads only once."""
+        os.makedirs(self.trend_dir, exist_ok=True)
+        start = time.time()
+        with self._lock:
+            if self.loaded:
+                return
+            self.try_acquire_writer()
+            if self.is_writer:
+                with self._log_lock(fcntl.LOCK_EX):     # nobody appends while torn tails are repaired
+                    numbers = self._load_state(truncate=True)
+            else:
+                numbers = self._load_state(truncate=False)
+            self._open_log(numbers[-1] if numbers else self._base)
+
+            if (self.is_writer and self._snapshot_stamp is None and not numbers
+                    and os.path.exists(TREND_FILE)):
+                self._migrate_legacy()
+            self.loaded = True
+        print(f"📂 TrendFlow loaded: {len(self.trends)} tracks ({self.records} log records) "
+              f"in {time.time() - start:.2f}s{' [writer]' if self.is_writer else ''}")
+
+    def _migrate_legacy(self):
+        with open(TREND_FILE, "r") as f:
+            legacy = json.load(f)
+        self.replace(legacy)
+        os.replace(TREND_FILE, TREND_FILE + ".migrated")
+        print(f"🔁 Migrated {len(legacy)} trends from {TREND_FILE}")
+
+    def checkpoint(self):
+        """
+        Fold the log into a new snapshot (writer process only). Under the
+        exclusive log lock it applies the other processes' pending events
+        and moves every appender to the next log; the snapshot is written
+        off-lock and published by atomic rename, and only then are the
+        superseded logs deleted. The others reload it on their next follow().
+        """
+        with self._lock:
+            if not self.is_writer or self._checkpointing:
+                return
+            self._checkpointing = True
+            with self._log_lock(fcntl.LOCK_EX):
+                self.follow()
+                number = max([self._log_no] + self._log_numbers()) + 1
+                self._open_log(number)
+                self.records = 0
+            state = {k: list(v) for k, v in self.trends.items()}
+        try:
+            path = self._snapshot_path()
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"format": SNAPSHOT_FORMAT, "log": number, "trends": state}, f)
+                f.flush()
+                os.fsync(f.fileno())
+                st = os.fstat(f.fileno())
+            os.replace(tmp, path)
+            with self._lock:
+                self._base, self._snapshot_stamp = number, (st.st_ino, st.st_mtime_ns)
+                self._offsets = {n: o for n, o in self._offsets.items() if n >= number}
+                self._own = {n: r for n, r in self._own.items() if n >= number}
+            for old in self._log_numbers():
+                if old < number:
+                    os.remove(self._log_path(old))
+            print(f"💾 TrendFlow snapshot: {len(state)} tracks (log-{number:06d})")
+        finally:
+            self._checkpointing = False
+
+    def _maybe_checkpoint(self, force: bool = False):
+        if (self.is_writer and (force or self.records >= self.checkpoint_records)
+                and not self._checkpointing):
+            threading.Thread(target=self.checkpoint, daemon=True).start()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Sharing one store across worker processes
+    # ────────────────────────────────────────────────
+    def follow(self) -> int:
+        """
+        Apply the events other processes appended since the last call (our
+        own were applied when written), or reload if the writer published
+        a new snapshot. Cheap when nothing changed: a stat of the snapshot,
+        a directory listing and a stat per log. Returns events applied.
+        """
+        changed: List[str] = []
+
+        def apply(op: int, track_id: str, value: float, ts: float):
+            changed.extend(self._apply(op, track_id, value, ts))
+
+        count = 0
+        with self._lock:
+            if not self.loaded:
+                return 0
+            if self._stamp() != self._snapshot_stamp:
+                old = self.trends
+                self._load_state(truncate=False)
+                changed = [k for k in set(old) | set(self.trends) if old.get(k) != self.trends.get(k)]
+                count = len(changed)
+            else:
+                for number in self._log_numbers():
+                    if number < self._base:
+                        continue
+                    path, offset = self._log_path(number), self._offsets.get(number, 0)
+                    try:
+                        if os.path.getsize(path) <= offset:
+                            continue
+                        n, self._offsets[number] = _read_log(path, apply, offset, truncate=False,
+                                                             skip=self._own.get(number))
+                    except FileNotFoundError:
+                        continue    # retired by a checkpoint; the next call reloads its snapshot
+                    count += n
+                    if number == self._log_no:
+                        self.records += n
+        if changed:
+            self._notify("follow", changed)
+        return count
+
+    def refresh(self) -> bool:
+        """follow(), taking over checkpoints if the writer process died. True if anything changed."""
+        if not self.loaded:
+            return False
+        if not self.is_writer and self.try_acquire_writer():
+            print(f"👑 Worker {os.getpid()} took over trend checkpoints.")
+        applied = self.follow()
+        self._maybe_checkpoint()
+        return applied > 0
+
+    def start_follower(self, interval: float = TREND_FOLLOW_SECONDS):
+        """Call refresh() every `interval` seconds on a daemon thread."""
+        if interval <= 0 or self._follower is not None:
+            return
+
+        def follow():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Trend refresh failed: {e}")
+
+        self._follower = threading.Thread(target=follow, daemon=True)
+        self._follower.start()
+
+    # ────────────────────────────────────────────────
+    # 🔹 Writes
+    # ────────────────────────────────────────────────
+    def boost_many(self, events: Iterable[Tuple[str, float]], ts: Optional[float] = None) -> Dict[str, float]:
+        """Apply many (track_id, boost) events with one lock hold and one log write."""
+        ts = time.time() if ts is None else ts
+        events = list(events)
+        if any(boost <= 0 for _, boost in events):
+            raise ValueError("Trend boosts must be positive")
+        data = b"".join(_encode(OP_BOOST, boost, ts, track_id) for track_id, boost in events)
+        with self._lock:
+            self._append(data, len(events))
+            for track_id, boost in events:
+                self._apply(OP_BOOST, track_id, boost, ts)
+            scores = {track_id: math.exp(self.trends[track_id][0]) for track_id, _ in events}
+        self._notify("boost", list(scores))
+        self._maybe_checkpoint()
+        return scores
+
+    def boost(self, track_id: str, boost: float = 1.1, ts: Optional[float] = None) -> float:
+        return self.boost_many([(track_id, boost)], ts)[track_id]
+
+    def archive(self, threshold: float = 0.3, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Maintenance pass (logged, so replay reproduces it): pops only the
+        expired entries off the heap. Returns (archived, remaining).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._append(_encode(OP_ARCHIVE, threshold, now), 1)
+            archived = self._archive(threshold, now)
+            remaining = len(self.trends)
+        self._notify("archive", archived)
+        self._maybe_checkpoint()
+        return len(archived), remaining
+
+    def replace(self, trends: Dict[str, Dict]):
+        """
+        Swap in a whole legacy-format mapping. Logged (and fsynced) as one
+        OP_REPLACE group in a single write: replay applies it only once
+        every entry is read, so a crash mid-write keeps the old table.
+        """
+        entries = [(track_id, math.log(float(entry["score"])), _epoch(entry["last_update"]))
+                   for track_id, entry in trends.items() if float(entry["score"]) > 0]
+        data = _encode(OP_REPLACE, len(entries), time.time()) + b"".join(
+            _encode(OP_SET, log_score, ref_time, track_id) for track_id, log_score, ref_time in entries)
+        with self._lock:
+            changed = set(self.trends) | set(trends)
+            self._append(data, len(entries) + 1, sync=True)
+            self._apply(OP_REPLACE, "", len(entries), 0.0)
+            for track_id, log_score, ref_time in entries:
+                self._apply(OP_SET, track_id, log_score, ref_time)
+        self._notify("replace", list(changed))
+        self._maybe_checkpoint(force=True)      # compaction only: the log already holds the table
+
+    # ────────────────────────────────────────────────
+    # 🔹 Reads
+    # ────────────────────────────────────────────────
+    def score(self, track_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Current (decayed) score, O(1)."""
+        entry = self.trends.get(track_id)
+        if entry is None:
+            return None
+        now = time.time() if now is None else now
+        return math.exp(entry[0] - DECAY_RATE * (now - entry[1]))
+
+    def export(self, now: Optional[float] = None) -> Dict[str, Dict]:
+        """Legacy trends.json shape: {track_id: {"score", "last_update"}}, scores decayed to `now`."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                track_id: {
+                    "score": math.exp(log_score - DECAY_RATE * (now - ts)),
+                    "last_update": str(datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)),
+                }
+                for track_id, (log_score, ts) in self.trends.items()
+            }
+
+    def __len__(self):
+        return len(self.trends)
+
+
+# Loaded by the API's warm-up (api.lifecycle) or on first use of the module API
+trend_store = TrendStore()
+
+
+def _store() -> TrendStore:
+    if not trend_store.loaded:
+        trend_store.load()
+    return trend_store
+
+
+# ────────────────────────────────────────────────
+# 🔹 Module API (unchanged signatures)
+# ────────────────────────────────────────────────
 def load_trends():
-    if not os.path.exists(TREND_FILE):
-        return {}
-    with open(TREND_FILE, "r") as f:
-        return json.load(f)
+    return _store().export()
 
 
 def save_trends(trends):
-    os.makedirs("data", exist_ok=True)
-    with open(TREND_FILE, "w") as f:
-        json.dump(trends, f, indent=2)
+    _store().replace(trends)
 
 
 def update_trend(track_id: str, boost: float = 1.1):
-    trends = load_trends()
-    entry = trends.get(track_id, {"score": 1.0, "last_update": str(datetime.utcnow())})
-    entry["score"] *= boost
-    entry["last_update"] = str(datetime.utcnow())
-    trends[track_id] = entry
-    save_trends(trends)
-    return {"track_id": track_id, "new_score": entry["score"]}
+    return {"track_id": track_id, "new_score": _store().boost(track_id, boost)}
 
 
-def auto_decay_and_archive(threshold: float = 0.3):
-    trends = load_trends()
-    now = datetime.utcnow()
-    for track_id, data in list(trends.items()):
-        last_update = datetime.fromisoformat(data["last_update"])
-        days_passed = (now - last_update).days
-        decay = 0.98 ** days_passed
-        data["score"] *= decay
-        if data["score"] < threshold:
-            trends.pop(track_id)
-    save_trends(trends)
-    return {"remaining": len(trends)}
+def update_trends(boosts: Iterable[Tuple[str, float]]):
+    """Batched update_trend: one lock hold and one log write for all events."""
+    return _store().boost_many(boosts)
+
 
+def auto_decay_and_archive(threshold: float = 0.3):
+    """Decay is applied lazily on read; this only archives tracks that fell below `threshold`."""
+    archived, remaining = _store().archive(threshold)
+    return {"archived": archived, "remaining": remaining}
@@ -0,0 +1,58 @@
+import numpy as np
+
+import api.global_store as global_store
+from api.catalog import TrackCatalog
+from api.global_store import VectorStore
+
+DIM = 8
+
+
+def _expected(catalog: TrackCatalog, store: VectorStore) -> np.ndarray:
+    return np.array([tid in store.vectors for tid in catalog.track_ids], dtype=bool)
+
+
+def test_in_store_follows_store_and_catalog_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(global_store, "MEMBERSHIP_JOURNAL", 64)
+    rng = np.random.default_rng(0)
+    store = VectorStore(use_redis=False, dim=DIM)
+    catalog = TrackCatalog(meta_dir=str(tmp_path / "meta"), artist_dir=str(tmp_path / "artists"))
+    ids = [f"t{n}" for n in range(300)]
+
+    for step in range(2000):
+        track_id = ids[rng.integers(len(ids))]
+        action = rng.integers(4)
+        if action == 0:
+            store.add_vector(track_id, rng.standard_normal(DIM))
+        elif action == 1:
+            store.remove_vector(track_id)
+        else:
+            catalog.upsert_artist(track_id, {"artist_name": "a"})
+        if step % 7 == 0:
+            mask = catalog.in_store(store)
+            np.testing.assert_array_equal(mask[:len(catalog.track_ids)], _expected(catalog, store))
+
+    # A swapped-in snapshot replaces the whole store
+    live = [tid for tid in ids if tid in store.vectors][:10]
+    matrix = np.stack([store.get_vector(tid) for tid in live])
+    store.attach_snapshot(live, matrix, {})
+    mask = catalog.in_store(store)
+    np.testing.assert_array_equal(mask[:len(catalog.track_ids)], _expected(catalog, store))
+
+
+def test_in_store_only_looks_up_changes(tmp_path):
+    store = VectorStore(use_redis=False, dim=DIM)
+    catalog = TrackCatalog(meta_dir=str(tmp_path / "meta"), artist_dir=str(tmp_path / "artists"))
+    for n in range(1000):
+        catalog.upsert_artist(f"t{n}", {"artist_name": "a"})
+        store.add_vector(f"t{n}", np.ones(DIM))
+    catalog.in_store(store)
+
+    store.add_vector("t1", np.full(DIM, 2.0))       # update: membership unchanged
+    store.add_vector("new", np.ones(DIM))
+    store.remove_vector("t5")
+    catalog.upsert_artist("new", {"artist_name": "a"})
+    _, changed = store.membership_changes(catalog._in_store_cursor)
+    assert changed == ["new", "t5"]
+
+    mask = catalog.in_store(store)
+    assert mask[catalog.row_of("new")] and not mask[catalog.row_of("t5")] and mask[catalog.row_of("t1")]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.global_store import VectorStore, vector_store
+from api.routes_embed import router
+from embeddings.worker_pool import embedding_pool
+
+DIM = 8
+
+
+def test_content_index_follows_metadata():
+    store = VectorStore(use_redis=False, dim=DIM)
+    store.add_vector("a", np.ones(DIM), {"content_key": "k1"})
+    store.add_vectors({"b": (np.ones(DIM), {"content_key": "k2"}), "c": (np.ones(DIM), None)})
+    assert store.track_with_content("k1") == "a" and store.track_with_content("k2") == "b"
+
+    store.add_vector("a", np.ones(DIM), {"content_key": "k3"})     # re-embedded with new content
+    assert store.track_with_content("k1") is None and store.track_with_content("k3") == "a"
+    store.remove_vector("b")
+    assert store.track_with_content("k2") is None
+
+    ids, _, chunks, metadata = store.export_rows()
+    swapped = VectorStore(use_redis=False, dim=DIM)
+    swapped.attach_snapshot(ids, np.concatenate(list(chunks)), metadata)
+    assert swapped.track_with_content("k3") == "a"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Workers are spawned on first use and read their cache path from the environment
+    monkeypatch.setenv("EMBED_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite"))
+    embedding_pool.shutdown()
+    app = FastAPI()
+    app.include_router(router, prefix="/embed")
+    yield TestClient(app)
+    embedding_pool.shutdown()
+
+
+def test_fallback_vector_does_not_claim_content(client):
+    junk = b"not audio at all"
+    first = client.post("/embed/batch", files=[("files", ("embed-junk-1.wav", junk))]).json()
+    assert first["embedded"] == ["embed-junk-1.wav"]
+    assert "content_key" not in vector_store.metadata["embed-junk-1.wav"]
+
+    # Same bytes again: the random stand-in must not make this look already embedded
+    second = client.post("/embed/batch", files=[("files", ("embed-junk-2.wav", junk))]).json()
+    assert second["embedded"] == ["embed-junk-2.wav"] and second["skipped"] == []
+    for track_id in ("embed-junk-1.wav", "embed-junk-2.wav"):
+        vector_store.remove_vector(track_id)
@@ -0,0 +1,34 @@
+import threading
+
+from api.location import UNKNOWN, Location, LocationResolver
+
+
+def _resolver(monkeypatch, looked_up: list) -> LocationResolver:
+    def lookup(kind, query):
+        looked_up.append(query)
+        return Location(1.0, 2.0, "Somewhere", None, "network")
+
+    monkeypatch.setattr(LocationResolver, "_network_lookup", staticmethod(lookup))
+    return LocationResolver(network=True, load_tables=False)
+
+
+def test_private_addresses_never_reach_the_geocoder(monkeypatch):
+    looked_up = []
+    resolver = _resolver(monkeypatch, looked_up)
+    for ip in ("127.0.0.1", "10.1.2.3", "192.168.0.7", "::1", "fe80::1", None, "not-an-ip"):
+        assert resolver.resolve(ip=ip) == UNKNOWN
+    assert looked_up == []
+
+    assert resolver.resolve(ip="8.8.8.8").known
+    assert looked_up == ["8.8.8.8"]
+
+
+def test_stats_count_every_resolve(monkeypatch):
+    resolver = _resolver(monkeypatch, [])
+    threads = [threading.Thread(target=lambda: [resolver.resolve(lat=1.0, lng=2.0) for _ in range(2000)])
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert resolver.info()["client"] == 16000
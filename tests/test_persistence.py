@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+
+import api.global_store as global_store
+from api.global_store import VectorStore
+from recommender.persistence import VectorLog, load_index, save_index
+
+DIM = 8
+
+
+def test_empty_snapshot_keeps_store_writable(tmp_path):
+    index_dir = str(tmp_path / "vector_index")
+    save_index(VectorStore(use_redis=False), index_dir)
+    snapshot = load_index(index_dir, migrate=False)
+    assert snapshot.manifest["count"] == 0 and snapshot.manifest["created"].endswith("+00:00")
+
+    for configured in (None, DIM):
+        store = VectorStore(use_redis=False, dim=configured)
+        store.attach_snapshot(snapshot.ids, snapshot.matrix, snapshot.metadata)
+        store.add_vector("a", np.ones(DIM))
+        assert store.dim == DIM and len(store) == 1
+        np.testing.assert_allclose(store.search(np.ones(DIM), top_k=1)[0][1], 1.0, atol=1e-6)
+
+
+# ────────────────────────────────────────────────
+# 🔹 Write-ahead log
+# ────────────────────────────────────────────────
+def _open(index_dir: str) -> VectorStore:
+    store = VectorStore(use_redis=False)
+    store.open(log=VectorLog(index_dir, sync=False), follow=False)
+    assert store.log.is_writer
+    return store
+
+
+def _crash(store: VectorStore):
+    """What the OS does when the process dies: close its log and drop its locks."""
+    log = store.log
+    log.close()
+    for fd in (log._lock_fd, log._writer_fd):
+        if fd is not None:
+            os.close(fd)
+
+
+def _write(store: VectorStore, n: int, prefix: str = "t"):
+    rng = np.random.default_rng(n)
+    for i in range(n):
+        store.add_vector(f"{prefix}{i}", rng.standard_normal(DIM), {"n": i})
+
+
+def _contents(store: VectorStore) -> dict:
+    return {tid: (store.get_vector(tid).round(6).tolist(), store.metadata[tid]) for tid in store.vectors}
+
+
+def _wal(index_dir: str) -> str:
+    (name,) = [n for n in os.listdir(index_dir) if n.startswith("wal-")]
+    return os.path.join(index_dir, name)
+
+
+def test_log_replays_after_crash(tmp_path):
+    index_dir = str(tmp_path / "vector_index")
+    store = _open(index_dir)
+    _write(store, 20)
+    store.remove_vector("t3")
+    store.add_vector("t4", np.ones(DIM), {"n": "updated"})
+    before = _contents(store)
+    _crash(store)
+
+    restarted = _open(index_dir)
+    assert _contents(restarted) == before and "t3" not in restarted.vectors
+
+
+def test_torn_tail_is_discarded(tmp_path):
+    index_dir = str(tmp_path / "vector_index")
+    store = _open(index_dir)
+    store.checkpoint()          # with a snapshot published, restarts keep appending to the same log
+    _write(store, 5)
+    intact = os.path.getsize(_wal(index_dir))
+    store.add_vector("torn", np.ones(DIM))
+    _crash(store)
+    os.truncate(_wal(index_dir), os.path.getsize(_wal(index_dir)) - 7)    # died mid-append
+
+    restarted = _open(index_dir)
+    assert sorted(restarted.vectors) == [f"t{i}" for i in range(5)]
+    assert os.path.getsize(_wal(index_dir)) == intact
+
+    # New appends land after the repaired tail and replay normally
+    restarted.add_vector("after", np.ones(DIM))
+    _crash(restarted)
+    assert "after" in _open(index_dir).vectors
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    index_dir = str(tmp_path / "vector_index")
+    store = _open(index_dir)
+    _write(store, 3)
+    offset = os.path.getsize(_wal(index_dir))
+    _write(store, 3, prefix="late")
+    _crash(store)
+    with open(_wal(index_dir), "r+b") as f:
+        f.seek(offset + 20)
+        byte = f.read(1)
+        f.seek(offset + 20)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    # Nothing at or past the bad checksum is applied
+    assert sorted(_open(index_dir).vectors) == ["t0", "t1", "t2"]
+
+
+def test_interrupted_checkpoint_loses_nothing(tmp_path, monkeypatch):
+    index_dir = str(tmp_path / "vector_index")
+    store = _open(index_dir)
+    _write(store, 10)
+    assert store.checkpoint() is not None
+    _write(store, 5, prefix="second")
+
+    # Crash after the log was rotated but before the snapshot was published
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(global_store, "write_snapshot", crash)
+    assert store.checkpoint() is None
+    store.add_vector("third", np.ones(DIM))
+    before = _contents(store)
+    _crash(store)
+    monkeypatch.undo()
+
+    restarted = _open(index_dir)
+    assert _contents(restarted) == before
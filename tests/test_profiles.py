@@ -0,0 +1,63 @@
+import json
+
+import fakeredis
+import numpy as np
+import pytest
+
+from ai_service.recommender import record_streams
+from ai_service.stream_consumer import STREAM_KEY, StreamFollower
+from api.global_store import user_profiles, vector_store
+from recommender.profiles import UserProfileStore
+
+DIM = 128
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_profiles, "redis", None)
+    monkeypatch.setattr(user_profiles, "db_path", str(tmp_path / "profiles.db"))
+    rng = np.random.default_rng(0)
+    for n in range(3):
+        vec = rng.standard_normal(DIM).astype(np.float32)
+        vector_store.add_vector(f"profile-track-{n}", vec / np.linalg.norm(vec))
+    return fakeredis.FakeRedis()
+
+
+def _play(client, user_id: str, track_id: str):
+    client.xadd(STREAM_KEY, {"data": json.dumps({"userId": user_id, "trackId": track_id})})
+
+
+def test_followed_play_updates_user_vector(client):
+    follower = StreamFollower(client=client, apply=record_streams)
+    follower.poll()     # resolves the start position: the (empty) stream's end
+
+    _play(client, "profile-user", "profile-track-0")
+    assert follower.poll() == 1
+    first = vector_store.get_user_vector("profile-user")
+    revision = user_profiles.revision("profile-user")
+    np.testing.assert_allclose(first, vector_store.get_vector("profile-track-0"), atol=1e-6)
+
+    _play(client, "profile-user", "profile-track-1")
+    follower.poll()
+    assert not np.allclose(vector_store.get_user_vector("profile-user"), first)
+    assert user_profiles.revision("profile-user") != revision
+
+
+def test_flush_and_position_survive_restart(client, tmp_path):
+    follower = StreamFollower(client=client, apply=record_streams)
+    follower.poll()
+    _play(client, "restart-user", "profile-track-2")
+    follower.poll()
+
+    # Shutdown path: spill profiles, then save where they end
+    user_profiles.flush()
+    follower.save_position()
+
+    restarted = UserProfileStore(db_path=user_profiles.db_path)
+    np.testing.assert_allclose(restarted.get("restart-user"), vector_store.get_vector("profile-track-2"), atol=1e-6)
+
+    applied = []
+    resumed = StreamFollower(client=client, apply=applied.extend)
+    _play(client, "restart-user", "profile-track-0")
+    resumed.poll()
+    assert [track_id for _, track_id, _ in applied] == ["profile-track-0"]
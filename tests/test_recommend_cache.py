@@ -0,0 +1,58 @@
+import json
+
+import fakeredis
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_service.recommender import record_streams
+from ai_service.stream_consumer import STREAM_KEY, StreamFollower
+from api.global_store import user_profiles, vector_store
+from api.result_cache import recommend_cache
+from api.routes_recommend import router
+
+DIM = 128
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_profiles, "redis", None)
+    monkeypatch.setattr(user_profiles, "db_path", str(tmp_path / "profiles.db"))
+    rng = np.random.default_rng(1)
+    for n in range(20):
+        vec = rng.standard_normal(DIM).astype(np.float32)
+        vector_store.add_vector(f"cache-track-{n}", vec / np.linalg.norm(vec))
+    recommend_cache.clear()
+
+    redis_client = fakeredis.FakeRedis()
+    follower = StreamFollower(client=redis_client, apply=record_streams)
+    follower.poll()
+    app = FastAPI()
+    app.include_router(router, prefix="/recommend")
+    return TestClient(app), redis_client, follower
+
+
+def _play(redis_client, follower, user_id: str, track_id: str):
+    redis_client.xadd(STREAM_KEY, {"data": json.dumps({"userId": user_id, "trackId": track_id})})
+    follower.poll()
+
+
+def test_new_play_busts_cached_recommendations(setup):
+    client, redis_client, follower = setup
+    _play(redis_client, follower, "cache-user", "cache-track-0")
+    start_hits = recommend_cache.stats_counts["hits"]
+
+    first = client.get("/recommend/", params={"user_id": "cache-user"}).json()["recommendations"]
+    assert first[0]["track_id"] == "cache-track-0"
+    client.get("/recommend/", params={"user_id": "cache-user"})
+    hits = recommend_cache.stats_counts["hits"]
+    assert hits == start_hits + 1
+
+    invalidated = recommend_cache.stats_counts["invalidated"]
+    for _ in range(5):
+        _play(redis_client, follower, "cache-user", "cache-track-7")
+    second = client.get("/recommend/", params={"user_id": "cache-user"}).json()["recommendations"]
+    assert recommend_cache.stats_counts["invalidated"] == invalidated + 1
+    assert recommend_cache.stats_counts["hits"] == hits
+    assert second[0]["track_id"] == "cache-track-7"
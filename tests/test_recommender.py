@@ -0,0 +1,95 @@
+import math
+from collections import Counter, OrderedDict, defaultdict
+
+import numpy as np
+import pytest
+
+import ai_service.recommender as recommender
+from ai_service.bloom import ScalableBloomFilter
+from ai_service.popularity import PopularityBoard
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """Isolated analytics state: the module's globals are shared with other tests."""
+    monkeypatch.setattr(recommender, "user_streams", defaultdict(list))
+    monkeypatch.setattr(recommender, "track_counts", defaultdict(int))
+    monkeypatch.setattr(recommender, "track_embeddings", {})
+    monkeypatch.setattr(recommender, "popularity", PopularityBoard())
+    monkeypatch.setattr(recommender, "_listened", OrderedDict())
+    return recommender
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = ScalableBloomFilter(fp_rate=1e-4)
+    members = [f"track-{i}" for i in range(10000)]
+    bloom.update(members)
+    # An insert that tests positive already (a false positive) is not counted again
+    assert len(members) - 10 < len(bloom) <= len(members) and len(bloom.stages) > 1
+    assert all(m in bloom for m in members)
+
+    probes = 50000
+    false_positives = sum(f"other-{i}" in bloom for i in range(probes))
+    assert false_positives / probes < 3e-4       # budget 1e-4, with room for sampling noise
+    assert bloom.nbytes < 8 * len(members)
+
+
+def test_popularity_board_orders_counts():
+    rng = np.random.default_rng(0)
+    board, counts = PopularityBoard(), Counter()
+    for _ in range(3000):
+        track_id = f"t{rng.integers(200)}"
+        n = int(rng.integers(-2, 5))
+        if rng.random() < 0.5:
+            board.add(track_id, n)
+        else:
+            board.add_many({track_id: n})
+        counts[track_id] = max(counts[track_id] + n, 0)
+
+    live = {k: v for k, v in counts.items() if v > 0}
+    assert len(board) == len(live)
+    ranked = list(board.iter_top())
+    assert [c for _, c in ranked] == sorted(live.values(), reverse=True)
+    assert all(live[track_id] == c for track_id, c in ranked)
+    assert board.top(10) == ranked[:10]
+
+    board.rebuild({"a": 3, "b": 0, "c": 7})
+    assert board.top(5) == [("c", 7), ("a", 3)]
+
+
+def test_recommendations_match_full_sort(fresh):
+    rng = np.random.default_rng(1)
+    plays = [(f"u{rng.integers(20)}", f"t{int(rng.zipf(1.5)) % 400}", 0.0) for _ in range(5000)]
+    fresh.record_streams(plays)
+    for n in range(400):
+        fresh.track_embeddings[f"t{n}"] = rng.standard_normal(3)
+    mood = fresh.mood_to_vector("calm")
+
+    for user_id in ("u0", "u7", "nobody"):
+        listened = set(fresh.user_streams.get(user_id, []))
+        want = sorted(
+            ((round(fresh.weighted_score(math.log1p(c), fresh.cosine_similarity(mood, fresh.track_embeddings[t])), 4), t)
+             for t, c in fresh.track_counts.items() if t not in listened),
+            reverse=True,
+        )[:5]
+        got = fresh.recommend_for_user(user_id, mood, limit=5)
+        assert [r["score"] for r in got] == [score for score, _ in want]
+        assert not listened & {r["track_id"] for r in got}
+
+
+def test_listened_filter_follows_replaced_history(fresh):
+    fresh.record_streams([("u", "a", 0.0), ("u", "b", 0.0)])
+    assert "b" in fresh.listened_filter("u")
+
+    fresh.record_stream("u", "c")
+    assert "c" in fresh.listened_filter("u")
+
+    # Same list, same length, different content (e.g. rewritten by a Redis sync)
+    fresh.user_streams["u"][:] = ["x", "y", "z"]
+    filt = fresh.listened_filter("u")
+    assert "z" in filt and "a" not in filt
+
+    # A new list object
+    fresh.user_streams["u"] = ["q"]
+    filt = fresh.listened_filter("u")
+    assert "q" in filt and "z" not in filt
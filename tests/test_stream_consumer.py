@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+
+import fakeredis
+
+from ai_service.stream_consumer import StreamConsumer
+
+STREAM = "test.recorded"
+
+
+def _play(client, user_id: str, track_id: str):
+    client.xadd(STREAM, {"data": json.dumps({"userId": user_id, "trackId": track_id})})
+
+
+def _consumer(client, applied: list) -> StreamConsumer:
+    return StreamConsumer(client=client, apply=applied.extend, stream=STREAM, group="g", consumer="c",
+                          block_ms=10, dead_stream=STREAM + ":dead")
+
+
+def test_bad_entries_are_acked_and_dead_lettered():
+    client = fakeredis.FakeRedis()
+    applied = []
+    consumer = _consumer(client, applied)
+    consumer.ensure_group()
+
+    _play(client, "u1", "t1")
+    client.xadd(STREAM, {"data": "not json"})
+    client.xadd(STREAM, {"data": "[1, 2]"})
+    client.xadd(STREAM, {b"\xff": b"x"})        # field name is not UTF-8
+    _play(client, "u2", "t2")
+
+    assert consumer.poll() == 5
+    assert [(u, t) for u, t, _ in applied] == [("u1", "t1"), ("u2", "t2")]
+    assert consumer.stats.invalid == 3
+    assert client.xpending(STREAM, "g")["pending"] == 0
+    assert client.xlen(STREAM + ":dead") == 3
+
+
+def test_run_recreates_deleted_group():
+    client = fakeredis.FakeRedis()
+    applied = []
+    consumer = _consumer(client, applied)
+    thread = threading.Thread(target=consumer.run, daemon=True)
+    thread.start()
+
+    def wait_for(n: int):
+        deadline = time.time() + 5
+        while len(applied) < n and time.time() < deadline:
+            time.sleep(0.01)
+        return len(applied)
+
+    _play(client, "u1", "t1")
+    assert wait_for(1) == 1
+
+    client.delete(STREAM)                       # NOGROUP on the next read
+    time.sleep(0.05)
+    _play(client, "u2", "t2")
+    assert wait_for(2) == 2
+    consumer.stop()
+    thread.join(timeout=2)
+    assert not thread.is_alive() and consumer.stats.errors >= 1
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import pytest
+
+from recommender.trendflow import DECAY_PER_DAY, TrendStore
+
+NOW = 1_790_000_000.0
+
+
+def _open(trend_dir: str) -> TrendStore:
+    store = TrendStore(trend_dir)
+    store.load()
+    return store
+
+
+def _crash(store: TrendStore):
+    """What the OS does when the process dies: close its log and drop its locks."""
+    for fd in (store._fd, store._lock_fd, store._writer_fd):
+        if fd is not None:
+            os.close(fd)
+
+
+def _logs(trend_dir: str):
+    return sorted(n for n in os.listdir(trend_dir) if n.startswith("log-"))
+
+
+def _scores(store: TrendStore) -> dict:
+    return {track_id: round(store.score(track_id, NOW), 9) for track_id in store.trends}
+
+
+def test_events_replay_after_crash(tmp_path):
+    trend_dir = str(tmp_path / "trends")
+    store = _open(trend_dir)
+    store.boost_many([("a", 1.1), ("b", 1.5)], ts=NOW - 3600)
+    store.boost("a", 1.2, ts=NOW - 60)
+    store.boost("c", 2.0, ts=NOW - 86400 * 30)
+    store.archive(1.2, now=NOW)       # only c (2.0 decayed 30 days, ~1.09) falls below
+    before = _scores(store)
+    _crash(store)
+
+    restarted = _open(trend_dir)
+    assert _scores(restarted) == before and "c" not in restarted.trends
+
+
+def test_checkpoint_folds_log_into_snapshot(tmp_path):
+    trend_dir = str(tmp_path / "trends")
+    store = _open(trend_dir)
+    store.boost_many([(f"t{i}", 1.1 + i / 100) for i in range(50)], ts=NOW)
+    store.checkpoint()
+    store.boost("t1", 1.3, ts=NOW + 10)
+    assert _logs(trend_dir) == ["log-000002.log"]       # the folded log is gone
+    before = _scores(store)
+    _crash(store)
+
+    restarted = _open(trend_dir)
+    assert _scores(restarted) == before and restarted.records == 1
+
+
+def _legacy(scores: dict) -> dict:
+    return {track_id: {"score": score, "last_update": "2026-09-21T08:53:20"} for track_id, score in scores.items()}
+
+
+@pytest.mark.parametrize("cut", [1, 30])
+def test_replace_is_all_or_nothing(tmp_path, monkeypatch, cut):
+    trend_dir = str(tmp_path / "trends")
+    store = _open(trend_dir)
+    store.boost_many([("old1", 1.5), ("old2", 1.2)], ts=NOW)
+    before = _scores(store)
+    # Crash before the post-replace checkpoint, with the group's write torn `cut` bytes short
+    monkeypatch.setattr(store, "_maybe_checkpoint", lambda force=False: None)
+    store.replace(_legacy({f"new{i}": 1.0 + i for i in range(5)}))
+    assert set(store.trends) == {f"new{i}" for i in range(5)}
+    _crash(store)
+    path = os.path.join(trend_dir, _logs(trend_dir)[-1])
+    os.truncate(path, os.path.getsize(path) - cut)
+
+    restarted = _open(trend_dir)
+    assert _scores(restarted) == before
+
+    # The repaired log keeps working: a complete replace then survives a restart
+    monkeypatch.setattr(restarted, "_maybe_checkpoint", lambda force=False: None)
+    restarted.replace(_legacy({"kept": 2.0}))
+    _crash(restarted)
+    assert set(_open(trend_dir).trends) == {"kept"}
+
+
+def test_other_process_events_are_followed(tmp_path):
+    trend_dir = str(tmp_path / "trends")
+    writer = _open(trend_dir)
+    worker = _open(trend_dir)       # writer.lock is taken: follows instead of checkpointing
+    assert writer.is_writer and not worker.is_writer
+    changed = []
+    worker.listeners.append(lambda op, ids: changed.append((op, sorted(ids))))
+
+    writer.boost_many([("a", 1.1), ("b", 1.2)], ts=NOW)
+    worker.boost("c", 1.3, ts=NOW)
+    assert worker.follow() == 2 and writer.follow() == 1
+    assert _scores(worker) == _scores(writer)
+    assert changed == [("boost", ["c"]), ("follow", ["a", "b"])]
+
+    # After a checkpoint the follower reloads from the new snapshot
+    writer.checkpoint()
+    writer.boost("d", 1.4, ts=NOW)
+    worker.follow()
+    assert _scores(worker) == _scores(writer)
+
+
+# ────────────────────────────────────────────────
+# 🔹 Lazy decay and heap archival
+# ────────────────────────────────────────────────
+def _eager(events, now: float) -> dict:
+    """Reference: decay every score up to each event (the old full-table sweep), then to `now`."""
+    scores, last = {}, {}
+    for track_id, boost, ts in events:
+        if track_id in scores:
+            scores[track_id] *= DECAY_PER_DAY ** ((ts - last[track_id]) / 86400)
+            scores[track_id] *= boost
+        else:
+            scores[track_id] = boost
+        last[track_id] = ts
+    return {k: v * DECAY_PER_DAY ** ((now - last[k]) / 86400) for k, v in scores.items()}
+
+
+def test_lazy_decay_and_archive_match_full_sweep(tmp_path):
+    rng = np.random.default_rng(0)
+    times = np.sort(NOW - rng.uniform(0, 60 * 86400, 3000))
+    events = [(f"t{rng.integers(300)}", float(rng.uniform(1.01, 1.5)), float(ts)) for ts in times]
+    store = _open(str(tmp_path / "trends"))
+    for track_id, boost, ts in events:
+        store.boost(track_id, boost, ts=ts)
+
+    want = _eager(events, NOW)
+    assert set(store.trends) == set(want)
+    for track_id, score in want.items():
+        assert store.score(track_id, NOW) == pytest.approx(score, rel=1e-9)
+
+    ranked = sorted(want.values())
+    threshold = (ranked[len(ranked) // 2] + ranked[len(ranked) // 2 + 1]) / 2     # no ties at the cut
+    archived, remaining = store.archive(threshold, now=NOW)
+    assert set(store.trends) == {k for k, v in want.items() if v >= threshold}
+    assert archived == len(want) - remaining
+    # Stale heap entries from re-boosted tracks are bounded
+    assert len(store._heap) <= 2 * len(store.trends) + 1024
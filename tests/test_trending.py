@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+
+from api.trending import TrendingIndex, _distance_km
+
+NOW = 1_790_000_000.0
+
+
+def _reference(points, lat: float, lng: float, radius_km: float, k: int):
+    """The original /discover/trending scoring: whole-day age decay, full sort."""
+    results = []
+    for key, (p_lat, p_lng, plays, recs, created) in points.items():
+        distance = _distance_km(lat, lng, p_lat, p_lng)
+        if distance > radius_km:
+            continue
+        days = int((NOW - created) // 86400)
+        results.append((key, (plays * 0.6 + recs * 0.4) * math.exp(-days / 7.0)))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:k]
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    n = 5000
+    lat = rng.uniform(40, 60, n)
+    lng = rng.uniform(-10, 20, n)
+    plays = rng.integers(0, 500, n)
+    recs = rng.integers(0, 100, n)
+    # Spread upload times over a month, at arbitrary times of day
+    created = NOW - rng.uniform(0, 30 * 86400, n)
+    return {i: (lat[i], lng[i], float(plays[i]), float(recs[i]), created[i]) for i in range(n)}
+
+
+@pytest.mark.parametrize("radius_km", [50, 300, 5000])
+def test_top_matches_original_scoring(points, radius_km):
+    index = TrendingIndex()
+    for key, (lat, lng, plays, recs, created) in points.items():
+        index.upsert(key, lat, lng, plays * 0.6 + recs * 0.4, created)
+
+    for lat, lng in [(50.0, 5.0), (45.5, 12.3), (58.0, -8.0)]:
+        got = index.top(lat, lng, radius_km, k=10, now=NOW)
+        want = _reference(points, lat, lng, radius_km, 10)
+        assert [round(score, 6) for _, score, _ in got] == [round(score, 6) for _, score in want]
+        assert {key for key, _, _ in got} == {key for key, _ in want}
+
+
+@pytest.mark.parametrize("radius_km", [20, 300, 5000])
+def test_count_matches_radius_scan(points, radius_km):
+    index = TrendingIndex()
+    for key, (lat, lng, plays, recs, created) in points.items():
+        index.upsert(key, lat, lng, plays * 0.6 + recs * 0.4, created)
+
+    for lat, lng in [(50.0, 5.0), (45.5, 12.3), (58.0, -8.0)]:
+        want = sum(1 for p_lat, p_lng, *_ in points.values() if _distance_km(lat, lng, p_lat, p_lng) <= radius_km)
+        assert index.count(lat, lng, radius_km) == want
+
+
+def test_remove_and_reinsert():
+    index = TrendingIndex()
+    index.upsert("a", 50.0, 5.0, 10.0, NOW)
+    index.upsert("b", 50.0, 5.0, 20.0, NOW - 86400 * 3)
+    assert [key for key, _, _ in index.top(50.0, 5.0, 10, now=NOW)] == ["b", "a"]
+    index.upsert("b", 50.0, 5.0, 20.0, NOW - 86400 * 10)
+    assert [key for key, _, _ in index.top(50.0, 5.0, 10, now=NOW)] == ["a", "b"]
+    index.remove("a")
+    assert len(index) == 1 and "a" not in index
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from api.vector_index import FlatIndex, IVFIndex, make_index
+
+K = 10
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _clustered(n: int, dim: int, clusters: int, spread: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = _unit(rng.standard_normal((clusters, dim)))
+    return _unit(centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)))
+
+
+def _top(index, matrix: np.ndarray, query: np.ndarray) -> set:
+    """What VectorStore does: exact re-scoring of the index's candidate rows."""
+    rows = index.candidates(query, K)
+    rows = np.arange(len(matrix)) if rows is None else np.unique(rows)
+    scores = matrix[rows] @ query
+    return set(rows[np.argsort(-scores)[:K]].tolist())
+
+
+def _recall(index, matrix: np.ndarray, queries: np.ndarray) -> float:
+    exact = FlatIndex()
+    hits = [len(_top(index, matrix, q) & _top(exact, matrix, q)) for q in queries]
+    return sum(hits) / (K * len(queries))
+
+
+def _queries(matrix: np.ndarray, n: int = 50, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = matrix[rng.integers(0, len(matrix), (n, 5))]
+    return _unit(picks.mean(axis=1))
+
+
+def test_default_index_is_exact(monkeypatch):
+    monkeypatch.delenv("VECTOR_INDEX", raising=False)
+    assert make_index().kind == "flat"
+
+
+def test_ivf_recall_on_clustered_data():
+    matrix = _clustered(40_000, 32, clusters=200, spread=0.1)
+    index = IVFIndex(min_rows=1000)
+    index.build(matrix, np.ones(len(matrix), dtype=bool))
+    assert index.info()["trained"]
+    assert _recall(index, matrix, _queries(matrix)) >= 0.9
+
+
+@pytest.mark.parametrize("dim", [32, 128])
+def test_ivf_keeps_recall_on_unstructured_data(dim):
+    # Uniform random vectors have no clusters: IVF must either probe enough
+    # buckets to stay accurate or fall back to exact search
+    matrix = _unit(np.random.default_rng(2).standard_normal((20_000, dim)))
+    index = IVFIndex(min_rows=1000)
+    index.build(matrix, np.ones(len(matrix), dtype=bool))
+    assert _recall(index, matrix, _queries(matrix)) >= 0.9
+    if not index.info()["trained"]:
+        assert index.candidates(matrix[0], K) is None
+        assert not index.needs_rebuild(20_001)